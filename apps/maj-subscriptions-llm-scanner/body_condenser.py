@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Email Body Condenser v2.3
+=========================
+
+Salience-based condensation of email bodies for LLM prompts.
+
+Instead of sending `body[:2000]` (often greeting + legal boilerplate), pick
+the lines/sentences that carry the verdict: money amounts, dates,
+subscription/renewal keywords and the sender signature, within a token
+budget and in original order.
+
+Usage:
+    condensed = condense_body(body, max_tokens=500)
+
+Evaluation on the labelled test set (needs Ollama + database, opened read-only):
+    python body_condenser.py /tmp/test_subscriptions.db llm_vs_keywords_test.json
+"""
+
+import re
+import sys
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CHARS_PER_TOKEN = 4          # Rough estimate for mixed CZ/EN/DE text
+DEFAULT_MAX_TOKENS = 500     # ~2000 chars, same size as the old body[:2000]
+MAX_UNIT_CHARS = 300         # Longer lines are split into sentences
+HEADER_UNITS = 2             # First units (headline) get a small bonus
+SIGNATURE_UNITS = 3          # Last units (sender signature) get a small bonus
+GAP_MARKER = "[…]"
+
+# (pattern, weight) - weights are summed per line
+SALIENCE_PATTERNS: List[Tuple[str, int]] = [
+    # Money amounts: $9.99, 8,80 US$, 299 Kč, EUR 12.00, 1 500,00 CZK
+    (r"[$€£]\s?\d+(?:[.,]\d{1,2})?|\d[\d\s.,]*\s?(?:US\$|\$|€|£|Kč|CZK|EUR|USD|GBP)\b", 5),
+    # Dates: 15.01.2025, 2025-01-15, 1/15/25, December 1, 2025, 1. ledna 2025
+    (r"\b\d{1,2}[./-]\s?\d{1,2}[./-]\s?\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b", 3),
+    (r"(?i)\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}\b", 3),
+    (r"(?i)\b\d{1,2}\.\s*(?:ledna|února|března|dubna|května|června|července|srpna|září|října|listopadu|prosince)\b", 3),
+    # Subscription / renewal / billing keywords (CZ/EN/DE)
+    (r"(?i)(subscription|předplatn|abonnement|abo\b|membership|členství|mitgliedschaft)", 4),
+    (r"(?i)(renew|obnov|verlänger|next\s+(?:charge|payment|billing)|další\s+platb|expires|platnost\s+do)", 4),
+    (r"(?i)(invoice|faktur|rechnung|receipt|účtenk|quittung|payment|platb|zahlung|charged|strženo)", 3),
+    (r"(?i)(monthly|yearly|annual|měsíčn|ročn|monatlich|jährlich|per\s+month|per\s+year|/mo\b|/month|/year)", 3),
+    (r"(?i)(total|celkem|summe|gesamt|amount|částka|betrag)\b", 2),
+    (r"(?i)(trial|zkušební|cancel|zrušen|kündig)", 2),
+]
+
+# Boilerplate lines are demoted below everything else
+BOILERPLATE_PATTERNS = [
+    r"unsubscribe|odhlásit|abmelden|abbestellen",
+    r"privacy|ochrana\s+osobních|datenschutz",
+    r"all\s+rights\s+reserved|©|copyright|impressum",
+    r"this\s+(?:e-?mail|message)\s+(?:was|has\s+been)\s+sent|do\s+not\s+reply|neodpovídejte",
+    r"view\s+(?:this\s+email\s+)?in\s+(?:your\s+)?browser",
+]
+
+_salience_regexes = [(re.compile(p), w) for p, w in SALIENCE_PATTERNS]
+_boilerplate_regex = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+_sentence_split = re.compile(r"(?<=[.!?])\s+")
+_whitespace = re.compile(r"[ \t ]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (chars / CHARS_PER_TOKEN)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_units(body: str) -> List[str]:
+    """Split body into non-empty lines; long lines into sentences."""
+    units = []
+    for line in body.splitlines():
+        line = _whitespace.sub(" ", line).strip()
+        if not line or set(line) <= set("-=_*#>|"):
+            continue
+        if len(line) > MAX_UNIT_CHARS:
+            units.extend(s.strip() for s in _sentence_split.split(line) if s.strip())
+        else:
+            units.append(line)
+    return units
+
+
+def score_unit(unit: str) -> int:
+    """Salience score of one line/sentence."""
+    if _boilerplate_regex.search(unit):
+        return -1
+    return sum(weight for regex, weight in _salience_regexes if regex.search(unit))
+
+
+def condense_body(body: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """
+    Condense email body to the most salient lines within a token budget.
+
+    Bodies that already fit are returned with whitespace collapsed.
+    Selected units keep their original order; skipped stretches are
+    marked with GAP_MARKER.
+    """
+    if not body:
+        return ""
+
+    units = split_units(body)
+    if estimate_tokens("\n".join(units)) <= max_tokens:
+        return "\n".join(units)
+
+    scores = [score_unit(u) for u in units]
+    priority = list(scores)
+    for i, score in enumerate(scores):
+        if score <= 0:
+            continue
+        # Neighbouring lines often carry the label ("Total:" / amount on next line)
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(units) and scores[j] >= 0:
+                priority[j] = max(priority[j], 1)
+    for i in range(min(HEADER_UNITS, len(units))):
+        if scores[i] >= 0:
+            priority[i] += 1
+    for i in range(max(0, len(units) - SIGNATURE_UNITS), len(units)):
+        if scores[i] >= 0:
+            priority[i] += 1
+
+    budget = max_tokens * CHARS_PER_TOKEN
+    order = sorted(range(len(units)), key=lambda i: (-priority[i], i))
+    chosen = set()
+    used = 0
+    for i in order:
+        if priority[i] <= 0 and chosen:
+            break
+        cost = len(units[i]) + 1
+        if used + cost > budget:
+            continue
+        chosen.add(i)
+        used += cost
+
+    if not chosen:
+        return units[0][:budget]
+
+    lines = []
+    last = -1
+    for i in sorted(chosen):
+        if i != last + 1:
+            lines.append(GAP_MARKER)
+        lines.append(units[i])
+        last = i
+    if last != len(units) - 1:
+        lines.append(GAP_MARKER)
+    return "\n".join(lines)
+
+
+# ============================================================================
+# EVALUATION ON LABELLED TEST SET
+# ============================================================================
+
+def load_body(conn: sqlite3.Connection, subject: str, sender: str) -> Optional[str]:
+    """Full body of the evidence row for subject/sender (blob store or inline)"""
+    from body_store import BodyStore
+
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(email_evidence)')}
+    digest_column = 'email_body_hash' if 'email_body_hash' in columns else 'NULL'
+    row = conn.execute(
+        f'SELECT {digest_column}, email_body_full FROM email_evidence '
+        'WHERE email_subject = ? AND email_from = ? LIMIT 1',
+        (subject[:500], sender[:200])
+    ).fetchone()
+    if not row:
+        return None
+    return (BodyStore(conn).get(row[0]) if row[0] else None) or row[1]
+
+
+def evaluate(db_path: str, labels_path: str, max_tokens: int = DEFAULT_MAX_TOKENS,
+             ollama_url: Optional[str] = None, model: Optional[str] = None) -> Dict:
+    """
+    Compare body[:2000] vs condensed body on the labelled set.
+
+    Labels are the `llm_result.is_subscription` verdicts in
+    llm_vs_keywords_test.json; bodies are looked up in email_evidence.
+    The database is opened read-only and the model is called with the
+    scanner's prompt directly (no scanner, so no migrations).
+    """
+    from llm_client import OllamaClient
+    from json_salvage import salvage_json
+    from production_llm_scanner_v2 import (
+        MODEL_NAME, OLLAMA_TIMEOUT, OLLAMA_URL, PROMPT_BODY_TOKENS, SALVAGE_REQUIRED_FIELDS,
+        VERDICT_FIELDS, build_prompt,
+    )
+
+    with open(labels_path, encoding='utf-8') as f:
+        data = json.load(f)
+    samples = data.get('high_confidence_samples', []) + data.get('low_confidence_samples', [])
+
+    model = model or MODEL_NAME
+    llm = OllamaClient(ollama_url or OLLAMA_URL, model, timeout=OLLAMA_TIMEOUT)
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    report = {'samples': 0, 'truncated': {'correct': 0, 'chars': 0, 'errors': 0},
+              'condensed': {'correct': 0, 'chars': 0, 'errors': 0}}
+
+    try:
+        for sample in samples:
+            body = load_body(conn, sample['subject'], sample['sender'])
+            if not body:
+                continue
+            label = bool(sample['llm_result'].get('is_subscription'))
+            report['samples'] += 1
+
+            for mode, text in (('truncated', body[:2000]), ('condensed', condense_body(body, max_tokens))):
+                # Same prompt shaping as the scanner (a no-op for text under budget)
+                prompt = build_prompt(sample['subject'], sample['sender'],
+                                      condense_body(text, PROMPT_BODY_TOKENS))
+                report[mode]['chars'] += len(text)
+                try:
+                    raw = llm.generate(prompt, model=model, format="json", task='email_classification')
+                except Exception as e:
+                    print(f"⚠️  LLM error ({mode}): {e}", file=sys.stderr)
+                    report[mode]['errors'] += 1
+                    continue
+                result, _ = salvage_json(raw, SALVAGE_REQUIRED_FIELDS, VERDICT_FIELDS)
+                if result is None:
+                    report[mode]['errors'] += 1
+                elif bool(result.get('is_subscription')) == label:
+                    report[mode]['correct'] += 1
+    finally:
+        conn.close()
+
+    n = max(1, report['samples'])
+    for mode in ('truncated', 'condensed'):
+        report[mode]['accuracy'] = round(report[mode]['correct'] / n * 100, 1)
+        report[mode]['avg_chars'] = round(report[mode]['chars'] / n)
+        report[mode]['avg_tokens'] = round(report[mode]['chars'] / n / CHARS_PER_TOKEN)
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    result = evaluate(sys.argv[1], sys.argv[2])
+    print(f"\n📊 Labelled samples with body: {result['samples']}")
+    for mode in ('truncated', 'condensed'):
+        r = result[mode]
+        print(f"  {mode:10s}: accuracy {r['accuracy']:5.1f}%  "
+              f"avg body {r['avg_chars']} chars (~{r['avg_tokens']} tokens), {r['errors']} LLM errors")
+    print(f"  Accuracy impact: {result['condensed']['accuracy'] - result['truncated']['accuracy']:+.1f} pp")
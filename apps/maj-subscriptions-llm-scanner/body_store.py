@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Body Store v2.3
+===============
+
+Content-addressed, compressed storage for full email bodies.
+
+email_evidence rows keep email_body_compact plus an email_body_hash; the
+full body is stored once per distinct content in `email_bodies`
+(sha256 → zstd/zlib blob, raw if compression would not shrink it). Scans
+over email_evidence no longer pull full bodies through the page cache,
+identical bodies (re-sent receipts, the same newsletter to two addresses)
+are stored once, and a body is decompressed only when it is read.
+
+The same module lives in maj-subscriptions-llm-scanner and
+maj-subscriptions-local (the grouping tool reads bodies with it); keep
+the two copies identical.
+
+Usage:
+    python body_store.py migrate /tmp/production_subscriptions.db [--vacuum]
+    python body_store.py stats /tmp/production_subscriptions.db
+"""
+
+import sys
+import zlib
+import sqlite3
+import hashlib
+import logging
+import argparse
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CODEC = 'zstd' if ZSTD_AVAILABLE else 'zlib'  # Codec for new blobs (stored per row)
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+BODY_CACHE_SIZE = 256  # Decompressed bodies kept in memory
+MIGRATE_BATCH = 500    # Rows converted per transaction
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS email_bodies (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    )
+'''
+
+INSERT_SQL = 'INSERT OR IGNORE INTO email_bodies (hash, codec, size, data) VALUES (?, ?, ?, ?)'
+
+# Run after the evidence INSERT: stores the blob only if a row references it,
+# so an evidence row rejected as a duplicate leaves no orphan body behind
+INSERT_REFERENCED_SQL = '''
+    INSERT OR IGNORE INTO email_bodies (hash, codec, size, data)
+    SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM email_evidence WHERE email_body_hash = ?)
+'''
+
+
+def _to_bytes(body: str) -> bytes:
+    # surrogateescape: undecodable bytes from mail parts survive the round trip
+    return body.encode('utf-8', errors='surrogateescape')
+
+
+def body_hash(body: str) -> str:
+    """sha256 of the UTF-8 body"""
+    return hashlib.sha256(_to_bytes(body)).hexdigest()
+
+
+def compress(raw: bytes, codec: str = CODEC) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(codec: str, data: bytes) -> str:
+    if codec == 'raw':
+        raw = bytes(data)
+    elif codec == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Body stored with zstd but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return raw.decode('utf-8', errors='surrogateescape')
+
+
+def encode(body: Optional[str]) -> Optional[Tuple[str, str, int, bytes]]:
+    """INSERT_SQL parameters for a body, or None for an empty body"""
+    if not body:
+        return None
+    raw = _to_bytes(body)
+    digest = hashlib.sha256(raw).hexdigest()
+    data = compress(raw)
+    if len(data) >= len(raw):
+        # Short bodies do not compress; store them as-is
+        return digest, 'raw', len(body), raw
+    return digest, CODEC, len(body), data
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Create email_bodies and add email_evidence.email_body_hash if missing"""
+    conn.execute(CREATE_TABLE_SQL)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(email_evidence)')}
+    if columns and 'email_body_hash' not in columns:
+        conn.execute('ALTER TABLE email_evidence ADD COLUMN email_body_hash TEXT')
+
+
+def inline_bodies(conn: sqlite3.Connection) -> int:
+    """Rows still carrying email_body_full inline (not yet migrated)"""
+    return conn.execute(
+        'SELECT COUNT(*) FROM email_evidence WHERE email_body_full IS NOT NULL'
+    ).fetchone()[0]
+
+
+class BodyStore:
+    """Lazy reader for stored bodies (small LRU of decompressed bodies)"""
+
+    def __init__(self, conn: sqlite3.Connection, cache_size: int = BODY_CACHE_SIZE):
+        self.conn = conn
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, digest: Optional[str]) -> Optional[str]:
+        """Body for a content hash, decompressed on first access"""
+        if not digest:
+            return None
+        body = self.cache.get(digest)
+        if body is not None:
+            self.cache.move_to_end(digest)
+            return body
+        row = self.conn.execute('SELECT codec, data FROM email_bodies WHERE hash = ?', (digest,)).fetchone()
+        if row is None:
+            return None
+        body = decompress(row[0], row[1])
+        self.cache[digest] = body
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return body
+
+    def body_for(self, message_id: str) -> Optional[str]:
+        """Full body of an evidence row (blob store, or inline for unmigrated rows)"""
+        row = self.conn.execute(
+            'SELECT email_body_hash, email_body_full FROM email_evidence WHERE email_message_id = ?',
+            (message_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self.get(row[0]) if row[0] else row[1]
+
+
+def migrate(conn: sqlite3.Connection, batch: int = MIGRATE_BATCH, vacuum: bool = False) -> Dict:
+    """
+    Move inline email_body_full values into email_bodies, in place.
+
+    Runs in batches of `batch` rows per transaction and is resumable: only
+    rows that still have email_body_full are touched. VACUUM (optional)
+    returns the freed pages to the filesystem.
+    """
+    ensure_schema(conn)
+    conn.commit()
+    stats = {'rows': 0, 'new_bodies': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+
+    while True:
+        rows = conn.execute('''
+            SELECT id, email_body_full FROM email_evidence
+            WHERE email_body_full IS NOT NULL
+            LIMIT ?
+        ''', (batch,)).fetchall()
+        if not rows:
+            break
+
+        for row_id, body in rows:
+            encoded = encode(body)
+            digest = None
+            if encoded:
+                digest = encoded[0]
+                if conn.execute(INSERT_SQL, encoded).rowcount:
+                    stats['new_bodies'] += 1
+                    stats['stored_bytes'] += len(encoded[3])
+                stats['raw_bytes'] += len(_to_bytes(body))
+            conn.execute(
+                'UPDATE email_evidence SET email_body_hash = ?, email_body_full = NULL WHERE id = ?',
+                (digest, row_id)
+            )
+        conn.commit()
+        stats['rows'] += len(rows)
+        logger.info(f"📦 Migrated {stats['rows']} bodies ({stats['new_bodies']} unique)")
+
+    if vacuum and stats['rows']:
+        conn.execute('VACUUM')
+    return stats
+
+
+def store_stats(conn: sqlite3.Connection) -> Dict:
+    bodies, raw, stored = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM email_bodies'
+    ).fetchone()
+    referenced = conn.execute(
+        'SELECT COUNT(*) FROM email_evidence WHERE email_body_hash IS NOT NULL'
+    ).fetchone()[0]
+    return {
+        'bodies': bodies,
+        'referencing_rows': referenced,
+        'inline_rows': inline_bodies(conn),
+        'chars': raw,
+        'stored_bytes': stored,
+    }
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Compressed email body store')
+    parser.add_argument('command', choices=['migrate', 'stats'])
+    parser.add_argument('db', help='Scanner SQLite database')
+    parser.add_argument('--vacuum', action='store_true', help='VACUUM after migrating')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == 'migrate':
+            stats = migrate(conn, vacuum=args.vacuum)
+            ratio = stats['raw_bytes'] / stats['stored_bytes'] if stats['stored_bytes'] else 0
+            logger.info(f"✅ {stats['rows']} rows migrated, {stats['new_bodies']} unique bodies, "
+                        f"{stats['raw_bytes'] / 1e6:.1f} MB → {stats['stored_bytes'] / 1e6:.1f} MB "
+                        f"(×{ratio:.1f}, codec {CODEC})")
+        else:
+            ensure_schema(conn)
+            for key, value in store_stats(conn).items():
+                print(f"{key:18} {value}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
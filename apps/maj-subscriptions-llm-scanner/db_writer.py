@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+DB Writer v2.3
+==============
+
+Write-behind persistence for the LLM scanner.
+
+Producers (scanner / LLM worker threads) enqueue SQL statements into a
+bounded queue; one writer thread owns the SQLite connection and applies
+them in order, one transaction per batch (N statements or T seconds).
+Consecutive statements with the same SQL are applied with executemany.
+
+- Backpressure: execute() blocks while the queue is full
+- Ordering: statements are applied in submission order, so a checkpoint
+  enqueued after its rows is committed in the same or a later batch
+- call(fn) runs fn(conn) on the writer thread and returns its result
+  (e.g. INSERT ... lastrowid)
+- flush() waits until everything submitted so far is committed
+- Failure: if a batch cannot be applied (e.g. "database is locked" on
+  BEGIN/COMMIT) the writer rolls back and stops; every pending flush()/
+  call() raises the error and later submissions are refused
+"""
+
+import queue
+import sqlite3
+import logging
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as WaitTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BATCH_ROWS = 50
+DEFAULT_BATCH_SECONDS = 10.0
+DEFAULT_WAIT_SECONDS = 600.0  # flush() / call() give up after this
+
+_STOP = object()
+
+
+class DBWriter:
+    """Single writer thread draining a bounded queue of SQL statements"""
+
+    def __init__(self, db_path: str, pragmas: List[str] = (), queue_size: int = DEFAULT_QUEUE_SIZE,
+                 batch_rows: int = DEFAULT_BATCH_ROWS, batch_seconds: float = DEFAULT_BATCH_SECONDS):
+        self.db_path = db_path
+        self.pragmas = list(pragmas)
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'applied': 0,
+            'failed': 0,
+            'batches': 0,
+            'flush_seconds_total': 0.0,
+            'flush_seconds_max': 0.0,
+            'backpressure_waits': 0,
+            'backpressure_seconds': 0.0,
+        }
+        self.error: Optional[BaseException] = None
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    # ------------------------------------------------------------------
+    # Producer API
+    # ------------------------------------------------------------------
+
+    def stopped_error(self) -> RuntimeError:
+        error = RuntimeError(f"DB writer stopped: {self.error}")
+        error.__cause__ = self.error
+        return error
+
+    def _put(self, item):
+        if self.error is not None or not self.thread.is_alive():
+            raise self.stopped_error()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            start = time.monotonic()
+            self.queue.put(item)  # Backpressure: block until the writer catches up
+            with self.lock:
+                self.stats['backpressure_waits'] += 1
+                self.stats['backpressure_seconds'] += time.monotonic() - start
+        if self.error is not None:
+            # The writer failed while we were enqueueing: nobody will drain this item
+            self._fail_pending([])
+
+    def execute(self, sql: str, params: tuple = ()):
+        """Enqueue one statement (blocks while the queue is full)"""
+        with self.lock:
+            self.stats['submitted'] += 1
+        self._put(('sql', sql, params))
+
+    def run(self, fn: Callable[[sqlite3.Connection], Any]):
+        """Enqueue fn(conn) without waiting for it"""
+        self._put(('call', fn, None))
+
+    def call(self, fn: Callable[[sqlite3.Connection], Any],
+             timeout: Optional[float] = DEFAULT_WAIT_SECONDS) -> Any:
+        """
+        Run fn(conn) on the writer thread (in order) and return its result
+        once its batch is committed; raises fn's exception, the writer's
+        error if it stopped, or TimeoutError
+        """
+        future = Future()
+        self._put(('call', fn, future))
+        return future.result(timeout)
+
+    def flush(self, timeout: Optional[float] = DEFAULT_WAIT_SECONDS) -> bool:
+        """Commit everything submitted so far; False on timeout, raises if the writer stopped"""
+        done = Future()
+        self._put(('flush', done, None))
+        try:
+            done.result(timeout)
+        except WaitTimeout:
+            return False
+        return True
+
+    def close(self, timeout: Optional[float] = 60):
+        """
+        Flush and stop the writer thread
+
+        Raises RuntimeError if the writer failed or is still draining after
+        `timeout` (daemon thread: whatever is still queued is lost on exit).
+        """
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join(timeout)
+        if self.thread.is_alive():
+            message = (f"DB writer still draining after {timeout}s "
+                       f"({self.queue.qsize()} items queued, lost if the process exits)")
+            logger.error(message)
+            raise RuntimeError(message)
+        if self.error is not None:
+            logger.error(f"DB writer failed, {self.get_stats()['failed']} statements not written: {self.error}")
+            raise self.stopped_error()
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['flush_seconds_avg'] = (round(stats['flush_seconds_total'] / stats['batches'], 4)
+                                      if stats['batches'] else 0.0)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        # Autocommit mode: transactions are managed explicitly per batch
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        batch: List = []
+        deadline = None
+        try:
+            for pragma in self.pragmas:
+                conn.execute(pragma)
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    self._apply(conn, batch)
+                    return
+                if item is not None:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.batch_seconds
+
+                # Flushes and blocking calls are applied right away
+                due = (item is None or item[0] == 'flush'
+                       or (item[0] == 'call' and item[2] is not None)
+                       or len(batch) >= self.batch_rows
+                       or (deadline is not None and time.monotonic() >= deadline))
+                if batch and due:
+                    self._apply(conn, batch)
+                    batch, deadline = [], None
+        except Exception as e:
+            self.error = e
+            logger.error(f"DB writer crashed: {e}")
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            self._fail_pending(batch)
+        finally:
+            conn.close()
+
+    def _fail_pending(self, batch: List):
+        """Writer stopped: fail the waiters of batch and of everything still queued"""
+        items = list(batch)
+        while True:
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        dropped = 0
+        for item in items:
+            if item is _STOP:
+                continue
+            kind, payload, extra = item
+            future = payload if kind == 'flush' else extra
+            if kind == 'sql':
+                dropped += 1
+            elif future is not None and not future.done():
+                future.set_exception(self.stopped_error())
+        if dropped:
+            logger.error(f"DB writer: {dropped} statements dropped")
+            with self.lock:
+                self.stats['failed'] += dropped
+
+    def _apply(self, conn: sqlite3.Connection, batch: List):
+        """Apply one batch in a single transaction"""
+        if not batch:
+            return
+        start = time.monotonic()
+        flushed = []
+        results = []  # (future, result): answered only once the batch is committed
+        group_sql, group_params = None, []
+        conn.execute("BEGIN")
+
+        def apply_group():
+            if group_sql is None:
+                return
+            conn.execute("SAVEPOINT rows")
+            try:
+                conn.executemany(group_sql, group_params)
+                applied = len(group_params)
+            except sqlite3.Error:
+                # One bad row (e.g. duplicate message id) must not drop the batch
+                conn.execute("ROLLBACK TO rows")
+                applied = 0
+                for params in group_params:
+                    try:
+                        conn.execute(group_sql, params)
+                        applied += 1
+                    except sqlite3.Error as e:
+                        logger.warning(f"DB writer: row rejected ({e})")
+                        with self.lock:
+                            self.stats['failed'] += 1
+            conn.execute("RELEASE rows")
+            with self.lock:
+                self.stats['applied'] += applied
+
+        for kind, payload, extra in batch:
+            if kind == 'sql':
+                if payload != group_sql:
+                    apply_group()
+                    group_sql, group_params = payload, []
+                group_params.append(extra)
+                continue
+            apply_group()
+            group_sql, group_params = None, []
+            if kind == 'flush':
+                flushed.append(payload)
+            elif kind == 'call':
+                try:
+                    result = payload(conn)
+                    if extra is not None:
+                        results.append((extra, result))
+                except Exception as e:
+                    if extra is not None:
+                        extra.set_exception(e)
+                    else:
+                        logger.error(f"DB writer call failed: {e}")
+        apply_group()
+        conn.execute("COMMIT")
+
+        elapsed = time.monotonic() - start
+        with self.lock:
+            self.stats['batches'] += 1
+            self.stats['flush_seconds_total'] += elapsed
+            self.stats['flush_seconds_max'] = max(self.stats['flush_seconds_max'], elapsed)
+        for future, result in results:
+            future.set_result(result)
+        for done in flushed:
+            done.set_result(None)
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+Export Results v2.3
+===================
+
+Columnar snapshot of scan results for bulk analysis (pandas, DuckDB, Polars)
+away from the production database.
+
+Writes email_evidence, services, llm_verdicts, mbox_checkpoints and the
+spend rollups as Parquet (pyarrow) or, without pyarrow, gzip-compressed
+JSONL, plus manifest.json with row counts and scan statistics (verdicts
+per model/tier, checkpoint states). Body columns are skipped unless
+--with-bodies. Dated tables are partitioned Hive-style by year:
+
+    out/email_evidence/year=2024/part-0.parquet
+    out/services/part-0.parquet
+    out/manifest.json
+
+All tables are read in one read transaction (a consistent snapshot even
+while the scanner keeps writing), streamed in chunks of CHUNK_ROWS.
+
+Usage:
+    python export_results.py /tmp/production_subscriptions.db /tmp/subscriptions_export
+    python export_results.py /tmp/production_subscriptions.db /tmp/export --format jsonl
+    python export_results.py /tmp/production_subscriptions.db /tmp/export --with-bodies --no-partition
+
+An existing output directory is replaced only if it holds a previous
+export (manifest.json) or is empty; anything else needs --force.
+
+    duckdb -c "SELECT year, COUNT(*) FROM read_parquet('/tmp/export/email_evidence/*/*.parquet',
+               hive_partitioning = true) GROUP BY year"
+"""
+
+import os
+import sys
+import gzip
+import json
+import shutil
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from body_store import BodyStore
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+CHUNK_ROWS = 50000
+PARQUET_COMPRESSION = 'zstd'
+
+# Table → date column to partition by year (None = single file)
+EXPORT_TABLES = {
+    'email_evidence': 'email_date',
+    'services': None,
+    'llm_verdicts': 'created_at',
+    'mbox_checkpoints': None,
+    'service_spend_summary': None,
+    'service_monthly_spend': None,
+}
+
+BODY_COLUMNS = {'email_body_compact', 'email_body_full'}
+UNDATED_PARTITION = 'unknown'
+
+
+def default_format() -> str:
+    return 'parquet' if PYARROW_AVAILABLE else 'jsonl'
+
+
+def table_columns(conn: sqlite3.Connection, table: str, with_bodies: bool) -> List[tuple]:
+    """(name, declared type) of the exported columns"""
+    columns = [(row[1], (row[2] or '').upper()) for row in conn.execute(f'PRAGMA table_info({table})')]
+    if not with_bodies:
+        columns = [(name, kind) for name, kind in columns if name not in BODY_COLUMNS]
+    return columns
+
+
+def arrow_schema(columns: List[tuple], sample: List[tuple] = ()) -> "pa.Schema":
+    """
+    Arrow types from SQLite declared types (all-NULL chunks keep their type);
+    columns declared without a type (legacy tables) take the type of their
+    first value in `sample`, numbers as float64.
+    """
+    def arrow_type(kind, index):
+        if not kind:
+            value = next((row[index] for row in sample if row[index] is not None), None)
+            if isinstance(value, (int, float)):
+                return pa.float64()
+            return pa.binary() if isinstance(value, bytes) else pa.string()
+        if 'INT' in kind:
+            return pa.int64()
+        if any(word in kind for word in ('REAL', 'FLOA', 'DOUB')):
+            return pa.float64()
+        if 'BLOB' in kind:
+            return pa.binary()
+        return pa.string()
+    return pa.schema([(name, arrow_type(kind, i)) for i, (name, kind) in enumerate(columns)])
+
+
+def _arrow_column(values: tuple, arrow_type: "pa.DataType") -> "pa.Array":
+    """Typed Arrow array; SQLite does not enforce declared types, so mismatches are coerced"""
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        pass
+    if pa.types.is_string(arrow_type):
+        convert = str
+    elif pa.types.is_binary(arrow_type):
+        convert = lambda value: value if isinstance(value, bytes) else str(value).encode('utf-8')
+    else:
+        convert = int if pa.types.is_integer(arrow_type) else float
+
+    def coerce(value):
+        if value is None:
+            return None
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            return None
+    return pa.array([coerce(value) for value in values], type=arrow_type)
+
+
+class PartitionWriter:
+    """Streams row chunks of one table into part files (Parquet or JSONL.gz)"""
+
+    def __init__(self, directory: str, columns: List[tuple], fmt: str):
+        self.directory = directory
+        self.columns = columns
+        self.names = [name for name, _kind in columns]
+        self.fmt = fmt
+        self.schema = None  # Parquet schema, fixed by the first chunk
+        self.files: Dict[str, object] = {}
+        self.partitions: List[str] = []
+        self.rows = 0
+
+    def _open(self, partition: Optional[str]):
+        directory = os.path.join(self.directory, partition) if partition else self.directory
+        os.makedirs(directory, exist_ok=True)
+        if self.fmt == 'parquet':
+            path = os.path.join(directory, 'part-0.parquet')
+            return pq.ParquetWriter(path, self.schema, compression=PARQUET_COMPRESSION)
+        return gzip.open(os.path.join(directory, 'part-0.jsonl.gz'), 'wt', encoding='utf-8')
+
+    def write(self, partition: Optional[str], rows: List[tuple]):
+        if not rows:
+            return
+        if self.fmt == 'parquet' and self.schema is None:
+            self.schema = arrow_schema(self.columns, rows)
+        out = self.files.get(partition)
+        if out is None:
+            out = self.files[partition] = self._open(partition)
+            if partition:
+                self.partitions.append(partition)
+        if self.fmt == 'parquet':
+            columns = list(zip(*rows))
+            out.write_table(pa.Table.from_arrays(
+                [_arrow_column(column, field.type) for column, field in zip(columns, self.schema)],
+                schema=self.schema))
+        else:
+            for row in rows:
+                out.write(json.dumps(dict(zip(self.names, row)), ensure_ascii=False, default=str))
+                out.write('\n')
+        self.rows += len(rows)
+
+    def close(self):
+        if not self.files:
+            if self.fmt == 'parquet':
+                self.schema = arrow_schema(self.columns)
+            self.files[None] = self._open(None)  # Empty table: schema-only file
+        for out in self.files.values():
+            out.close()
+        self.files = {}
+
+
+def _full_body(inline: Optional[str], digest: Optional[str], bodies: Optional[BodyStore]) -> Optional[str]:
+    body = inline or (bodies.get(digest) if bodies else None)
+    if body is None:
+        return None
+    # Undecodable mail bytes are kept as surrogates in the store; Arrow/JSON need valid UTF-8
+    return body.encode('utf-8', errors='surrogateescape').decode('utf-8', errors='replace')
+
+
+def export_table(conn: sqlite3.Connection, table: str, out_dir: str, fmt: str,
+                 with_bodies: bool = False, partition: bool = True,
+                 bodies: BodyStore = None) -> Dict:
+    """Stream one table to out_dir/table; returns {'rows', 'partitions'}"""
+    columns = table_columns(conn, table, with_bodies)
+    names = [name for name, _kind in columns]
+    date_column = EXPORT_TABLES.get(table) if partition else None
+    if date_column not in names:
+        date_column = None
+
+    select = ', '.join(names)
+    if date_column:
+        # Index on the date column: rows arrive grouped by year
+        cursor = conn.execute(f'SELECT {select} FROM {table} ORDER BY {date_column}')
+        date_index = names.index(date_column)
+    else:
+        cursor = conn.execute(f'SELECT {select} FROM {table}')
+
+    # Full bodies live in email_bodies: resolve the hash while exporting
+    hash_index = names.index('email_body_hash') if with_bodies and 'email_body_hash' in names else None
+    full_index = names.index('email_body_full') if hash_index is not None and 'email_body_full' in names else None
+
+    writer = PartitionWriter(os.path.join(out_dir, table), columns, fmt)
+    try:
+        while True:
+            rows = cursor.fetchmany(CHUNK_ROWS)
+            if not rows:
+                break
+            if full_index is not None:
+                rows = [row[:full_index] + (_full_body(row[full_index], row[hash_index], bodies),) + row[full_index + 1:]
+                        for row in rows]
+            if not date_column:
+                writer.write(None, rows)
+                continue
+            chunk_partition, chunk = None, []
+            for row in rows:
+                year = str(row[date_index] or '')[:4]
+                key = f"year={year if year.isdigit() else UNDATED_PARTITION}"
+                if key != chunk_partition and chunk:
+                    writer.write(chunk_partition, chunk)
+                    chunk = []
+                chunk_partition = key
+                chunk.append(row)
+            writer.write(chunk_partition, chunk)
+    finally:
+        writer.close()
+    return {'rows': writer.rows, 'partitions': sorted(writer.partitions)}
+
+
+def scan_statistics(conn: sqlite3.Connection) -> Dict:
+    """Aggregates for manifest.json (from the same snapshot as the tables)"""
+    stats = {
+        'evidence': conn.execute('SELECT COUNT(*) FROM email_evidence').fetchone()[0],
+        'services': conn.execute('SELECT COUNT(*) FROM services').fetchone()[0],
+        'avg_confidence': conn.execute('SELECT ROUND(AVG(confidence_score), 1) FROM email_evidence').fetchone()[0],
+    }
+    try:
+        stats['verdicts'] = [
+            dict(zip(['model', 'tier', 'verdicts', 'subscriptions', 'final', 'avg_latency_s'], row))
+            for row in conn.execute('''
+                SELECT model, tier, COUNT(*), SUM(is_subscription), SUM(is_final),
+                       ROUND(AVG(latency_seconds), 2)
+                FROM llm_verdicts GROUP BY model, tier ORDER BY COUNT(*) DESC
+            ''')
+        ]
+        stats['checkpoints'] = dict(conn.execute(
+            'SELECT status, COUNT(*) FROM mbox_checkpoints GROUP BY status'
+        ).fetchall())
+    except sqlite3.OperationalError:
+        pass  # Database from before the scanner tables
+    return stats
+
+
+def check_output_dir(out_dir: str, force: bool = False):
+    """
+    Refuse to replace anything but a previous export (manifest.json present)
+    or an empty directory, unless force
+    """
+    if not os.path.exists(out_dir) or force:
+        return
+    if not os.path.isdir(out_dir):
+        raise RuntimeError(f"Output path {out_dir} exists and is not a directory")
+    if os.listdir(out_dir) and not os.path.isfile(os.path.join(out_dir, 'manifest.json')):
+        raise RuntimeError(f"Output directory {out_dir} is not empty and holds no previous export "
+                           "(manifest.json) - pick another path or use --force to replace it")
+
+
+def export(db_path: str, out_dir: str, fmt: str = None, with_bodies: bool = False,
+           partition: bool = True, force: bool = False) -> Dict:
+    """
+    Snapshot every EXPORT_TABLES table that exists; returns the manifest
+
+    out_dir is replaced if it holds a previous export (or force is set).
+    """
+    fmt = fmt or default_format()
+    if fmt == 'parquet' and not PYARROW_AVAILABLE:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow) - use --format jsonl")
+    check_output_dir(out_dir, force)
+
+    # Read-only: the export can never lock or modify the production database
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conn.execute('BEGIN')  # One read transaction = one consistent snapshot
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        bodies = BodyStore(conn) if with_bodies and 'email_bodies' in existing else None
+
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        elif os.path.exists(out_dir):
+            os.remove(out_dir)  # force over a file
+        os.makedirs(out_dir)
+
+        tables = {}
+        for table in EXPORT_TABLES:
+            if table not in existing:
+                continue
+            result = export_table(conn, table, out_dir, fmt, with_bodies, partition, bodies)
+            tables[table] = result
+            partitions = f" in {len(result['partitions'])} partitions" if result['partitions'] else ""
+            logger.info(f"📤 {table}: {result['rows']} rows{partitions}")
+
+        manifest = {
+            'exported_at': datetime.now().isoformat(),
+            'source': os.path.abspath(db_path),
+            'format': fmt,
+            'partitioned_by_year': partition,
+            'with_bodies': with_bodies,
+            'schema_version': (conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+                               if 'schema_version' in existing else None),
+            'tables': tables,
+            'statistics': scan_statistics(conn),
+        }
+        conn.execute('COMMIT')
+    finally:
+        conn.close()
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Columnar export of scan results')
+    parser.add_argument('db', help='Scanner SQLite database')
+    parser.add_argument('out', help='Output directory (a previous export there is replaced)')
+    parser.add_argument('--format', choices=['parquet', 'jsonl'], default=None,
+                        help=f'Default: {default_format()} (parquet needs pyarrow)')
+    parser.add_argument('--with-bodies', action='store_true', help='Include compact and full bodies')
+    parser.add_argument('--no-partition', action='store_true', help='One file per table')
+    parser.add_argument('--force', action='store_true',
+                        help='Replace the output directory even if it is not a previous export')
+    args = parser.parse_args()
+
+    try:
+        manifest = export(args.db, args.out, args.format, args.with_bodies, not args.no_partition,
+                          force=args.force)
+    except RuntimeError as e:
+        logger.error(f"❌ {e}")
+        return 1
+    rows = sum(table['rows'] for table in manifest['tables'].values())
+    logger.info(f"✅ Exported {rows} rows as {manifest['format']} to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
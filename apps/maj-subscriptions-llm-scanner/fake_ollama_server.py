@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Fake Ollama Server v2.3
+=======================
+
+Local stand-in for Ollama's /api/generate and /api/tags, for offline load
+testing of the scanners (no model, no network).
+
+Modes:
+- synth:  synthesize plausible verdicts from the prompt (email JSON,
+          v3 document JSON, v4 "TYP:/CONFIDENCE:" text)
+- replay: answer from recorded responses keyed by sha256(model + prompt);
+          misses fall back to synth (or 404 with --strict)
+- record: forward to a real Ollama (--upstream) and append responses
+          to the recordings file
+
+Fault injection:
+- Latency distribution: const:S, uniform:A,B, normal:MU,SIGMA,
+  lognormal:MU,SIGMA (seconds; lognormal parameters of ln(seconds))
+- --error-rate: fraction of requests answered with --error-status
+- --timeout-rate: fraction of requests that hang for --hang-seconds
+- --max-concurrency: generation slots; extra requests queue like Ollama,
+  or get 503 with --reject-when-busy
+
+GET /stats returns counters (requests, in-flight peak, injected faults).
+
+Usage:
+    python fake_ollama_server.py --port 11435 --latency lognormal:0.5,0.4 \\
+        --error-rate 0.02 --timeout-rate 0.01 --max-concurrency 4
+
+    OLLAMA_URL=http://127.0.0.1:11435/api/generate python production_llm_scanner_v2.py
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Union
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# LATENCY DISTRIBUTIONS
+# ============================================================================
+
+def parse_latency(spec: str):
+    """
+    Parse latency spec into a sampler function returning seconds.
+
+    Examples: "const:0.5", "uniform:0.2,2", "normal:1,0.3", "lognormal:0,0.5"
+    """
+    kind, _, args = spec.partition(':')
+    params = [float(x) for x in args.split(',') if x]
+    if kind == 'const':
+        return lambda rng: params[0] if params else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(params[0], params[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# ============================================================================
+# VERDICT SYNTHESIS
+# ============================================================================
+
+SUBSCRIPTION_HINTS = re.compile(
+    r"(?i)(subscription|předplatn|abonnement|renew|obnov|invoice|faktur|receipt|"
+    r"membership|monthly|yearly|měsíčn|ročn)"
+)
+MARKETING_HINTS = re.compile(r"(?i)(unsubscribe|newsletter|sleva|sale|discount|odhlásit|abmelden)")
+AMOUNT_HINT = re.compile(r"([$€]\s?(\d+(?:[.,]\d{1,2})?))|((\d+(?:[.,]\d{1,2})?)\s?(Kč|CZK|EUR|USD))")
+DOCUMENT_TYPES = [
+    ('faktura', r"(?i)faktura|invoice|rechnung|DIČ"),
+    ('bankovni_vypis', r"(?i)výpis z účtu|bank statement|zůstatek"),
+    ('soudni_dokument', r"(?i)soud|rozsudek|usnesení|sp\. ?zn"),
+    ('reklama', r"(?i)newsletter|sleva|nakupujte|unsubscribe"),
+    ('stvrzenka', r"(?i)paragon|účtenka|receipt|celkem"),
+]
+
+
+def prompt_key(model: str, prompt: str) -> str:
+    """Recording key: sha256 of model + prompt."""
+    return hashlib.sha256(f"{model}\n{prompt}".encode('utf-8')).hexdigest()
+
+
+def _payload_section(prompt: str) -> str:
+    """The email/document part of a scanner prompt (after the instructions)."""
+    for marker in ("EMAIL:", "DOKUMENTY K ANALÝZE:", "NYNÍ KLASIFIKUJ TENTO DOKUMENT:"):
+        if marker in prompt:
+            return prompt.split(marker, 1)[1]
+    return prompt
+
+
+def synthesize_response(prompt: str, rng: random.Random) -> str:
+    """Plausible model output for the scanner prompt formats in this repo."""
+    text = _payload_section(prompt)
+
+    if '"is_subscription"' in prompt:
+        hits = len(SUBSCRIPTION_HINTS.findall(text))
+        marketing = len(MARKETING_HINTS.findall(text))
+        is_sub = hits > marketing
+        amount_match = AMOUNT_HINT.search(text)
+        amount = None
+        if amount_match:
+            raw = amount_match.group(2) or amount_match.group(4)
+            amount = float(raw.replace(',', '.'))
+        return json.dumps({
+            "is_subscription": is_sub,
+            "confidence": min(100, 40 + 15 * abs(hits - marketing) + rng.randint(0, 10)),
+            "service_name": None,
+            "amount": amount if is_sub else None,
+            "currency": None,
+            "subscription_type": "monthly" if is_sub and re.search(r"(?i)month|měsíc", text) else None,
+            "reasoning": f"synthetic: {hits} subscription / {marketing} marketing hints",
+        }, ensure_ascii=False)
+
+    doc_type = next((name for name, pattern in DOCUMENT_TYPES if re.search(pattern, text)), 'jine')
+    confidence = 0.3 if doc_type == 'jine' else round(rng.uniform(0.8, 0.97), 2)
+
+    if '"document_type"' in prompt:
+        score = int(confidence * 200)
+        return json.dumps({
+            "document_type": doc_type,
+            "score": score,
+            "confidence_percent": round(confidence * 100, 1),
+            "confidence_level": "HIGH" if score >= 120 else "LOW",
+            "breakdown": {},
+            "reasoning": "synthetic verdict",
+            "tags": [doc_type],
+            "correspondent": None,
+            "detected_amount": None,
+            "detected_currency": None,
+        }, ensure_ascii=False)
+
+    if 'TYP:' in prompt:
+        return f"TYP: {doc_type}\nCONFIDENCE: {confidence}\nREASONING: synthetic verdict"
+
+    return "{}"
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class FakeOllamaServer:
+    """Threaded fake Ollama server; usable from tests or the command line."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, mode: str = 'synth',
+                 recordings: Optional[str] = None, upstream: Optional[str] = None,
+                 latency: str = 'const:0', error_rate: float = 0.0, error_status: int = 500,
+                 timeout_rate: float = 0.0, hang_seconds: float = 600.0,
+                 max_concurrency: int = 0, reject_when_busy: bool = False,
+                 strict: bool = False, seed: Optional[int] = None,
+                 models: Optional[list] = None,
+                 responder: Optional[Callable[[str, str], Union[str, int, None]]] = None):
+        """
+        responder(model, prompt): scripted answer for tests - response text,
+        an HTTP status to fail with, or None for the mode's normal answer.
+        """
+        self.mode = mode
+        self.responder = responder
+        self.recordings_path = recordings
+        self.upstream = upstream
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.reject_when_busy = reject_when_busy
+        self.strict = strict
+        self.models = models or []
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self.lock = threading.Lock()
+        self.recordings: Dict[str, str] = {}
+        self.stats = {
+            'requests': 0,
+            'completed': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'replayed': 0,
+            'synthesized': 0,
+            'recorded': 0,
+            'replay_misses': 0,
+            'injected_errors': 0,
+            'injected_timeouts': 0,
+            'rejected_busy': 0,
+            'client_disconnects': 0,
+        }
+
+        if recordings and mode in ('replay', 'record'):
+            self._load_recordings()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    # ---------------------------------------------------------------- setup
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def url(self) -> str:
+        """/api/generate URL (what the scanners call OLLAMA_URL)."""
+        return f"{self.base_url}/api/generate"
+
+    def start(self) -> 'FakeOllamaServer':
+        """Serve in a background thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"🧪 Fake Ollama ({self.mode}) listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        """Shut down the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _load_recordings(self):
+        try:
+            with open(self.recordings_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.recordings[entry['key']] = entry['response']
+            logger.info(f"📼 Loaded {len(self.recordings)} recorded responses")
+        except FileNotFoundError:
+            pass
+
+    def _random(self) -> float:
+        with self.rng_lock:
+            return self.rng.random()
+
+    def _sample_latency(self) -> float:
+        with self.rng_lock:
+            return self.latency(self.rng)
+
+    def _count(self, key: str, delta: int = 1):
+        with self.lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    # ------------------------------------------------------------ responses
+
+    def _response_text(self, model: str, prompt: str, payload: Dict) -> Optional[str]:
+        """Response text by mode; None = replay miss in strict mode."""
+        key = prompt_key(model, prompt)
+
+        if self.mode in ('replay', 'record') and key in self.recordings:
+            self._count('replayed')
+            return self.recordings[key]
+
+        if self.mode == 'record' and self.upstream:
+            upstream_payload = dict(payload, stream=False)
+            request = urllib.request.Request(
+                self.upstream, data=json.dumps(upstream_payload).encode(),
+                headers={'Content-Type': 'application/json'}
+            )
+            with urllib.request.urlopen(request, timeout=self.hang_seconds) as resp:
+                text = json.loads(resp.read()).get('response', '')
+            with self.lock:
+                self.recordings[key] = text
+                with open(self.recordings_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'key': key, 'model': model, 'response': text},
+                                       ensure_ascii=False) + '\n')
+            self._count('recorded')
+            return text
+
+        if self.mode == 'replay':
+            self._count('replay_misses')
+            if self.strict:
+                return None
+
+        with self.rng_lock:
+            text = synthesize_response(prompt, self.rng)
+        self._count('synthesized')
+        return text
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, code: int, payload: Dict):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith('/api/tags'):
+                    self._send_json(200, {"models": [{"name": m} for m in server.models]})
+                elif self.path.startswith('/stats'):
+                    with server.lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if not self.path.startswith('/api/generate'):
+                    self._send_json(404, {"error": "not found"})
+                    return
+
+                server._count('requests')
+                if server.slots is not None:
+                    if not server.slots.acquire(blocking=not server.reject_when_busy):
+                        server._count('rejected_busy')
+                        self._send_json(503, {"error": "server busy"})
+                        return
+                server._count('in_flight')
+                try:
+                    self._generate(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    server._count('client_disconnects')
+                except Exception as e:
+                    logger.error(f"Fake Ollama error: {e}")
+                    self._send_json(502, {"error": str(e)})
+                finally:
+                    server._count('in_flight', -1)
+                    if server.slots is not None:
+                        server.slots.release()
+
+            def _generate(self, payload: Dict):
+                if server._random() < server.timeout_rate:
+                    server._count('injected_timeouts')
+                    time.sleep(server.hang_seconds)
+                    return
+                delay = server._sample_latency()
+                if server._random() < server.error_rate:
+                    server._count('injected_errors')
+                    time.sleep(delay)
+                    self._send_json(server.error_status, {"error": "injected failure"})
+                    return
+
+                model = payload.get('model', '')
+                text = server.responder(model, payload.get('prompt', '')) if server.responder else None
+                if isinstance(text, int):
+                    time.sleep(delay)
+                    self._send_json(text, {"error": "scripted failure"})
+                    return
+                if text is None:
+                    text = server._response_text(model, payload.get('prompt', ''), payload)
+                if text is None:
+                    time.sleep(delay)
+                    self._send_json(404, {"error": "no recording for prompt"})
+                    return
+
+                num_predict = payload.get('options', {}).get('num_predict')
+                tokens = re.findall(r'\S+\s*|\s+', text)
+                if num_predict:
+                    tokens = tokens[:num_predict]
+
+                if not payload.get('stream', True):
+                    time.sleep(delay)
+                    self._send_json(200, {
+                        "model": model, "response": ''.join(tokens), "done": True,
+                        "eval_count": len(tokens), "total_duration": int(delay * 1e9),
+                    })
+                else:
+                    self._stream(model, tokens, delay)
+                server._count('completed')
+
+            def _stream(self, model: str, tokens: list, delay: float):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                per_token = delay / max(1, len(tokens))
+                for token in tokens:
+                    time.sleep(per_token)
+                    self._chunk({"model": model, "response": token, "done": False})
+                self._chunk({"model": model, "response": "", "done": True,
+                             "eval_count": len(tokens), "total_duration": int(delay * 1e9)})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, payload: Dict):
+                data = json.dumps(payload, ensure_ascii=False).encode('utf-8') + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline load testing")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--mode', choices=['synth', 'replay', 'record'], default='synth')
+    parser.add_argument('--recordings', default='/tmp/ollama_recordings.jsonl')
+    parser.add_argument('--upstream', default='http://localhost:11434/api/generate',
+                        help='Real Ollama /api/generate URL for record mode')
+    parser.add_argument('--latency', default='const:0',
+                        help='const:S | uniform:A,B | normal:MU,SIGMA | lognormal:MU,SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--hang-seconds', type=float, default=600.0)
+    parser.add_argument('--max-concurrency', type=int, default=0, help='0 = unlimited')
+    parser.add_argument('--reject-when-busy', action='store_true')
+    parser.add_argument('--strict', action='store_true', help='404 on replay miss')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--models', nargs='*', default=[], help='Models listed by /api/tags')
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        host=args.host, port=args.port, mode=args.mode, recordings=args.recordings,
+        upstream=args.upstream, latency=args.latency, error_rate=args.error_rate,
+        error_status=args.error_status, timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds, max_concurrency=args.max_concurrency,
+        reject_when_busy=args.reject_when_busy, strict=args.strict, seed=args.seed,
+        models=args.models,
+    )
+    logger.info(f"🧪 Fake Ollama ({args.mode}) on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        logger.info(f"📊 Stats: {server.stats}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
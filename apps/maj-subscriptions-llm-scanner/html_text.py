@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+HTML Text Normalizer v2.3
+=========================
+
+HTML → text stage that runs once per email. Its output is stored on the
+email record and every consumer (SubscriptionScorer, the LLM prompt,
+MarketingEmailDetector) reads it from there instead of scanning the raw
+markup again.
+
+One regex pass over the HTML yields:
+- `text`: visible text (script/style/title and comments dropped, entities
+  decoded, block elements → line breaks, other tags → word boundary so
+  adjacent links don't merge into one word, source whitespace collapsed)
+- structural counts: links (<a href>), images, tables, tracking pixels
+  (images of at most 1×1 px or hidden) and unsubscribe links (by href or
+  link text)
+- `list_unsubscribe`: the message has a List-Unsubscribe header
+  (normalize_message only)
+
+The same module lives in maj-subscriptions-llm-scanner and
+maj-subscriptions-local; keep the two copies identical.
+
+Usage:
+    record = normalize_message(msg)     # {'body': text, 'html': {...}}
+    html = html_to_text(html_body)      # {'text': ..., 'links': 12, 'tables': 1, ...}
+"""
+
+import re
+from html import unescape
+from typing import Any, Dict
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Comment | dropped element with content | tag (name + attributes) | <!DOCTYPE>, <?xml?>
+TOKEN_REGEX = re.compile(
+    r'<!--.*?(?:-->|\Z)'
+    r'|<(script|style|title)\b[^>]*>.*?</\1\s*>'
+    r'|<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>'
+    r'|<[!?][^>]*>',
+    re.IGNORECASE | re.DOTALL)
+
+# Elements that start a new line of text; any other tag separates words
+BLOCK_TAGS = {
+    'br', 'p', 'div', 'tr', 'li', 'ul', 'ol', 'table', 'tbody', 'thead', 'tfoot',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'blockquote', 'pre', 'center',
+    'section', 'article', 'header', 'footer', 'body',
+}
+LINE_BREAK = '\0'  # Placeholder: source newlines are whitespace, block tags are not
+
+HREF_REGEX = re.compile(r'\bhref\s*=', re.IGNORECASE)
+UNSUBSCRIBE_REGEX = re.compile(
+    r'unsubscribe|opt-?out|abmelden|abbestellen|odhl[aá]sit|zru[sš]it odb[eě]r|manage (?:your )?preferences',
+    re.IGNORECASE)
+DIMENSION_REGEX = re.compile(r'\b(width|height)\s*(?:=\s*["\']?|:\s*)(\d+)', re.IGNORECASE)
+HIDDEN_REGEX = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+WHITESPACE_REGEX = re.compile(r'\s+')
+
+COUNT_KEYS = ('links', 'images', 'tables', 'tracking_pixels', 'unsubscribe_links')
+
+
+def is_tracking_pixel(attrs: str) -> bool:
+    """<img> attributes of a hidden or at most 1×1 px image"""
+    if HIDDEN_REGEX.search(attrs):
+        return True
+    dims = {name.lower(): int(value) for name, value in DIMENSION_REGEX.findall(attrs)}
+    return len(dims) == 2 and max(dims.values()) <= 1
+
+
+def html_to_text(html: str) -> Dict[str, Any]:
+    """Visible text and structural counts of an HTML document (see module docstring)"""
+    counts = dict.fromkeys(COUNT_KEYS, 0)
+    if not html:
+        return {'text': '', 'has_html': False, **counts, 'list_unsubscribe': False}
+
+    if LINE_BREAK in html:
+        html = html.replace(LINE_BREAK, '')
+    parts = []
+    position = 0
+    link_start = None  # parts index where the open <a href>'s text starts
+    for match in TOKEN_REGEX.finditer(html):
+        if match.start() > position:
+            parts.append(html[position:match.start()])
+        position = match.end()
+        name = match.group(3)
+        if name is None:
+            continue
+        name = name.lower()
+        parts.append(LINE_BREAK if name in BLOCK_TAGS else ' ')
+
+        if match.group(2):  # Closing tag
+            if name == 'a' and link_start is not None:
+                if UNSUBSCRIBE_REGEX.search(''.join(parts[link_start:])):
+                    counts['unsubscribe_links'] += 1
+                link_start = None
+            continue
+        if name == 'a':
+            attrs = match.group(4)
+            if HREF_REGEX.search(attrs):
+                counts['links'] += 1
+                if UNSUBSCRIBE_REGEX.search(attrs):
+                    counts['unsubscribe_links'] += 1
+                    link_start = None
+                else:
+                    link_start = len(parts)
+        elif name == 'img':
+            counts['images'] += 1
+            if is_tracking_pixel(match.group(4)):
+                counts['tracking_pixels'] += 1
+        elif name == 'table':
+            counts['tables'] += 1
+    parts.append(html[position:])
+
+    text = WHITESPACE_REGEX.sub(' ', unescape(''.join(parts)))
+    lines = (line.strip() for line in text.split(LINE_BREAK))
+    return {
+        'text': '\n'.join(line for line in lines if line),
+        'has_html': True,
+        **counts,
+        'list_unsubscribe': False,
+    }
+
+
+def _decode(part) -> str:
+    payload = part.get_payload(decode=True)
+    return payload.decode('utf-8', errors='ignore') if payload else ''
+
+
+def normalize_message(msg) -> Dict[str, Any]:
+    """
+    Body text and HTML record of an email.message.Message in one walk
+
+    'body' is the text/plain part, or the HTML part's text for HTML-only
+    emails; 'html' is html_to_text() of the HTML part (all counts 0 if
+    there is none) with list_unsubscribe from the message headers.
+    Attachments are skipped.
+    """
+    plain, html = [], []
+    for part in msg.walk():
+        if part.is_multipart() or part.get_content_disposition() == 'attachment':
+            continue
+        content_type = part.get_content_type()
+        if content_type == 'text/plain':
+            plain.append(_decode(part))
+        elif content_type == 'text/html':
+            html.append(_decode(part))
+
+    record = html_to_text(''.join(html))
+    record['list_unsubscribe'] = bool(msg.get('List-Unsubscribe'))
+    body = ''.join(plain)
+    return {'body': body if body.strip() else record['text'], 'html': record}
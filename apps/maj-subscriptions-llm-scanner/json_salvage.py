@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+JSON Salvage v2.3
+=================
+
+Tolerant extraction of the verdict object from malformed LLM output.
+
+A response with trailing prose, a truncated object, single quotes, Python
+literals or trailing commas used to raise in `json.loads` and repeat the
+whole generation (up to MAX_RETRIES x 120 s). salvage_json() recovers the
+object in three steps:
+
+1. strict   - markdown fences stripped, plain json.loads
+2. repaired - first object re-tokenized: quotes normalized, literals fixed,
+              dangling fields dropped, missing brackets closed
+3. fields   - field-level regex extraction of known keys
+
+Only if all three fail does the caller send a cheap "fix this JSON"
+follow-up prompt (see build_repair_prompt) instead of a full re-analysis.
+"""
+
+import re
+import json
+from typing import Dict, List, Optional, Tuple
+
+
+MAX_REPAIR_INPUT_CHARS = 2000  # Original output quoted in the follow-up prompt
+
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null',
+             'True': 'true', 'False': 'false', 'None': 'null'}
+_dangling_tail = re.compile(r'(?:,\s*|(?<=[{\[])\s*)"(?:[^"\\]|\\.)*"\s*:?\s*$')
+_field_value = r'''\s*[:=]\s*("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|-?\d+(?:\.\d+)?|true|false|null|True|False|None)'''
+
+
+def strip_fences(text: str) -> str:
+    """Remove ```json ... ``` markdown fences."""
+    text = (text or '').strip()
+    if text.startswith('```'):
+        text = text.split('```')[1]
+        if text.startswith('json'):
+            text = text[4:]
+    return text.strip()
+
+
+def repair_json_text(fragment: str) -> str:
+    """
+    Re-tokenize the first JSON object in `fragment` into valid JSON text.
+
+    Handles single-quoted strings, Python literals, unquoted keys/values,
+    trailing commas, raw newlines in strings, trailing prose after the
+    object and truncation (open string / dangling key / missing brackets).
+    """
+    start = fragment.find('{')
+    if start < 0:
+        return ''
+    out = []
+    stack = []
+    quote = None
+    i, n = start, len(fragment)
+
+    def drop_trailing_comma():
+        while out and out[-1].isspace():
+            out.pop()
+        if out and out[-1] == ',':
+            out.pop()
+
+    while i < n:
+        ch = fragment[i]
+        if quote:
+            if ch == '\\':
+                nxt = fragment[i + 1] if i + 1 < n else ''
+                out.append("'" if nxt == "'" else ch + nxt)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == '\n':
+                out.append('\\n')
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in '"\'':
+            quote = ch
+            out.append('"')
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            drop_trailing_comma()
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                break
+        elif ch.isalpha() or ch == '_':
+            j = i
+            while j < n and (fragment[j].isalnum() or fragment[j] in '_-'):
+                j += 1
+            word = fragment[i:j]
+            rest = fragment[j:].lstrip()
+            if word in _LITERALS and not rest.startswith(':'):
+                out.append(_LITERALS[word])
+            else:
+                out.append(json.dumps(word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote:
+        out.append('"')
+    text = ''.join(out).rstrip()
+    while stack:
+        # Drop a dangling key / key: / trailing comma before closing
+        previous = None
+        while previous != text:
+            previous = text
+            if stack[-1] == '}':
+                text = _dangling_tail.sub('', text).rstrip()
+            text = text[:-1].rstrip() if text.endswith((',', ':')) else text
+        text += stack.pop()
+    return text
+
+
+def salvage_fields(text: str, fields: List[str]) -> Dict:
+    """Field-level extraction of known keys from arbitrary text."""
+    result = {}
+    for field in fields:
+        match = re.search(r'''["']?''' + re.escape(field) + r'''["']?''' + _field_value, text)
+        if not match:
+            continue
+        raw = match.group(1)
+        if raw[0] in '"\'':
+            result[field] = raw[1:-1].replace('\\' + raw[0], raw[0])
+        elif raw in _LITERALS:
+            result[field] = json.loads(_LITERALS[raw])
+        else:
+            result[field] = float(raw) if '.' in raw else int(raw)
+    return result
+
+
+def salvage_json(text: str, required_fields: List[str] = (), known_fields: List[str] = ()
+                 ) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Recover a JSON object from LLM output.
+
+    Returns (object, method) with method 'strict', 'repaired' or 'fields',
+    or (None, None) if the required fields cannot be recovered.
+    """
+    text = strip_fences(text)
+
+    def complete(obj) -> bool:
+        return isinstance(obj, dict) and all(f in obj for f in required_fields)
+
+    try:
+        obj = json.loads(text)
+        if complete(obj):
+            return obj, 'strict'
+    except ValueError:
+        pass
+
+    repaired = repair_json_text(text)
+    if repaired:
+        try:
+            obj = json.loads(repaired)
+            if complete(obj):
+                return obj, 'repaired'
+        except ValueError:
+            pass
+
+    obj = salvage_fields(text, list(dict.fromkeys(list(required_fields) + list(known_fields))))
+    if obj and complete(obj):
+        return obj, 'fields'
+    return None, None
+
+
+def build_repair_prompt(raw_output: str, fields: List[str]) -> str:
+    """Cheap follow-up prompt: fix the previous output, do not re-analyze."""
+    return f"""Následující výstup měl být validní JSON objekt s klíči: {', '.join(fields)}.
+Oprav ho na validní JSON. Neměň hodnoty, nic nového nevymýšlej, chybějící hodnoty nastav na null.
+Vrať POUZE JSON.
+
+VÝSTUP:
+{raw_output[:MAX_REPAIR_INPUT_CHARS]}
+"""
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+"""
+Ollama LLM Client v2.3
+======================
+
+Shared HTTP layer for the LLM scanners.
+
+Features:
+- Rolling latency histogram per client (p50/p95/p99)
+- Adaptive request timeout derived from observed p99
+- Circuit breaker (CLOSED → OPEN → HALF_OPEN) so a hung Ollama server
+  fails fast instead of burning OLLAMA_TIMEOUT × MAX_RETRIES per email
+- Cheap recovery probe via /api/tags
+- Multiple backends with per-backend model lists and weights,
+  least-outstanding-requests routing, health checks and failover
+- Streaming mode that closes the connection as soon as the required
+  JSON fields are complete, with per-task num_predict caps
+
+Version: 2.3.0
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from enum import Enum
+from typing import Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Adaptive timeout
+LATENCY_WINDOW = 200          # Rolling window of successful call latencies
+MIN_LATENCY_SAMPLES = 20      # Below this, fall back to the static timeout
+TIMEOUT_P99_MULTIPLIER = 2.0  # timeout = p99 * multiplier
+MIN_TIMEOUT = 15              # Never go below 15 s (cold model load)
+CONNECT_TIMEOUT = 5           # TCP connect timeout (s)
+
+# Histogram bucket upper bounds in seconds (last bucket = overflow)
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 30, 60, 90, 120, 180]
+
+# Circuit breaker
+FAILURE_THRESHOLD = 3         # Consecutive failures before opening
+RECOVERY_TIMEOUT = 30         # Seconds OPEN before a half-open probe
+PROBE_TIMEOUT = 5             # /api/tags probe timeout (s)
+
+# Health checks
+HEALTH_CHECK_INTERVAL = 30    # Background /api/tags check interval (s)
+
+# Per-task generation caps (num_predict = max tokens generated)
+NUM_PREDICT_CAPS = {
+    'email_classification': 300,     # is_subscription ... reasoning (~150 tokens)
+    'document_classification': 500,  # breakdown + tags + reasoning
+    'json_repair': 300,
+}
+
+
+# ============================================================================
+# EXCEPTIONS AND STATES
+# ============================================================================
+
+class CircuitState(Enum):
+    """Circuit breaker states."""
+    CLOSED = "CLOSED"        # Normal operation
+    OPEN = "OPEN"            # Failing fast, no requests sent
+    HALF_OPEN = "HALF_OPEN"  # Single trial request allowed
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    True for errors that say the backend is unhealthy (connection errors,
+    timeouts, 5xx). Client errors (4xx: unknown model, bad request) do not
+    count towards the circuit breaker.
+    """
+    if isinstance(error, requests.HTTPError):
+        status = getattr(error.response, 'status_code', None)
+        return status is None or status >= 500
+    return isinstance(error, requests.RequestException)
+
+
+# ============================================================================
+# LATENCY TRACKER
+# ============================================================================
+
+class LatencyTracker:
+    """Rolling latency window with histogram and percentile lookup."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, buckets: List[float] = None):
+        self.samples = deque(maxlen=window)
+        self.buckets = buckets or LATENCY_BUCKETS
+        self.histogram = [0] * (len(self.buckets) + 1)
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Record one call latency."""
+        with self.lock:
+            self.samples.append(seconds)
+            for i, upper in enumerate(self.buckets):
+                if seconds <= upper:
+                    self.histogram[i] += 1
+                    break
+            else:
+                self.histogram[-1] += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0-100) of the rolling window."""
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[idx]
+
+    def adaptive_timeout(self, default: float, minimum: float = MIN_TIMEOUT) -> float:
+        """
+        Derive request timeout from observed p99.
+
+        Uses `default` until MIN_LATENCY_SAMPLES are collected and never
+        exceeds it afterwards.
+        """
+        if len(self.samples) < MIN_LATENCY_SAMPLES:
+            return default
+        p99 = self.percentile(99)
+        return max(minimum, min(default, p99 * TIMEOUT_P99_MULTIPLIER))
+
+    def get_stats(self) -> Dict:
+        """Summary for statistics output."""
+        labels = [f"<={b}s" for b in self.buckets] + [f">{self.buckets[-1]}s"]
+        return {
+            'samples': len(self.samples),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'histogram': dict(zip(labels, self.histogram)),
+        }
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing."""
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD,
+                 recovery_timeout: float = RECOVERY_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent now."""
+        with self.lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = CircuitState.HALF_OPEN
+                self.probe_in_flight = False
+                logger.info("🟡 Circuit HALF_OPEN - probing LLM backend")
+            # HALF_OPEN: let exactly one trial request through
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self.lock:
+            if self.state != CircuitState.CLOSED:
+                logger.info("🟢 Circuit CLOSED - LLM backend recovered")
+            self.state = CircuitState.CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        """Count a failure; open the circuit when threshold is reached."""
+        with self.lock:
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == CircuitState.HALF_OPEN or \
+                    self.consecutive_failures >= self.failure_threshold:
+                if self.state != CircuitState.OPEN:
+                    self.times_opened += 1
+                    logger.warning(f"🔴 Circuit OPEN after {self.consecutive_failures} "
+                                   f"consecutive failures (retry in {self.recovery_timeout}s)")
+                self.state = CircuitState.OPEN
+                self.opened_at = time.monotonic()
+
+    def trip(self):
+        """Force the circuit open (failed health check)."""
+        with self.lock:
+            if self.state != CircuitState.OPEN:
+                self.times_opened += 1
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def seconds_until_probe(self) -> float:
+        """Seconds until an OPEN circuit allows a half-open probe."""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+
+
+# ============================================================================
+# STREAMING JSON
+# ============================================================================
+
+class StreamingJSONObject:
+    """
+    Incremental scanner for the first top-level JSON object in a token stream.
+
+    feed() returns True once the object is closed, or once every required
+    top-level field has a complete value (a ',' follows it at depth 1).
+    """
+
+    def __init__(self, required_fields: List[str] = None):
+        self.required = set(required_fields or [])
+        self.buffer = ""
+        self.pos = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.closed_at = None
+        self.cut_at = None
+        self.fields = {}
+
+    def feed(self, text: str) -> bool:
+        """Append streamed text; True when enough of the object is available."""
+        self.buffer += text
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.start is None:
+                if ch == '{':
+                    self.start = self.pos
+                    self.depth = 1
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in '{[':
+                self.depth += 1
+            elif ch in '}]':
+                self.depth -= 1
+                if self.depth == 0:
+                    self.pos += 1
+                    self.closed_at = self.pos
+                    return True
+            elif ch == ',' and self.depth == 1 and self.required:
+                if self._required_complete():
+                    self.cut_at = self.pos
+                    self.pos += 1
+                    return True
+            self.pos += 1
+        return False
+
+    def _required_complete(self) -> bool:
+        """Parse fields completed so far and check required ones."""
+        try:
+            self.fields = json.loads(self.buffer[self.start:self.pos] + '}')
+        except ValueError:
+            return False
+        return self.required.issubset(self.fields)
+
+    @property
+    def early_stop(self) -> bool:
+        """True if the object was cut before its closing brace."""
+        return self.cut_at is not None and self.closed_at is None
+
+    def text(self) -> str:
+        """Best JSON text available (closed object, cut object or raw buffer)."""
+        if self.closed_at is not None:
+            return self.buffer[self.start:self.closed_at]
+        if self.cut_at is not None:
+            return self.buffer[self.start:self.cut_at] + '}'
+        return self.buffer
+
+
+# ============================================================================
+# BACKEND
+# ============================================================================
+
+class OllamaBackend:
+    """One Ollama host with its own latency window, breaker and counters."""
+
+    def __init__(self, url: str, models: List[str] = None, weight: float = 1.0,
+                 timeout: float = 120,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 recovery_timeout: float = RECOVERY_TIMEOUT):
+        """
+        Initialize backend.
+
+        Args:
+            url: Full /api/generate URL
+            models: Models served by this host (None/empty = any model)
+            weight: Relative capacity; in-flight calls are divided by weight
+            timeout: Static timeout and upper bound of the adaptive timeout
+            failure_threshold: Consecutive failures before the circuit opens
+            recovery_timeout: Seconds before an open circuit is probed
+        """
+        self.url = url
+        self.models = list(models or [])
+        self.weight = max(0.01, float(weight))
+        self.timeout = timeout
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.in_flight = 0
+        self.started_at = time.monotonic()
+        self.stats = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'busy_seconds': 0.0,
+        }
+
+    @property
+    def tags_url(self) -> str:
+        """/api/tags URL derived from the generate URL."""
+        return self.url.rsplit('/api/', 1)[0] + '/api/tags'
+
+    def serves(self, model: str) -> bool:
+        """True if this backend is configured for the model."""
+        return not self.models or model in self.models
+
+    def load(self) -> float:
+        """Weighted outstanding requests (routing key)."""
+        return self.in_flight / self.weight
+
+    def current_timeout(self) -> float:
+        """Timeout that the next request to this backend will use."""
+        return self.latency.adaptive_timeout(self.timeout)
+
+    def check_health(self) -> bool:
+        """GET /api/tags; updates the breaker and returns health."""
+        try:
+            response = requests.get(self.tags_url, timeout=PROBE_TIMEOUT)
+            healthy = response.status_code == 200
+        except requests.RequestException:
+            healthy = False
+
+        if healthy:
+            self.breaker.record_success()
+        elif self.breaker.state != CircuitState.OPEN:
+            logger.warning(f"🩺 Health check failed: {self.url}")
+            self.breaker.trip()
+        return healthy
+
+    def get_stats(self) -> Dict:
+        """Per-backend statistics including throughput."""
+        elapsed = max(1e-9, time.monotonic() - self.started_at)
+        stats = dict(self.stats)
+        stats['busy_seconds'] = round(stats['busy_seconds'], 1)
+        stats['url'] = self.url
+        stats['weight'] = self.weight
+        stats['in_flight'] = self.in_flight
+        stats['circuit_state'] = self.breaker.state.value
+        stats['timeout_s'] = round(self.current_timeout(), 1)
+        stats['throughput_per_min'] = round(self.stats['successes'] / elapsed * 60, 2)
+        stats['latency'] = self.latency.get_stats()
+        return stats
+
+
+# ============================================================================
+# OLLAMA CLIENT
+# ============================================================================
+
+class OllamaClient:
+    """
+    Ollama /api/generate client with adaptive timeouts and circuit breakers.
+
+    Requests are routed to the healthy backend serving the model with the
+    fewest weighted in-flight calls; connection errors and 5xx responses
+    fail over to the next backend.
+    """
+
+    def __init__(self, url: str = None, model: str = None, timeout: float = 120,
+                 backends: List[Dict] = None,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 recovery_timeout: float = RECOVERY_TIMEOUT):
+        """
+        Initialize client.
+
+        Args:
+            url: Full /api/generate URL (single-backend shortcut)
+            model: Default model name
+            timeout: Static timeout, used until enough samples exist and
+                as the upper bound of the adaptive timeout
+            backends: List of {"url", "models", "weight"} dicts; overrides url
+            failure_threshold: Consecutive failures before a circuit opens
+            recovery_timeout: Seconds before an open circuit is probed
+        """
+        if not backends:
+            if not url:
+                raise ValueError("OllamaClient needs url or backends")
+            backends = [{"url": url, "models": [], "weight": 1}]
+
+        self.model = model
+        self.timeout = timeout
+        self.recovery_timeout = recovery_timeout
+        self.backends = [
+            OllamaBackend(
+                b['url'], b.get('models'), b.get('weight', 1),
+                timeout=b.get('timeout', timeout),
+                failure_threshold=failure_threshold,
+                recovery_timeout=recovery_timeout,
+            )
+            for b in backends
+        ]
+        self.lock = threading.Lock()
+        self.health_thread = None
+        self.health_stop = threading.Event()
+        self.stats = {
+            'calls': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'failovers': 0,
+            'rejected_open': 0,
+            'streamed': 0,
+            'early_stops': 0,
+            'tokens_generated': 0,
+            'tokens_saved': 0,
+        }
+
+    def _acquire_backend(self, model: str, exclude: set) -> Optional[OllamaBackend]:
+        """Pick least-loaded available backend for model and mark it in-flight."""
+        with self.lock:
+            candidates = [
+                b for b in self.backends
+                if b not in exclude and b.serves(model)
+            ]
+            # Closed circuits first, then ordered by weighted load and latency
+            candidates.sort(key=lambda b: (
+                b.breaker.state != CircuitState.CLOSED,
+                b.load(),
+                b.latency.percentile(50) or 0.0,
+            ))
+            for backend in candidates:
+                if backend.breaker.allow_request():
+                    backend.in_flight += 1
+                    return backend
+        return None
+
+    def _release_backend(self, backend: OllamaBackend):
+        with self.lock:
+            backend.in_flight -= 1
+
+    def generate(self, prompt: str, model: str = None, options: Dict = None,
+                 format: str = "json", task: str = None, stream: bool = False,
+                 required_fields: List[str] = None) -> str:
+        """
+        Call /api/generate and return the raw `response` text.
+
+        Args:
+            prompt: Prompt text
+            model: Model name (default: client model)
+            options: Ollama options
+            format: Ollama output format ("json" or None)
+            task: Key into NUM_PREDICT_CAPS; caps options.num_predict
+            stream: Stream tokens and stop early once the JSON object
+                (or all `required_fields`) is complete
+            required_fields: Top-level JSON keys that must be present
+
+        Raises:
+            CircuitOpenError: no backend for the model accepts requests
+            requests.Timeout: request exceeded adaptive timeout
+            requests.HTTPError: non-200 status
+            requests.RequestException: connection errors on all backends
+        """
+        model = model or self.model
+        options = dict(options or {})
+        if task in NUM_PREDICT_CAPS:
+            cap = NUM_PREDICT_CAPS[task]
+            options['num_predict'] = min(options.get('num_predict', cap), cap)
+
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+        }
+        if format:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+
+        tried = set()
+        last_error = None
+        while True:
+            backend = self._acquire_backend(model, tried)
+            if backend is None:
+                if last_error is not None:
+                    raise last_error
+                self.stats['rejected_open'] += 1
+                raise CircuitOpenError(
+                    f"No LLM backend available for {model}, "
+                    f"next probe in {self.seconds_until_probe():.0f}s")
+            tried.add(backend)
+            try:
+                return self._generate_on(backend, payload, required_fields)
+            except (requests.ConnectionError, requests.HTTPError) as e:
+                status = getattr(e.response, 'status_code', None) if isinstance(e, requests.HTTPError) else None
+                if status is not None and status < 500:
+                    raise  # Client error - another backend will not help
+                last_error = e
+                self.stats['failovers'] += 1
+                logger.warning(f"↪️  Failover from {backend.url}: {e}")
+            finally:
+                self._release_backend(backend)
+
+    def _generate_on(self, backend: OllamaBackend, payload: Dict,
+                     required_fields: List[str] = None) -> str:
+        """Send one request to one backend, updating its latency and breaker."""
+        timeout = backend.current_timeout()
+        self.stats['calls'] += 1
+        backend.stats['calls'] += 1
+        start = time.monotonic()
+        try:
+            if payload.get('stream'):
+                text = self._read_stream(backend, payload, timeout, start, required_fields)
+            else:
+                response = requests.post(backend.url, json=payload,
+                                         timeout=(CONNECT_TIMEOUT, timeout))
+                response.raise_for_status()
+                data = response.json()
+                text = data.get('response', '')
+                self.stats['tokens_generated'] += data.get('eval_count', 0)
+        except requests.Timeout:
+            # Record the timeout as a sample so p99 grows instead of
+            # spiralling down when the model is legitimately slow
+            elapsed = time.monotonic() - start
+            backend.latency.record(elapsed)
+            backend.stats['busy_seconds'] += elapsed
+            backend.stats['timeouts'] += 1
+            backend.stats['failures'] += 1
+            self.stats['timeouts'] += 1
+            self.stats['failures'] += 1
+            backend.breaker.record_failure()
+            raise
+        except Exception as e:
+            backend.stats['busy_seconds'] += time.monotonic() - start
+            backend.stats['failures'] += 1
+            self.stats['failures'] += 1
+            if is_backend_failure(e):
+                backend.breaker.record_failure()
+            else:
+                # 4xx / unparseable answer: the backend is up, the request was bad
+                backend.breaker.record_success()
+            raise
+
+        elapsed = time.monotonic() - start
+        backend.latency.record(elapsed)
+        backend.stats['busy_seconds'] += elapsed
+        backend.stats['successes'] += 1
+        backend.breaker.record_success()
+        return text
+
+    def _read_stream(self, backend: OllamaBackend, payload: Dict, timeout: float,
+                     start: float, required_fields: List[str] = None) -> str:
+        """
+        Read a streamed generation and close the connection once the JSON
+        verdict is complete (Ollama stops generating on disconnect).
+        """
+        parser = StreamingJSONObject(required_fields)
+        tokens = 0
+        response = requests.post(backend.url, json=payload, stream=True,
+                                 timeout=(CONNECT_TIMEOUT, timeout))
+        try:
+            response.raise_for_status()
+            done = False
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                tokens += 1
+                if chunk.get('done'):
+                    done = True
+                    tokens = chunk.get('eval_count', tokens)
+                if parser.feed(chunk.get('response', '')) or done:
+                    break
+                # Read timeout applies per chunk; enforce the total budget too
+                if time.monotonic() - start > timeout:
+                    raise requests.Timeout(f"Stream exceeded {timeout:.0f}s")
+        finally:
+            response.close()
+
+        self.stats['streamed'] += 1
+        self.stats['tokens_generated'] += tokens
+        if parser.early_stop:
+            cap = payload.get('options', {}).get('num_predict')
+            saved = max(0, cap - tokens) if cap else 0
+            self.stats['early_stops'] += 1
+            self.stats['tokens_saved'] += saved
+            logger.info(f"✂️  Early stop after {tokens} tokens "
+                        f"({'≤' + str(saved) + ' tokens saved' if cap else 'no num_predict cap'})")
+        return parser.text()
+
+    def check_health(self) -> int:
+        """Health-check all backends; returns number of healthy ones."""
+        return sum(1 for backend in self.backends if backend.check_health())
+
+    def probe(self) -> bool:
+        """
+        Check backend health with cheap /api/tags requests.
+
+        Closes circuits of healthy backends so parked work can be retried.
+        """
+        return self.check_health() > 0
+
+    def start_health_checks(self, interval: float = HEALTH_CHECK_INTERVAL):
+        """Run check_health() in a daemon thread every `interval` seconds."""
+        if self.health_thread and self.health_thread.is_alive():
+            return
+        self.health_stop.clear()
+
+        def loop():
+            while not self.health_stop.wait(interval):
+                try:
+                    self.check_health()
+                except Exception as e:
+                    logger.error(f"Health check error: {e}")
+
+        self.health_thread = threading.Thread(target=loop, daemon=True)
+        self.health_thread.start()
+
+    def stop_health_checks(self):
+        """Stop background health checks."""
+        self.health_stop.set()
+        if self.health_thread:
+            self.health_thread.join(timeout=2)
+
+    def seconds_until_probe(self) -> float:
+        """Seconds until any backend allows a request again."""
+        return min(b.breaker.seconds_until_probe() for b in self.backends)
+
+    def is_available(self) -> bool:
+        """True if at least one backend is not currently rejecting requests."""
+        return any(
+            b.breaker.state == CircuitState.CLOSED or b.breaker.seconds_until_probe() == 0
+            for b in self.backends
+        )
+
+    def get_stats(self) -> Dict:
+        """Client statistics for reports (aggregate + per backend)."""
+        merged = LatencyTracker()
+        for backend in self.backends:
+            for sample in list(backend.latency.samples):
+                merged.record(sample)
+
+        states = {b.breaker.state for b in self.backends}
+        if states == {CircuitState.CLOSED}:
+            circuit_state = CircuitState.CLOSED.value
+        elif CircuitState.CLOSED in states:
+            circuit_state = "DEGRADED"
+        else:
+            circuit_state = CircuitState.OPEN.value
+
+        stats = dict(self.stats)
+        stats['circuit_state'] = circuit_state
+        stats['circuit_opened'] = sum(b.breaker.times_opened for b in self.backends)
+        stats['timeout_s'] = round(max(b.current_timeout() for b in self.backends), 1)
+        stats['latency'] = merged.get_stats()
+        stats['backends'] = [b.get_stats() for b in self.backends]
+        return stats
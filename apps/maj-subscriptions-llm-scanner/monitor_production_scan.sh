@@ -21,6 +21,11 @@ else
     echo ""
 fi
 
+# Tabulka existuje? (v1 scanner nespouští schema_migrations - chybí rollupy i email_bodies)
+has_table() {
+    [ "$(sqlite3 /tmp/production_subscriptions.db "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = '$1'" 2>/dev/null)" = "1" ]
+}
+
 # Statistiky z databáze
 if [ -f /tmp/production_subscriptions.db ]; then
     echo "📈 DATABÁZOVÉ STATISTIKY:"
@@ -38,21 +43,44 @@ if [ -f /tmp/production_subscriptions.db ]; then
     AVG_CONF=$(sqlite3 /tmp/production_subscriptions.db "SELECT ROUND(AVG(confidence_score), 1) FROM email_evidence" 2>/dev/null || echo "0")
     echo "  Průměrná confidence: ${AVG_CONF}%"
 
+    # Úložiště těl emailů (komprimovaná, deduplikovaná; v1 scanner je ukládá inline)
+    if has_table email_bodies; then
+        BODIES=$(sqlite3 /tmp/production_subscriptions.db "SELECT COUNT(*) || ' (' || ROUND(COALESCE(SUM(LENGTH(data)), 0) / 1048576.0, 1) || ' MB)' FROM email_bodies" 2>/dev/null || echo "-")
+    else
+        BODIES=$(sqlite3 /tmp/production_subscriptions.db "SELECT COUNT(*) || ' inline (' || ROUND(COALESCE(SUM(LENGTH(email_body_full)), 0) / 1048576.0, 1) || ' MB, bez komprese)' FROM email_evidence WHERE email_body_full IS NOT NULL" 2>/dev/null || echo "-")
+    fi
+    echo "  Uložená těla: $BODIES"
+
     echo ""
 
     # Top 10 služeb
     if [ "$TOTAL_SUBS" -gt "0" ]; then
         echo "🏆 TOP 10 SLUŽEB:"
         echo "----------------------------------------"
-        sqlite3 /tmp/production_subscriptions.db "
-            SELECT s.name, COUNT(e.id) as count
-            FROM services s
-            LEFT JOIN email_evidence e ON s.id = e.service_id
-            WHERE s.detected_via = 'llm_scanner'
-            GROUP BY s.id
-            ORDER BY count DESC
-            LIMIT 10
-        " 2>/dev/null | awk '{printf "  %2d. %s\n", NR, $0}'
+        if has_table service_spend_summary; then
+            # Čte předpočítané součty (service_spend_summary), ne celou email_evidence
+            TOP_SQL="
+                SELECT s.name, r.emails, COALESCE(r.last_amount || ' ' || r.last_currency, '-')
+                FROM service_spend_summary r
+                JOIN services s ON s.id = r.service_id
+                WHERE s.detected_via = 'llm_scanner'
+                ORDER BY r.emails DESC
+                LIMIT 10
+            "
+        else
+            # DB bez migrací (v1 scanner): agregace přímo nad email_evidence
+            echo "  (service_spend_summary chybí, počítám z email_evidence)"
+            TOP_SQL="
+                SELECT s.name, COUNT(e.id) as count
+                FROM services s
+                LEFT JOIN email_evidence e ON s.id = e.service_id
+                WHERE s.detected_via = 'llm_scanner'
+                GROUP BY s.id
+                ORDER BY count DESC
+                LIMIT 10
+            "
+        fi
+        sqlite3 /tmp/production_subscriptions.db "$TOP_SQL" 2>/dev/null | awk '{printf "  %2d. %s\n", NR, $0}'
         echo ""
     fi
 fi
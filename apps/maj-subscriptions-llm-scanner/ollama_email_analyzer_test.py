@@ -4,13 +4,14 @@ Srovnávací test: Ollama LLM (kimi-k2:1t) vs Keyword Matching
 Testuje přesnost detekce předplatných v emailech
 """
 
+import os
 import sqlite3
 import json
 from pathlib import Path
 import requests
 
 # Ollama configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "kimi-k2:1t-cloud"  # 1 trillion parameters
 
 def analyze_email_with_llm(subject: str, sender: str, body: str) -> dict:
@@ -8,6 +8,7 @@ Model: kimi-k2:1t-cloud (1 trillion parameters via Ollama)
 Performance: ~95-100% accuracy based on test results
 """
 
+import os
 import mailbox
 import email.utils
 from email.header import decode_header
@@ -28,10 +29,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Ollama configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "kimi-k2:1t-cloud"  # 1 trillion parameters
 OLLAMA_TIMEOUT = 120  # 2 minutes per email
 
+# SQLite: one WAL connection per scanner, commit every N saved emails
+DB_COMMIT_ROWS = 50
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -20000",  # ~20 MB page cache
+    "PRAGMA busy_timeout = 30000",
+]
+
 # Quick keyword filter (pre-screening)
 SUBSCRIPTION_KEYWORDS = [
     'predplatne', 'predplatneho', 'subscription', 'abonnement',
@@ -57,6 +67,10 @@ class ProductionLLMScanner:
             'false_positives_rejected': 0,
             'errors': 0
         }
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        for pragma in SQLITE_PRAGMAS:
+            self.conn.execute(pragma)
+        self.pending_rows = 0  # Rows written since the last commit
 
     def decode_mime_words(self, s: str) -> str:
         """Decode MIME encoded words"""
@@ -218,13 +232,18 @@ VRAT POUZE VALIDNI JSON, BEZ DALSIHO TEXTU."""
                     return service_name
         return "Unknown"
 
+    def commit(self, force: bool = False):
+        """Commit once DB_COMMIT_ROWS rows are pending (or always if force)"""
+        if self.pending_rows and (force or self.pending_rows >= DB_COMMIT_ROWS):
+            self.conn.commit()
+            self.pending_rows = 0
+
     def get_or_create_service(self, service_name: str, llm_result: Dict) -> Optional[int]:
         """Find or create service in database"""
         if not service_name or service_name == "Unknown":
             return None
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.conn.cursor()
 
         # Try to find existing service
         cursor.execute('SELECT id FROM services WHERE name = ?', (service_name,))
@@ -249,19 +268,16 @@ VRAT POUZE VALIDNI JSON, BEZ DALSIHO TEXTU."""
                 'llm_scanner'
             ))
             service_id = cursor.lastrowid
+            self.pending_rows += 1
             logger.info(f"Created new service: {service_name} (ID: {service_id})")
 
-        conn.commit()
-        conn.close()
-
         return service_id
 
     def save_email_evidence(self, service_id: Optional[int], message_id: str,
                            subject: str, sender: str, recipient: str,
                            body: str, date: datetime, llm_result: Dict):
-        """Save email evidence to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Save email evidence to database (committed in batches)"""
+        cursor = self.conn.cursor()
 
         body_compact = body[:1000] if body else ""
 
@@ -290,7 +306,8 @@ VRAT POUZE VALIDNI JSON, BEZ DALSIHO TEXTU."""
                 self.model
             ))
 
-            conn.commit()
+            self.pending_rows += 1
+            self.commit()
             logger.info(f"Saved email evidence: {subject[:50]}...")
 
         except sqlite3.IntegrityError:
@@ -298,8 +315,6 @@ VRAT POUZE VALIDNI JSON, BEZ DALSIHO TEXTU."""
         except Exception as e:
             logger.error(f"Database save error: {e}")
             self.stats['errors'] += 1
-        finally:
-            conn.close()
 
     def scan_thunderbird_mbox(self, mbox_path: Path, days_back: int = 365) -> List[Dict]:
         """
@@ -390,6 +405,7 @@ VRAT POUZE VALIDNI JSON, BEZ DALSIHO TEXTU."""
             logger.error(f"Mbox reading error: {e}")
             self.stats['errors'] += 1
 
+        self.commit(force=True)
         return results
 
     def scan_thunderbird_profile(self, profile_path: Path, days_back: int = 365) -> List[Dict]:
@@ -14,6 +14,7 @@ Model: kimi-k2:1t-cloud (1 trillion parameters via Ollama)
 Performance: Target >98% accuracy
 """
 
+import os
 import mailbox
 import email.utils
 from email.header import decode_header
@@ -21,14 +22,31 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import sqlite3
 import requests
-import json
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 import re
 import logging
 import time
 import sys
+import random
+from collections import deque
 from tqdm import tqdm
 
+from llm_client import OllamaClient, CircuitOpenError
+from body_condenser import condense_body
+from html_text import normalize_message
+from template_index import TemplateIndex
+from sender_rules import SenderRuleTable
+from json_salvage import salvage_json, build_repair_prompt
+from scan_scheduler import ScanBudget, RecallEstimator, parse_duration
+from subscription_scorer import SubscriptionScorer
+from service_registry import ServiceRegistry
+from db_writer import DBWriter
+import body_store
+import scan_checkpoint
+import schema_migrations
+from scan_checkpoint import MboxCheckpoint, message_offsets
+from body_store import BodyStore
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -41,10 +59,65 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Ollama configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "kimi-k2:1t-cloud"  # 1 trillion parameters
-OLLAMA_TIMEOUT = 120  # 2 minutes per email
+OLLAMA_TIMEOUT = 120  # 2 minutes per email (upper bound, adaptive from p99)
 MAX_RETRIES = 3  # Exponential backoff retries
+RETRY_QUEUE_MAX = 1000  # Emails parked while LLM circuit is open
+RECOVERY_MAX_WAIT = 600  # Max seconds to wait for LLM recovery at end of scan
+
+# Two-tier model cascade: small local model first, escalate uncertain emails
+CASCADE_ENABLED = True
+SMALL_MODEL_NAME = "qwen2.5:32b"  # Fast local model (first tier)
+CASCADE_ACCEPT_CONFIDENCE = 85  # Small-model verdicts below this (or without confidence) → ask MODEL_NAME
+
+# Prompt body: salient lines (amounts, dates, renewal keywords, signature)
+PROMPT_BODY_TOKENS = 500  # ~2000 chars budget
+
+# Template reuse: near-duplicate emails (same sender domain, SimHash over
+# masked subject+body) reuse a prior verdict; amount/date re-extracted locally
+TEMPLATE_REUSE_ENABLED = True
+TEMPLATE_SIMILARITY = 0.92  # 1 - hamming/64
+TEMPLATE_SPOT_CHECK_RATE = 0.05  # Fraction of template hits re-checked by the LLM
+
+# Sender rules: (sender, subject pattern) → verdict learned from LLM verdicts
+SENDER_RULES_ENABLED = True
+RULE_AUDIT_RATE = 0.1  # Fraction of rule hits still sent to the LLM (drift check)
+
+# Streaming: stop generation once the verdict fields are complete
+# ("reasoning" comes last in the prompt, so it is cut when the model rambles)
+STREAM_RESPONSES = True
+REQUIRED_FIELDS = [
+    'is_subscription', 'confidence', 'service_name',
+    'amount', 'currency', 'subscription_type',
+]
+
+# Malformed output: salvage locally, then one cheap "fix this JSON" prompt
+# (instead of repeating the full analysis via analyze_with_llm_retry)
+SALVAGE_REQUIRED_FIELDS = ['is_subscription']
+VERDICT_FIELDS = REQUIRED_FIELDS + ['reasoning']
+
+# Ollama backends (least-outstanding-requests load balancing + failover)
+# weight = relative capacity, models = models served by the host
+OLLAMA_BACKENDS = [
+    {"url": OLLAMA_URL, "models": [MODEL_NAME, SMALL_MODEL_NAME], "weight": 1},
+    # {"url": "http://192.168.10.83:11434/api/generate", "models": [SMALL_MODEL_NAME], "weight": 1},
+]
+HEALTH_CHECK_INTERVAL = 30  # Background /api/tags check of all backends (s), None = off
+
+# SQLite: one long-lived WAL connection, commits batched with the checkpoint
+DB_COMMIT_ROWS = 50  # Commit after N written rows ...
+DB_COMMIT_SECONDS = 10.0  # ... or T seconds, whichever comes first
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # WAL + NORMAL: durable at checkpoint, no fsync per commit
+    "PRAGMA cache_size = -20000",  # ~20 MB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 30000",
+]
+# Write-behind: a writer thread owns the inserts, LLM work never waits on fsync
+WRITE_BEHIND = True
+WRITE_QUEUE_MAX = 1000  # Producers block (backpressure) when the queue is full
 
 # Quick keyword filter (pre-screening)
 SUBSCRIPTION_KEYWORDS = [
@@ -56,13 +129,73 @@ SUBSCRIPTION_KEYWORDS = [
 ]
 
 
+def build_prompt(subject: str, sender: str, body_text: str) -> str:
+    """Classification prompt (few-shot) for one email; body_text is already condensed"""
+    return f"""Analyzuj tento email a urči, jestli obsahuje informaci o předplatném/subscription.
+
+PŘÍKLADY PŘEDPLATNÉHO:
+- Měsíční faktura za službu (např. "Microsoft 365 Invoice")
+- Potvrzení o obnovení předplatného
+- Změna ceny předplatného
+- Zrušení předplatného
+- "Your subscription will renew"
+- "Payment failed for subscription"
+
+NENÍ PŘEDPLATNÉ:
+- Jednorázový nákup produktu
+- Reset hesla nebo bezpečnostní upozornění
+- Newsletter/marketing email bez platby
+- Upozornění na akci nebo slevu (pokud není o předplatném)
+- Oznámení o nové funkci
+- Pozvánka nebo sociální notifikace
+
+EMAIL:
+From: {sender}
+Subject: {subject}
+Body (key lines, […] = omitted):
+{body_text}
+
+Vrať POUZE validní JSON (bez markdown bloků) s:
+{{
+    "is_subscription": true nebo false,
+    "confidence": <0-100>,
+    "service_name": "<název služby>" nebo null,
+    "amount": <číslo> nebo null,
+    "currency": "CZK"/"USD"/"EUR" nebo null,
+    "subscription_type": "monthly"/"yearly"/"quarterly" nebo null,
+    "reasoning": "<stručné zdůvodnění max 200 znaků>"
+}}
+"""
+
+
 class ImprovedLLMScanner:
     """Improved LLM email scanner with enterprise-grade features"""
 
-    def __init__(self, db_path: str, ollama_url: str = OLLAMA_URL, model: str = MODEL_NAME):
+    def __init__(self, db_path: str, ollama_url: str = OLLAMA_URL, model: str = MODEL_NAME,
+                 backends: List[Dict] = None,
+                 small_model: Optional[str] = SMALL_MODEL_NAME if CASCADE_ENABLED else None,
+                 cascade_accept: int = CASCADE_ACCEPT_CONFIDENCE,
+                 template_similarity: Optional[float] = TEMPLATE_SIMILARITY if TEMPLATE_REUSE_ENABLED else None,
+                 spot_check_rate: float = TEMPLATE_SPOT_CHECK_RATE,
+                 sender_rules: bool = SENDER_RULES_ENABLED,
+                 rule_audit_rate: float = RULE_AUDIT_RATE,
+                 write_behind: bool = WRITE_BEHIND,
+                 health_check_interval: Optional[float] = HEALTH_CHECK_INTERVAL):
         self.db_path = db_path
         self.ollama_url = ollama_url
         self.model = model
+        self.small_model = small_model  # None = single-tier (large model only)
+        self.cascade_accept = cascade_accept
+        if backends is None and ollama_url == OLLAMA_URL:
+            backends = OLLAMA_BACKENDS
+        self.llm = OllamaClient(ollama_url, model, timeout=OLLAMA_TIMEOUT, backends=backends)
+        if health_check_interval:
+            # Closes circuits of recovered backends while work is parked
+            self.llm.start_health_checks(health_check_interval)
+        self.retry_queue = deque()  # Candidates parked while circuit is open
+        # None = every email goes to the LLM
+        self.templates = TemplateIndex(template_similarity) if template_similarity else None
+        self.spot_check_rate = spot_check_rate
         self.stats = {
             'total_scanned': 0,
             'keyword_filtered': 0,
@@ -70,97 +203,160 @@ class ImprovedLLMScanner:
             'subscriptions_found': 0,
             'false_positives_rejected': 0,
             'errors': 0,
-            'retries': 0
+            'retries': 0,
+            'parked': 0,
+            'unprocessed': 0,
+            'cascade_small_only': 0,
+            'cascade_escalated': 0,
+            'cascade_agreed': 0,
+            'small_model_seconds': 0.0,
+            'large_model_seconds': 0.0,
+            'large_model_calls': 0,
+            'template_reused': 0,
+            'template_spot_checks': 0,
+            'template_spot_check_mismatches': 0,
+            'rule_answered': 0,
+            'rule_audits': 0,
+            'rule_audit_mismatches': 0,
+            'json_salvaged': 0,
+            'json_repair_calls': 0,
+            'json_repair_failed': 0,
+            'deferred': 0,
+            'estimated_recall': None,
+            'prompts': 0,
+            'prompt_chars': 0,
+            'body_chars': 0
         }
         self.checkpoint_file = "/tmp/scan_checkpoint.json"
+        self.conn = self.open_database()
+        self.pending_rows = 0  # Rows written since the last commit
+        self.last_commit = time.monotonic()
+        self.checkpoint: Optional[MboxCheckpoint] = None  # Resume state of the running mbox scan
         self.init_database()
+        self.writer = (DBWriter(db_path, SQLITE_PRAGMAS, WRITE_QUEUE_MAX, DB_COMMIT_ROWS, DB_COMMIT_SECONDS)
+                       if write_behind else None)
+        self.services = ServiceRegistry(self.conn)
+        self.bodies = BodyStore(self.conn)
+        self.rules = SenderRuleTable(self.conn, write=self.write) if sender_rules else None
+        self.rule_audit_rate = rule_audit_rate
+
+    def open_database(self) -> sqlite3.Connection:
+        """Open the scanner's single connection (WAL, tuned pragmas)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def write(self, sql: str, params: tuple = ()):
+        """Write one row: queued to the writer thread, or on the scanner's connection"""
+        if self.writer:
+            self.writer.execute(sql, params)
+        else:
+            self.conn.execute(sql, params)
+        self.row_written()
 
-    def init_database(self):
-        """Initialize database with optimized schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Create indexes for performance
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_email_message_id
-            ON email_evidence(email_message_id)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_service_id
-            ON email_evidence(service_id)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_email_date
-            ON email_evidence(email_date)
-        ''')
-        cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_confidence_score
-            ON email_evidence(confidence_score DESC)
-        ''')
-
-        # Create checkpoint table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scan_checkpoints (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                mbox_path TEXT NOT NULL,
-                last_processed_index INTEGER,
-                scan_start_date TIMESTAMP,
-                last_update_date TIMESTAMP,
-                status TEXT
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
-        logger.info("✅ Database initialized with indexes")
-
-    def load_checkpoint(self, mbox_path: str) -> int:
-        """Load last checkpoint for resume capability"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT last_processed_index FROM scan_checkpoints
-            WHERE mbox_path = ? AND status = 'running'
-            ORDER BY id DESC LIMIT 1
-        ''', (str(mbox_path),))
-
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            last_idx = row[0]
-            logger.info(f"📍 Resuming from checkpoint: email #{last_idx}")
-            return last_idx
-        return 0
-
-    def save_checkpoint(self, mbox_path: str, index: int):
-        """Save checkpoint for resume capability"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def row_written(self, count: int = 1):
+        """Count rows written in the open transaction"""
+        self.pending_rows += count
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO scan_checkpoints (
-                mbox_path, last_processed_index, last_update_date, status
-            ) VALUES (?, ?, ?, ?)
-        ''', (str(mbox_path), index, datetime.now().isoformat(), 'running'))
+    def commit_due(self) -> bool:
+        """True if DB_COMMIT_ROWS rows or DB_COMMIT_SECONDS have accumulated"""
+        if not self.pending_rows:
+            return False
+        return (self.pending_rows >= DB_COMMIT_ROWS
+                or time.monotonic() - self.last_commit >= DB_COMMIT_SECONDS)
 
-        conn.commit()
-        conn.close()
+    def commit(self):
+        """
+        Commit the batch; the running scan's checkpoint goes into the same
+        transaction, so a crash never leaves rows newer than the checkpoint
+        """
+        if self.checkpoint is not None:
+            self.save_checkpoint(commit=False)
+        # Write-behind: the writer thread batches its own commits, and the
+        # checkpoint is queued after its rows so it never lands before them
+        if not self.writer:
+            self.conn.commit()
+        self.pending_rows = 0
+        self.last_commit = time.monotonic()
+
+    def flush(self):
+        """Wait until all queued writes are committed (before reading them back)"""
+        if self.writer:
+            if not self.writer.flush():
+                raise TimeoutError("DB writer did not commit the queued writes in time")
+        else:
+            self.conn.commit()
 
-    def finalize_checkpoint(self, mbox_path: str):
-        """Mark checkpoint as completed"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def close(self):
+        """
+        Commit pending rows (with the current checkpoint) and close the connection
 
-        cursor.execute('''
-            UPDATE scan_checkpoints
-            SET status = 'completed', last_update_date = ?
-            WHERE mbox_path = ? AND status = 'running'
-        ''', (datetime.now().isoformat(), str(mbox_path)))
+        Raises RuntimeError if the write-behind writer lost writes (failed
+        or did not finish draining); the connection is closed either way.
+        """
+        self.llm.stop_health_checks()
+        if self.conn is None:
+            return
+        try:
+            self.commit()
+        finally:
+            writer, self.writer = self.writer, None
+            try:
+                if writer:
+                    writer.close()
+            finally:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
 
-        conn.commit()
-        conn.close()
+    def init_database(self):
+        """Bring the schema up to date (versioned migrations, see schema_migrations.py)"""
+        applied = schema_migrations.migrate(self.conn)
+        logger.info(f"✅ Database initialized (schema v{schema_migrations.current_version(self.conn)}"
+                    f"{f', applied {applied}' if applied else ''})")
+
+    def load_checkpoint(self, mbox_path: str, offsets: List[Tuple]) -> MboxCheckpoint:
+        """Load the resume state of a running scan of this mbox"""
+        self.flush()
+        checkpoint = MboxCheckpoint.load(self.conn, mbox_path)
+
+        if not checkpoint.watermark and not checkpoint.completed:
+            # Pre-v2.3 databases: index-based row in scan_checkpoints
+            try:
+                row = self.conn.execute('''
+                    SELECT last_processed_index FROM scan_checkpoints
+                    WHERE mbox_path = ? AND status = 'running'
+                    ORDER BY id DESC LIMIT 1
+                ''', (str(mbox_path),)).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            if row and 0 < row[0] < len(offsets):
+                checkpoint.watermark = offsets[row[0]][1]
+
+        if checkpoint.watermark or checkpoint.completed:
+            done = sum(1 for _key, start, _end in offsets if checkpoint.is_done(start))
+            logger.info(f"📍 Resuming from checkpoint: {done}/{len(offsets)} emails done "
+                        f"(watermark {checkpoint.watermark}, {len(checkpoint.completed)} ranges beyond)")
+        return checkpoint
+
+    def save_checkpoint(self, commit: bool = True):
+        """Upsert the running scan's checkpoint (one row per mbox)"""
+        self.write(scan_checkpoint.UPSERT_SQL, self.checkpoint.row())
+        if commit:
+            self.commit()
+
+    def mark_done(self, candidate: Dict):
+        """Record a finished email in the checkpoint (in any order)"""
+        if self.checkpoint is not None and 'offset' in candidate:
+            self.checkpoint.mark_done(*candidate['offset'])
+
+    def finalize_checkpoint(self):
+        """Mark checkpoint as completed"""
+        self.checkpoint.finish()
+        self.commit()
+        self.checkpoint = None
+        self.flush()
         logger.info("✅ Checkpoint finalized")
 
     def decode_mime_words(self, s: str) -> str:
@@ -177,26 +373,17 @@ class ImprovedLLMScanner:
             logger.warning(f"MIME decode error: {e}")
             return str(s)
 
-    def get_email_body(self, msg) -> str:
-        """Extract plain text from email message"""
-        body = ""
+    def normalize_email(self, msg) -> Dict:
+        """Body text + HTML record (text, structural counts) - the only pass over the markup"""
         try:
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == "text/plain":
-                        try:
-                            payload = part.get_payload(decode=True)
-                            if payload:
-                                body += payload.decode('utf-8', errors='ignore')
-                        except:
-                            pass
-            else:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    body = payload.decode('utf-8', errors='ignore')
+            return normalize_message(msg)
         except Exception as e:
             logger.warning(f"Body extraction error: {e}")
-        return body
+            return {'body': '', 'html': None}
+
+    def get_email_body(self, msg) -> str:
+        """Extract plain text from email message (HTML-only emails: text of the HTML part)"""
+        return self.normalize_email(msg)['body']
 
     def quick_keyword_filter(self, subject: str, body: str) -> bool:
         """
@@ -218,13 +405,19 @@ class ImprovedLLMScanner:
                 return True
         return False
 
-    def analyze_with_llm_retry(self, subject: str, sender: str, body: str) -> Dict:
+    def analyze_with_llm_retry(self, subject: str, sender: str, body: str,
+                               model: str = None) -> Dict:
         """
         Analyze email with LLM with retry logic and exponential backoff
+
+        Raises CircuitOpenError when the LLM backend is down, so the caller
+        can park the email instead of stalling on it.
         """
         for attempt in range(MAX_RETRIES):
             try:
-                return self.analyze_with_llm(subject, sender, body)
+                return self.analyze_with_llm(subject, sender, body, model=model)
+            except CircuitOpenError:
+                raise
             except requests.Timeout:
                 self.stats['retries'] += 1
                 if attempt < MAX_RETRIES - 1:
@@ -232,6 +425,9 @@ class ImprovedLLMScanner:
                     logger.warning(f"⏳ Timeout, retry {attempt + 1}/{MAX_RETRIES} after {wait_time}s")
                     time.sleep(wait_time)
                 else:
+                    if not self.llm.is_available():
+                        # Backend went down during retries - park instead of rejecting
+                        raise CircuitOpenError("LLM circuit opened during retries")
                     logger.error(f"❌ Max retries reached for: {subject[:50]}")
                     return {
                         "is_subscription": False,
@@ -244,6 +440,9 @@ class ImprovedLLMScanner:
                 if attempt < MAX_RETRIES - 1:
                     time.sleep(2 ** attempt)
                 else:
+                    if not self.llm.is_available():
+                        # Connection errors / 5xx opened the circuit - park instead of rejecting
+                        raise CircuitOpenError("LLM circuit opened during retries")
                     return {
                         "is_subscription": False,
                         "confidence": 0,
@@ -251,89 +450,72 @@ class ImprovedLLMScanner:
                         "error": str(e)
                     }
 
-    def analyze_with_llm(self, subject: str, sender: str, body: str) -> Dict:
+    def analyze_with_llm(self, subject: str, sender: str, body: str, model: str = None) -> Dict:
         """
         Analyze email with improved LLM prompt (few-shot learning)
         """
-        prompt = f"""Analyzuj tento email a urči, jestli obsahuje informaci o předplatném/subscription.
+        body_text = condense_body(body, PROMPT_BODY_TOKENS)
+        prompt = build_prompt(subject, sender, body_text)
 
-PŘÍKLADY PŘEDPLATNÉHO:
-- Měsíční faktura za službu (např. "Microsoft 365 Invoice")
-- Potvrzení o obnovení předplatného
-- Změna ceny předplatného
-- Zrušení předplatného
-- "Your subscription will renew"
-- "Payment failed for subscription"
-
-NENÍ PŘEDPLATNÉ:
-- Jednorázový nákup produktu
-- Reset hesla nebo bezpečnostní upozornění
-- Newsletter/marketing email bez platby
-- Upozornění na akci nebo slevu (pokud není o předplatném)
-- Oznámení o nové funkci
-- Pozvánka nebo sociální notifikace
-
-EMAIL:
-From: {sender}
-Subject: {subject}
-Body (first 2000 chars):
-{body[:2000]}
-
-Vrať POUZE validní JSON (bez markdown bloků) s:
-{{
-    "is_subscription": true nebo false,
-    "confidence": <0-100>,
-    "service_name": "<název služby>" nebo null,
-    "amount": <číslo> nebo null,
-    "currency": "CZK"/"USD"/"EUR" nebo null,
-    "subscription_type": "monthly"/"yearly"/"quarterly" nebo null,
-    "reasoning": "<stručné zdůvodnění max 200 znaků>"
-}}
-"""
+        self.stats['prompts'] += 1
+        self.stats['prompt_chars'] += len(prompt)
+        self.stats['body_chars'] += len(body_text)
 
         try:
-            response = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "format": "json"
-                },
-                timeout=OLLAMA_TIMEOUT
-            )
-
-            if response.status_code != 200:
-                logger.error(f"Ollama API error: {response.status_code}")
-                self.stats['errors'] += 1
-                return {
-                    "is_subscription": False,
-                    "confidence": 0,
-                    "reasoning": f"API error: {response.status_code}",
-                    "error": response.text
-                }
-
-            result_data = response.json()
-            result_text = result_data.get('response', '').strip()
-
-            # Remove markdown code blocks if present
-            if result_text.startswith('```'):
-                result_text = result_text.split('```')[1]
-                if result_text.startswith('json'):
-                    result_text = result_text[4:]
-
-            result = json.loads(result_text)
+            result_text = self.llm.generate(
+                prompt, model=model or self.model, format="json",
+                task='email_classification', stream=STREAM_RESPONSES,
+                required_fields=REQUIRED_FIELDS
+            ).strip()
+
+            result, method = salvage_json(result_text, SALVAGE_REQUIRED_FIELDS, VERDICT_FIELDS)
+            if result is None:
+                result = self.repair_with_llm(result_text, model or self.model)
+            elif method != 'strict':
+                self.stats['json_salvaged'] += 1
+                logger.info(f"🩹 Salvaged malformed JSON ({method}): {subject[:40]}")
 
             logger.info(f"LLM: {'✅ SUB' if result.get('is_subscription') else '❌ NOT'} "
                        f"({result.get('confidence', 0)}%) - {subject[:40]}")
 
             return result
 
+        except CircuitOpenError:
+            raise
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else '?'
+            logger.error(f"Ollama API error: {status}")
+            self.stats['errors'] += 1
+            return {
+                "is_subscription": False,
+                "confidence": 0,
+                "reasoning": f"API error: {status}",
+                "error": e.response.text if e.response is not None else str(e)
+            }
         except Exception as e:
             logger.error(f"LLM analysis error: {e}")
             self.stats['errors'] += 1
             raise  # Re-raise for retry logic
 
+    def repair_with_llm(self, raw_output: str, model: str) -> Dict:
+        """
+        Ask for a JSON fix of an unparseable response (short prompt, small cap)
+
+        Uses the small cascade model when available. Raises ValueError if
+        the output still cannot be parsed, which falls back to a full retry.
+        """
+        self.stats['json_repair_calls'] += 1
+        prompt = build_repair_prompt(raw_output, VERDICT_FIELDS)
+        fixed_text = self.llm.generate(
+            prompt, model=self.small_model or model, format="json", task='json_repair'
+        )
+        result, _ = salvage_json(fixed_text, SALVAGE_REQUIRED_FIELDS, VERDICT_FIELDS)
+        if result is None:
+            self.stats['json_repair_failed'] += 1
+            raise ValueError(f"Unparseable LLM output after repair: {raw_output[:100]!r}")
+        logger.info("🩹 Repaired malformed JSON with follow-up prompt")
+        return result
+
     def extract_service_name_from_sender(self, sender: str) -> str:
         """Extract service name from email sender"""
         if '@' in sender:
@@ -350,23 +532,18 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
         if not service_name or service_name == "Unknown":
             return None
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Try to find existing service
-        cursor.execute('SELECT id FROM services WHERE name = ?', (service_name,))
-        row = cursor.fetchone()
+        # Registry lookup (canonical name: "Microsoft 365" → "microsoft")
+        service_id = self.services.lookup(service_name)
 
-        if row:
-            service_id = row[0]
-        else:
-            # Create new service
-            cursor.execute('''
+        if service_id is None:
+            # Create new service (the evidence row needs its id right away)
+            sql = '''
                 INSERT INTO services (
                     name, type, price_amount, price_currency,
                     subscription_type, status, detected_via
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            '''
+            params = (
                 service_name,
                 'ai',  # Default type
                 llm_result.get('amount'),
@@ -374,29 +551,30 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
                 llm_result.get('subscription_type'),
                 'active',
                 'llm_scanner_v2'
-            ))
-            service_id = cursor.lastrowid
+            )
+            if self.writer:
+                service_id = self.writer.call(lambda conn: conn.execute(sql, params).lastrowid)
+            else:
+                service_id = self.conn.execute(sql, params).lastrowid
+            self.services.register(service_name, service_id)
+            self.row_written()
             logger.info(f"✨ Created new service: {service_name} (ID: {service_id})")
 
-        conn.commit()
-        conn.close()
-
         return service_id
 
     def save_email_evidence(self, service_id: Optional[int], message_id: str,
                            subject: str, sender: str, recipient: str,
                            body: str, date: datetime, llm_result: Dict):
-        """Save email evidence to database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
+        """Save email evidence to database (committed with the next batch)"""
         body_compact = body[:1000] if body else ""
+        encoded = body_store.encode(body)
 
         try:
-            cursor.execute('''
+            # Write-behind: duplicates are rejected (and logged) by the writer thread
+            self.write('''
                 INSERT INTO email_evidence (
                     service_id, email_message_id, email_subject, email_from, email_to,
-                    email_date, email_body_compact, email_body_full, confidence_score,
+                    email_date, email_body_compact, email_body_hash, confidence_score,
                     detected_amount, detected_currency, detected_subscription_type,
                     llm_reasoning, llm_model
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -408,16 +586,17 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
                 recipient[:200],
                 date.isoformat(),
                 body_compact,
-                body,
+                encoded[0] if encoded else None,
                 llm_result.get('confidence', 0),
                 llm_result.get('amount'),
                 llm_result.get('currency'),
                 llm_result.get('subscription_type'),
                 llm_result.get('reasoning', '')[:500],
-                self.model
+                llm_result.get('model', self.model)
             ))
+            if encoded:
+                self.write(body_store.INSERT_REFERENCED_SQL, encoded + (encoded[0],))
 
-            conn.commit()
             logger.info(f"💾 Saved: {subject[:40]}...")
 
         except sqlite3.IntegrityError:
@@ -425,8 +604,273 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
         except Exception as e:
             logger.error(f"Database save error: {e}")
             self.stats['errors'] += 1
-        finally:
-            conn.close()
+
+    def save_verdict(self, message_id: str, model: str, tier: str, llm_result: Dict,
+                     latency: float, is_final: bool):
+        """Store one model's verdict (both cascade tiers are kept)"""
+        try:
+            self.write('''
+                INSERT INTO llm_verdicts (
+                    email_message_id, model, tier, is_subscription, confidence,
+                    reasoning, latency_seconds, is_final, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                message_id, model, tier,
+                1 if llm_result.get('is_subscription') else 0,
+                llm_result.get('confidence', 0),
+                str(llm_result.get('reasoning', ''))[:500],
+                round(latency, 3),
+                1 if is_final else 0,
+                datetime.now().isoformat()
+            ))
+        except Exception as e:
+            logger.error(f"Verdict save error: {e}")
+
+    def needs_escalation(self, small_result: Dict) -> bool:
+        """
+        True unless the small model is confident in its verdict
+
+        `confidence` is the model's certainty in its own answer (yes or no),
+        so low confidence means uncertain, not a confident "no". Only
+        verdicts at or above cascade_accept are final; errors and missing
+        or invalid confidence go to the large model.
+        """
+        if small_result.get('error'):
+            return True
+        try:
+            confidence = float(small_result['confidence'])
+        except (KeyError, TypeError, ValueError):
+            return True
+        return confidence < self.cascade_accept
+
+    def analyze_candidate(self, candidate: Dict) -> Dict:
+        """
+        Answer from a learned sender rule, else templates / model cascade
+
+        Every fresh LLM verdict updates the rule table; a sample of rule
+        hits (rule_audit_rate) still goes to the LLM to catch drift.
+        """
+        if not self.rules:
+            return self.analyze_with_templates(candidate)
+
+        subject, sender, body = candidate['subject'], candidate['sender'], candidate['body']
+        rule = self.rules.lookup(sender, subject)
+        if rule and 'rule_audit' not in candidate:
+            candidate['rule_audit'] = random.random() < self.rule_audit_rate
+
+        if rule and not candidate['rule_audit']:
+            result = self.rules.verdict(rule, subject, body)
+            self.stats['rule_answered'] += 1
+            logger.info(f"📏 Rule ({result['rule']['support']} verdicts, {rule['sender']}): {subject[:40]}")
+            self.save_verdict(candidate['message_id'], result.get('model') or self.model, 'rule',
+                              result, 0.0, True)
+            return result
+
+        result = self.analyze_with_templates(candidate)
+        if 'template' in result:
+            return result  # Not a fresh LLM verdict
+        if rule:
+            self.stats['rule_audits'] += 1
+            if bool(result.get('is_subscription')) != (rule['positives'] >= rule['negatives']):
+                self.stats['rule_audit_mismatches'] += 1
+                logger.warning(f"🔍 Rule audit mismatch ({rule['sender']}): {subject[:40]}")
+        self.rules.record(sender, subject, result)
+        return result
+
+    def analyze_with_templates(self, candidate: Dict) -> Dict:
+        """
+        Reuse a near-duplicate template verdict, or run the model cascade
+
+        A sample of template hits (spot_check_rate) still goes to the LLM;
+        a mismatch drops the template from the index.
+        """
+        if not self.templates:
+            return self.analyze_with_models(candidate)
+
+        subject, sender, body = candidate['subject'], candidate['sender'], candidate['body']
+        match = self.templates.lookup(sender, subject, body)
+        if match and 'spot_check' not in candidate:
+            candidate['spot_check'] = random.random() < self.spot_check_rate
+
+        if match and not candidate['spot_check']:
+            result = self.templates.reuse(match, subject, body)
+            self.stats['template_reused'] += 1
+            logger.info(f"♻️  Template ({match['similarity']:.2f} ~ {match['source_message_id']}): "
+                        f"{subject[:40]}")
+            self.save_verdict(candidate['message_id'], result.get('model', self.model), 'template',
+                              result, 0.0, True)
+            return result
+
+        result = self.analyze_with_models(candidate)
+        if match:
+            self.stats['template_spot_checks'] += 1
+            if bool(result.get('is_subscription')) != bool(match['verdict'].get('is_subscription')):
+                self.stats['template_spot_check_mismatches'] += 1
+                self.templates.remove(sender, match['source_message_id'])
+                logger.warning(f"🔍 Spot check mismatch, template dropped: {subject[:40]}")
+        self.templates.add(sender, subject, body, result, candidate['message_id'])
+        return result
+
+    def analyze_with_models(self, candidate: Dict) -> Dict:
+        """
+        Two-tier cascade: small model first, large model only for uncertain emails
+
+        The small-model verdict is cached on the candidate so a parked email
+        (circuit open during escalation) does not repeat the first tier.
+        """
+        subject, sender, body = candidate['subject'], candidate['sender'], candidate['body']
+        message_id = candidate['message_id']
+
+        if not self.small_model:
+            start = time.monotonic()
+            result = self.analyze_with_llm_retry(subject, sender, body, model=self.model)
+            elapsed = time.monotonic() - start
+            self.stats['large_model_seconds'] += elapsed
+            self.stats['large_model_calls'] += 1
+            result['model'] = self.model
+            self.save_verdict(message_id, self.model, 'large', result, elapsed, True)
+            return result
+
+        small_result = candidate.get('small_result')
+        if small_result is None:
+            start = time.monotonic()
+            small_result = self.analyze_with_llm_retry(subject, sender, body, model=self.small_model)
+            elapsed = time.monotonic() - start
+            self.stats['small_model_seconds'] += elapsed
+            small_result['model'] = self.small_model
+            candidate['small_result'] = small_result
+            candidate['small_latency'] = elapsed
+
+        if not self.needs_escalation(small_result):
+            self.stats['cascade_small_only'] += 1
+            self.save_verdict(message_id, self.small_model, 'small', small_result,
+                              candidate['small_latency'], True)
+            return small_result
+
+        start = time.monotonic()
+        large_result = self.analyze_with_llm_retry(subject, sender, body, model=self.model)
+        elapsed = time.monotonic() - start
+        self.stats['large_model_seconds'] += elapsed
+        self.stats['large_model_calls'] += 1
+        self.stats['cascade_escalated'] += 1
+        large_result['model'] = self.model
+        large_result['small_model_verdict'] = {
+            'is_subscription': bool(small_result.get('is_subscription')),
+            'confidence': small_result.get('confidence', 0),
+        }
+        if bool(small_result.get('is_subscription')) == bool(large_result.get('is_subscription')):
+            self.stats['cascade_agreed'] += 1
+
+        logger.info(f"⬆️  Escalated ({small_result.get('confidence', 0)}% from {self.small_model}): "
+                    f"{subject[:40]}")
+        self.save_verdict(message_id, self.small_model, 'small', small_result,
+                          candidate['small_latency'], False)
+        self.save_verdict(message_id, self.model, 'large', large_result, elapsed, True)
+        return large_result
+
+    def process_candidate(self, candidate: Dict, results: List[Dict]):
+        """
+        Run LLM analysis on a keyword-filtered email and persist the result
+
+        Raises CircuitOpenError (before any state change) if the LLM is down.
+        """
+        subject = candidate['subject']
+        sender = candidate['sender']
+        body = candidate['body']
+
+        llm_result = self.analyze_candidate(candidate)
+        self.stats['llm_analyzed'] += 1
+
+        if llm_result.get('is_subscription'):
+            service_name = llm_result.get('service_name') or self.extract_service_name_from_sender(sender)
+            service_id = self.get_or_create_service(service_name, llm_result)
+            self.save_email_evidence(
+                service_id, candidate['message_id'], subject, sender,
+                candidate['recipient'], body, candidate['date'], llm_result
+            )
+            self.stats['subscriptions_found'] += 1
+
+            results.append({
+                'service_name': service_name,
+                'service_id': service_id,
+                'subject': subject[:100],
+                'from': sender[:100],
+                'confidence': llm_result.get('confidence', 0),
+                'amount': llm_result.get('amount'),
+                'currency': llm_result.get('currency'),
+                'subscription_type': llm_result.get('subscription_type'),
+                'reasoning': llm_result.get('reasoning', '')[:200]
+            })
+        else:
+            self.stats['false_positives_rejected'] += 1
+
+    def park_candidate(self, candidate: Dict):
+        """Park email in retry queue while the LLM circuit is open"""
+        self.retry_queue.append(candidate)
+        self.stats['parked'] += 1
+        logger.warning(f"🅿️  Parked (LLM unavailable, queue={len(self.retry_queue)}): "
+                       f"{candidate['subject'][:40]}")
+
+        # Bounded queue: stop reading new emails until the backend recovers
+        if len(self.retry_queue) >= RETRY_QUEUE_MAX:
+            logger.warning(f"⏸️  Retry queue full ({RETRY_QUEUE_MAX}), waiting for LLM recovery")
+            while not self.llm.probe():
+                time.sleep(max(1.0, self.llm.recovery_timeout))
+
+    def drain_retry_queue(self, results: List[Dict], on_processed: Optional[Callable] = None):
+        """
+        Re-process parked emails; stops as soon as the circuit opens again
+
+        on_processed(candidate, is_subscription) is called for every parked
+        email the LLM analysed.
+        """
+        while self.retry_queue:
+            candidate = self.retry_queue[0]
+            found_before = self.stats['subscriptions_found']
+            try:
+                self.process_candidate(candidate, results)
+                if on_processed:
+                    on_processed(candidate, self.stats['subscriptions_found'] > found_before)
+            except CircuitOpenError:
+                return
+            except Exception as e:
+                logger.error(f"Parked email processing error at #{candidate['idx']}: {e}")
+                self.stats['errors'] += 1
+            self.retry_queue.popleft()
+            self.mark_done(candidate)
+        logger.info("✅ Retry queue drained")
+
+    def wait_and_drain_retry_queue(self, results: List[Dict], max_wait: float = RECOVERY_MAX_WAIT,
+                                   on_processed: Optional[Callable] = None):
+        """Probe for LLM recovery (up to max_wait seconds) and drain parked emails"""
+        deadline = time.monotonic() + max_wait
+        logger.info(f"🅿️  {len(self.retry_queue)} parked emails, probing LLM for recovery...")
+        while self.retry_queue and time.monotonic() < deadline:
+            if self.llm.is_available() or self.llm.probe():
+                self.drain_retry_queue(results, on_processed)
+            if self.retry_queue:
+                time.sleep(min(max(1.0, self.llm.seconds_until_probe()),
+                               max(0.0, deadline - time.monotonic())))
+
+    def build_candidate(self, idx: int, message) -> Dict:
+        """Decode date, headers and body of one mbox message"""
+        date_tuple = email.utils.parsedate_tz(message.get('Date', ''))
+        if date_tuple:
+            date_obj = datetime.fromtimestamp(email.utils.mktime_tz(date_tuple))
+        else:
+            date_obj = datetime.now()
+
+        normalized = self.normalize_email(message)
+        return {
+            'idx': idx,
+            'message_id': message.get('Message-ID', ''),
+            'subject': self.decode_mime_words(message.get('Subject', '')),
+            'sender': self.decode_mime_words(message.get('From', '')),
+            'recipient': self.decode_mime_words(message.get('To', '')),
+            'body': normalized['body'],
+            'html': normalized['html'],  # Counts for scorer/detectors, HTML is not re-scanned
+            'date': date_obj
+        }
 
     def scan_thunderbird_mbox(self, mbox_path: Path, days_back: int = 365, limit: int = None) -> List[Dict]:
         """
@@ -439,56 +883,40 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
 
         try:
             mbox = mailbox.mbox(str(mbox_path))
-            total_messages = len(mbox)
+            offsets = message_offsets(mbox)
 
-            # Load checkpoint
-            start_idx = self.load_checkpoint(mbox_path)
+            # Load checkpoint; finished emails are skipped without parsing them
+            self.checkpoint = self.load_checkpoint(mbox_path, offsets)
+            pending = [(idx, key, start, end) for idx, (key, start, end) in enumerate(offsets)
+                       if not self.checkpoint.is_done(start)]
 
             # Progress bar
             progress_bar = tqdm(
-                enumerate(mbox),
-                total=total_messages,
-                initial=start_idx,
+                pending,
+                total=len(offsets),
+                initial=len(offsets) - len(pending),
                 desc="Scanning emails",
                 unit="email"
             )
 
-            for idx, message in progress_bar:
-                # Skip if before checkpoint
-                if idx < start_idx:
-                    continue
-
+            for idx, key, start, end in progress_bar:
                 # Limit for testing
                 if limit and idx >= limit:
                     logger.info(f"🛑 Reached limit: {limit} emails")
                     break
 
                 self.stats['total_scanned'] += 1
+                candidate = {'idx': idx, 'offset': (start, end)}
 
                 try:
-                    # Parse date
-                    date_str = message.get('Date', '')
-                    date_tuple = email.utils.parsedate_tz(date_str)
-                    if date_tuple:
-                        timestamp = email.utils.mktime_tz(date_tuple)
-                        date_obj = datetime.fromtimestamp(timestamp)
-                    else:
-                        date_obj = datetime.now()
-
-                    if date_obj < cutoff_date:
+                    candidate.update(self.build_candidate(idx, mbox[key]))
+                    if candidate['date'] < cutoff_date:
+                        self.mark_done(candidate)
                         continue
 
-                    # Decode headers
-                    subject = self.decode_mime_words(message.get('Subject', ''))
-                    sender = self.decode_mime_words(message.get('From', ''))
-                    recipient = self.decode_mime_words(message.get('To', ''))
-                    message_id = message.get('Message-ID', '')
-
-                    # Get body
-                    body = self.get_email_body(message)
-
                     # STEP 1: Quick keyword filter
-                    if not self.quick_keyword_filter(subject, body):
+                    if not self.quick_keyword_filter(candidate['subject'], candidate['body']):
+                        self.mark_done(candidate)
                         continue
 
                     self.stats['keyword_filtered'] += 1
@@ -499,45 +927,41 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
                         'Found': self.stats['subscriptions_found']
                     })
 
-                    # STEP 2: LLM analysis with retry
-                    llm_result = self.analyze_with_llm_retry(subject, sender, body)
-                    self.stats['llm_analyzed'] += 1
-
-                    # STEP 3: Process result
-                    if llm_result.get('is_subscription'):
-                        service_name = llm_result.get('service_name') or self.extract_service_name_from_sender(sender)
-                        service_id = self.get_or_create_service(service_name, llm_result)
-                        self.save_email_evidence(
-                            service_id, message_id, subject, sender,
-                            recipient, body, date_obj, llm_result
-                        )
-                        self.stats['subscriptions_found'] += 1
-
-                        results.append({
-                            'service_name': service_name,
-                            'service_id': service_id,
-                            'subject': subject[:100],
-                            'from': sender[:100],
-                            'confidence': llm_result.get('confidence', 0),
-                            'amount': llm_result.get('amount'),
-                            'currency': llm_result.get('currency'),
-                            'subscription_type': llm_result.get('subscription_type'),
-                            'reasoning': llm_result.get('reasoning', '')[:200]
-                        })
-                    else:
-                        self.stats['false_positives_rejected'] += 1
-
-                    # Save checkpoint every 100 emails
-                    if idx % 100 == 0 and idx > 0:
-                        self.save_checkpoint(mbox_path, idx)
+                    # STEP 2+3: LLM analysis and result processing
+                    try:
+                        self.process_candidate(candidate, results)
+                        self.mark_done(candidate)
+                    except CircuitOpenError:
+                        # Parked emails stay below the watermark until processed
+                        self.park_candidate(candidate)
+
+                    # Retry parked emails once the backend is reachable again
+                    if self.retry_queue and self.llm.is_available():
+                        self.drain_retry_queue(results)
+
+                    # Commit batch + checkpoint together
+                    if self.commit_due():
+                        self.commit()
 
                 except Exception as e:
                     logger.error(f"Email processing error at #{idx}: {e}")
                     self.stats['errors'] += 1
+                    self.mark_done(candidate)
                     continue
 
-            # Finalize checkpoint
-            self.finalize_checkpoint(mbox_path)
+            # Give parked emails a last chance before finalizing
+            if self.retry_queue:
+                self.wait_and_drain_retry_queue(results)
+
+            if self.retry_queue:
+                # Leave checkpoint running; the next run picks up exactly the parked emails
+                self.stats['unprocessed'] += len(self.retry_queue)
+                self.save_checkpoint()
+                logger.error(f"❌ LLM still unavailable - {len(self.retry_queue)} emails left for next run")
+                self.retry_queue.clear()
+                self.checkpoint = None
+            else:
+                self.finalize_checkpoint()
 
         except Exception as e:
             logger.error(f"Mbox reading error: {e}")
@@ -545,6 +969,104 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
 
         return results
 
+    def scan_prioritized(self, mbox_path: Path, days_back: int = 365,
+                         deadline: Optional[float] = None, max_llm_calls: Optional[int] = None,
+                         limit: int = None) -> List[Dict]:
+        """
+        Value-ordered scan under a time / LLM call budget
+
+        Pass 1 ranks keyword-filtered emails by SubscriptionScorer (no LLM);
+        pass 2 sends them to the LLM best-first until the budget runs out.
+        Emails with a final verdict in llm_verdicts are skipped, so a rerun
+        continues with the next most promising emails.
+        """
+        logger.info(f"📧 Prioritized scan: {mbox_path}")
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        scorer = SubscriptionScorer(fuzzy=False)
+        results = []
+
+        self.flush()  # Verdicts still queued for the writer count as done
+        done = {row[0] for row in self.conn.execute(
+            'SELECT DISTINCT email_message_id FROM llm_verdicts WHERE is_final = 1')}
+
+        # Pass 1: cheap ranking
+        mbox = mailbox.mbox(str(mbox_path))
+        ranked = []
+        for idx, (key, message) in enumerate(tqdm(mbox.iteritems(), total=len(mbox),
+                                                  desc="Ranking emails", unit="email")):
+            if limit and idx >= limit:
+                break
+            self.stats['total_scanned'] += 1
+            try:
+                candidate = self.build_candidate(idx, message)
+                if candidate['date'] < cutoff_date:
+                    continue
+                if not self.quick_keyword_filter(candidate['subject'], candidate['body']):
+                    continue
+                self.stats['keyword_filtered'] += 1
+                if candidate['message_id'] and candidate['message_id'] in done:
+                    continue
+                score = scorer.score_email(candidate['subject'], candidate['sender'],
+                                           candidate['body'][:5000], html=candidate['html'])
+                ranked.append((score.confidence_percentage, idx, key))
+            except Exception as e:
+                logger.error(f"Ranking error at #{idx}: {e}")
+                self.stats['errors'] += 1
+
+        ranked.sort(key=lambda r: (-r[0], r[1]))
+        estimator = RecallEstimator([priority for priority, _, _ in ranked])
+
+        def record(candidate: Dict, is_subscription: bool):
+            estimator.record(candidate['priority'], is_subscription)
+
+        budget = ScanBudget(deadline, max_llm_calls)
+        calls_at_start = self.llm.stats['calls']
+        self.stats['deferred'] = 0
+        logger.info(f"📊 {len(ranked)} candidates ranked ({len(done)} already analyzed)")
+
+        # Pass 2: LLM best-first under budget
+        progress_bar = tqdm(ranked, desc="Analyzing (best-first)", unit="email")
+        for position, (priority, idx, key) in enumerate(progress_bar):
+            reason = budget.exhausted(self.llm.stats['calls'] - calls_at_start)
+            if reason:
+                self.stats['deferred'] = len(ranked) - position
+                logger.info(f"⏱️  Budget reached ({reason}), {self.stats['deferred']} candidates deferred")
+                break
+            try:
+                candidate = self.build_candidate(idx, mbox.get_message(key))
+                candidate['priority'] = priority
+                found_before = self.stats['subscriptions_found']
+                try:
+                    self.process_candidate(candidate, results)
+                    record(candidate, self.stats['subscriptions_found'] > found_before)
+                except CircuitOpenError:
+                    self.park_candidate(candidate)
+                if self.retry_queue and self.llm.is_available():
+                    self.drain_retry_queue(results, record)
+            except Exception as e:
+                logger.error(f"Email processing error at #{idx}: {e}")
+                self.stats['errors'] += 1
+            progress_bar.set_postfix({'Found': self.stats['subscriptions_found'],
+                                      'Recall~': f"{estimator.estimate()['recall']}%"})
+            if self.commit_due():
+                self.commit()
+
+        if self.retry_queue and not budget.exhausted(self.llm.stats['calls'] - calls_at_start):
+            self.wait_and_drain_retry_queue(results, on_processed=record)
+        if self.retry_queue:
+            self.stats['unprocessed'] += len(self.retry_queue)
+            logger.error(f"❌ {len(self.retry_queue)} parked emails left for next run")
+            self.retry_queue.clear()
+        self.commit()
+        self.flush()
+
+        estimate = estimator.estimate()
+        self.stats['estimated_recall'] = estimate['recall']
+        logger.info(f"🎯 Estimated recall: {estimate['recall']}% "
+                    f"({estimate['found']} found, ~{estimate['expected_missed']} expected "
+                    f"in {estimate['remaining']} unprocessed candidates)")
+        return results
+
     def print_statistics(self):
         """Print scanning statistics"""
         logger.info(f"\n{'='*80}")
@@ -556,9 +1078,66 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
         logger.info(f"Subscriptions found:         {self.stats['subscriptions_found']}")
         logger.info(f"False positives rejected:    {self.stats['false_positives_rejected']}")
         logger.info(f"Retries:                     {self.stats['retries']}")
+        logger.info(f"Parked (circuit open):       {self.stats['parked']}")
+        logger.info(f"Left for next run:           {self.stats['unprocessed']}")
+        if self.stats['estimated_recall'] is not None:
+            logger.info(f"Deferred (budget):           {self.stats['deferred']}")
+            logger.info(f"Estimated recall:            {self.stats['estimated_recall']}%")
         logger.info(f"Errors:                      {self.stats['errors']}")
         logger.info(f"{'='*80}")
 
+        llm_stats = self.llm.get_stats()
+        latency = llm_stats['latency']
+        logger.info(f"LLM calls: {llm_stats['calls']}, failures: {llm_stats['failures']}, "
+                    f"timeouts: {llm_stats['timeouts']}, circuit: {llm_stats['circuit_state']} "
+                    f"(opened {llm_stats['circuit_opened']}x)")
+        if latency['samples']:
+            logger.info(f"LLM latency p50/p95/p99: {latency['p50']:.1f}s / {latency['p95']:.1f}s / "
+                        f"{latency['p99']:.1f}s, adaptive timeout: {llm_stats['timeout_s']}s")
+            logger.info(f"LLM latency histogram: {latency['histogram']}")
+        if self.stats['prompts']:
+            avg_prompt = self.stats['prompt_chars'] / self.stats['prompts']
+            avg_body = self.stats['body_chars'] / self.stats['prompts']
+            logger.info(f"Avg prompt size: {avg_prompt:.0f} chars (~{avg_prompt / 4:.0f} tokens), "
+                        f"body {avg_body:.0f} chars")
+        if llm_stats['streamed']:
+            logger.info(f"LLM streaming: {llm_stats['early_stops']}/{llm_stats['streamed']} stopped early, "
+                        f"{llm_stats['tokens_generated']} tokens generated, "
+                        f"≤{llm_stats['tokens_saved']} tokens saved")
+        if self.templates and self.stats['llm_analyzed'] > 0:
+            reused = self.stats['template_reused']
+            logger.info(f"Template reuse: {reused}/{self.stats['llm_analyzed']} verdicts "
+                        f"({reused / self.stats['llm_analyzed'] * 100:.1f}%), "
+                        f"{len(self.templates.entries)} sender domains, "
+                        f"spot checks {self.stats['template_spot_checks']} "
+                        f"({self.stats['template_spot_check_mismatches']} mismatched)")
+        if self.rules and self.stats['llm_analyzed'] > 0:
+            rule_stats = self.rules.get_stats()
+            logger.info(f"Sender rules: {self.stats['rule_answered']} answered, "
+                        f"{rule_stats['active']}/{rule_stats['rules']} rules active, "
+                        f"audits {self.stats['rule_audits']} ({self.stats['rule_audit_mismatches']} mismatched)")
+        if self.stats['json_salvaged'] or self.stats['json_repair_calls']:
+            logger.info(f"Malformed JSON: {self.stats['json_salvaged']} salvaged locally, "
+                        f"{self.stats['json_repair_calls']} repair prompts "
+                        f"({self.stats['json_repair_failed']} failed)")
+        if self.small_model and self.stats['llm_analyzed'] > 0:
+            self.print_cascade_report()
+        registry = self.services.stats
+        if registry['hits'] or registry['misses']:
+            logger.info(f"Service registry: {len(self.services)} services, {registry['hits']} hits "
+                        f"({registry['merged']} near-identical names merged), {registry['misses']} new")
+        if self.writer:
+            writer = self.writer.get_stats()
+            logger.info(f"DB writer: {writer['applied']} rows in {writer['batches']} batches "
+                        f"({writer['failed']} rejected), queue depth {writer['queue_depth']}, "
+                        f"flush avg/max {writer['flush_seconds_avg']:.3f}s / {writer['flush_seconds_max']:.3f}s, "
+                        f"backpressure waits {writer['backpressure_waits']}")
+        if len(llm_stats['backends']) > 1:
+            logger.info(f"LLM failovers: {llm_stats['failovers']}")
+            for backend in llm_stats['backends']:
+                logger.info(f"  {backend['url']}: {backend['successes']} ok / {backend['failures']} failed, "
+                            f"{backend['throughput_per_min']}/min, circuit {backend['circuit_state']}")
+
         if self.stats['keyword_filtered'] > 0:
             accuracy = (self.stats['subscriptions_found'] / self.stats['keyword_filtered']) * 100
             logger.info(f"LLM Precision: {accuracy:.1f}% (subscriptions / keyword matches)")
@@ -568,9 +1147,33 @@ Vrať POUZE validní JSON (bez markdown bloků) s:
             logger.info(f"False positive rejection rate: {rejection_rate:.1f}%")
 
 
+    def print_cascade_report(self):
+        """Escalation rate, small/large agreement and estimated wall-clock savings"""
+        analyzed = self.stats['cascade_small_only'] + self.stats['cascade_escalated']
+        if analyzed == 0:
+            return
+        escalated = self.stats['cascade_escalated']
+        actual = self.stats['small_model_seconds'] + self.stats['large_model_seconds']
+
+        logger.info(f"Cascade: {self.small_model} → {self.model} (small model final at ≥{self.cascade_accept}%)")
+        logger.info(f"  Escalation rate:  {escalated / analyzed * 100:.1f}% ({escalated}/{analyzed})")
+        if escalated:
+            logger.info(f"  Agreement:        {self.stats['cascade_agreed'] / escalated * 100:.1f}% "
+                        f"of escalated emails")
+        if self.stats['large_model_calls']:
+            # Estimate large-only run from the observed average large-model latency
+            avg_large = self.stats['large_model_seconds'] / self.stats['large_model_calls']
+            large_only = avg_large * analyzed
+            saved = large_only - actual
+            logger.info(f"  Wall-clock:       {actual:.0f}s actual vs ~{large_only:.0f}s large-only "
+                        f"(saved ~{saved:.0f}s, {saved / large_only * 100 if large_only else 0:.1f}%)")
+        else:
+            logger.info(f"  Wall-clock:       {actual:.0f}s (no escalations)")
+
+
 def main():
     """Main entry point for testing"""
-    import sys
+    import argparse
 
     # Configuration
     DB_PATH = "/tmp/test_subscriptions_v2.db"
@@ -579,6 +1182,19 @@ def main():
     DAYS_BACK = 365
     TEST_LIMIT = 1000  # Test on 1000 emails
 
+    parser = argparse.ArgumentParser(description="LLM subscription scanner v2")
+    parser.add_argument("--mbox", default=str(INBOX_PATH), help="Thunderbird mbox file")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite database")
+    parser.add_argument("--days-back", type=int, default=DAYS_BACK)
+    parser.add_argument("--limit", type=int, default=TEST_LIMIT, help="Max emails to read (0 = all)")
+    parser.add_argument("--deadline", type=parse_duration,
+                        help="Prioritized scan time budget, e.g. 90m, 2h (best-first order)")
+    parser.add_argument("--max-llm-calls", type=int,
+                        help="Prioritized scan LLM call budget (best-first order)")
+    args = parser.parse_args()
+    DB_PATH, INBOX_PATH, TEST_LIMIT = args.db, Path(args.mbox), args.limit or None
+    prioritized = args.deadline is not None or args.max_llm_calls is not None
+
     # Create scanner
     scanner = ImprovedLLMScanner(DB_PATH)
 
@@ -587,9 +1203,16 @@ def main():
     logger.info(f"📂 Database: {DB_PATH}")
     logger.info(f"📧 INBOX: {INBOX_PATH}")
     logger.info(f"🔢 Limit: {TEST_LIMIT} emails")
+    if prioritized:
+        logger.info(f"🎯 Prioritized: deadline={args.deadline}s, max LLM calls={args.max_llm_calls}")
 
     try:
-        results = scanner.scan_thunderbird_mbox(INBOX_PATH, days_back=DAYS_BACK, limit=TEST_LIMIT)
+        if prioritized:
+            results = scanner.scan_prioritized(INBOX_PATH, days_back=args.days_back,
+                                               deadline=args.deadline, max_llm_calls=args.max_llm_calls,
+                                               limit=TEST_LIMIT)
+        else:
+            results = scanner.scan_thunderbird_mbox(INBOX_PATH, days_back=args.days_back, limit=TEST_LIMIT)
 
         # Print results
         logger.info(f"\n{'='*80}")
@@ -618,6 +1241,8 @@ def main():
     except Exception as e:
         logger.error(f"Fatal error: {e}")
         return 1
+    finally:
+        scanner.close()
 
 
 if __name__ == '__main__':
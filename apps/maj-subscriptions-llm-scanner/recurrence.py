@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Recurring Charge Inference v2.3
+===============================
+
+Billing period, next charge, price changes and churn per service, from the
+evidence timeline instead of the LLM's single-email subscription_type guess.
+
+One vectorized NumPy pass over all evidence (sorted by service, date):
+1. emails a few days apart (invoice + receipt + "payment successful")
+   collapse into one charge
+2. gaps between consecutive charges are binned to the nearest canonical
+   period (weekly / monthly / quarterly / yearly) within a tolerance; the
+   per-service histogram's dominant bin is the billing period
+3. next charge = last charge + mean gap of that bin; a service is churned
+   when it is more than CHURN_PERIODS periods overdue
+4. price changes = consecutive charges whose amounts differ; price_change
+   is the size of the most recent one
+
+Results are written back to `services` (subscription_type, status,
+price_amount plus the recurrence columns from ensure_schema()). Amounts
+are compared as stored (one currency per service).
+
+Usage:
+    python recurrence.py /tmp/production_subscriptions.db
+    python recurrence.py /tmp/production_subscriptions.db --dry-run
+"""
+
+import sys
+import sqlite3
+import logging
+import argparse
+from datetime import date
+from typing import Dict, List
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+PERIODS = ['weekly', 'monthly', 'quarterly', 'yearly']
+PERIOD_DAYS = [7.0, 30.44, 91.31, 365.25]
+PERIOD_TOLERANCE = 0.2  # Gap within ±20 % of a period counts for it
+MERGE_DAYS = 3          # Emails this close belong to the same charge
+MIN_INTERVALS = 2       # Gaps in the dominant bin needed to call it recurring
+MIN_SHARE = 0.5         # ...and their share of all the service's gaps
+CHURN_PERIODS = 1.5     # Overdue by this many periods → churned
+PRICE_EPSILON = 0.005   # Relative amount difference counted as a price change
+
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+# Recurrence columns added to services
+SERVICE_COLUMNS = {
+    'billing_period_days': 'REAL',
+    'last_charge_date': 'TEXT',
+    'next_charge_date': 'TEXT',
+    'price_change': 'REAL',
+    'price_changes': 'INTEGER',
+    'recurrence_confidence': 'REAL',
+}
+
+UPDATE_SQL = '''
+    UPDATE services SET
+        subscription_type = COALESCE(?, subscription_type),
+        status = COALESCE(?, status),
+        price_amount = COALESCE(?, price_amount),
+        billing_period_days = ?,
+        last_charge_date = ?,
+        next_charge_date = ?,
+        price_change = ?,
+        price_changes = ?,
+        recurrence_confidence = ?
+    WHERE id = ?
+'''
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """Add the recurrence columns to services if missing"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(services)')}
+    for column, column_type in SERVICE_COLUMNS.items():
+        if columns and column not in columns:
+            conn.execute(f'ALTER TABLE services ADD COLUMN {column} {column_type}')
+
+
+def _require_numpy():
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Recurring charge inference needs numpy (pip install numpy)")
+
+
+def load_timeline(conn: sqlite3.Connection) -> "np.ndarray":
+    """(service_id, day, amount) rows sorted by service and date; amount NaN if unknown"""
+    _require_numpy()
+    rows = conn.execute('''
+        SELECT service_id, julianday(substr(email_date, 1, 10)) - ? AS day,
+               -- Older rows may hold text ('9,99'): NaN instead of failing the whole array
+               CASE WHEN typeof(detected_amount) IN ('integer', 'real') THEN detected_amount END
+        FROM email_evidence
+        WHERE service_id IS NOT NULL AND day IS NOT NULL
+        ORDER BY service_id, day
+    ''', (UNIX_EPOCH_JULIAN_DAY,)).fetchall()
+    return np.array(rows, dtype=float).reshape(-1, 3)
+
+
+def _to_dates(days: "np.ndarray") -> List[str]:
+    return (np.datetime64('1970-01-01') + np.round(days).astype('timedelta64[D]')).astype(str).tolist()
+
+
+def infer(timeline: "np.ndarray", today: date = None) -> List[Dict]:
+    """
+    Recurrence estimate per service in the timeline (see module docstring).
+    `period` is None when no canonical period dominates.
+    """
+    _require_numpy()
+    if len(timeline) == 0:
+        return []
+    today = today or date.today()
+    today_day = float((np.datetime64(today.isoformat()) - np.datetime64('1970-01-01')).astype(int))
+    svc, day, amount = timeline[:, 0].astype(np.int64), timeline[:, 1], timeline[:, 2]
+
+    # 1. Charges: first email of each service + every email after a quiet spell
+    starts_charge = np.ones(len(day), dtype=bool)
+    starts_charge[1:] = (svc[1:] != svc[:-1]) | (np.diff(day) > MERGE_DAYS)
+    charge_start = np.flatnonzero(starts_charge)
+    charge_svc = svc[charge_start]
+    charge_day = day[charge_start]
+    charge_amount = np.fmax.reduceat(amount, charge_start)  # Any known amount of the charge's emails
+
+    services, first, counts = np.unique(charge_svc, return_index=True, return_counts=True)
+    n = len(services)
+    group = np.repeat(np.arange(n), counts)
+    last = first + counts - 1
+
+    # 2. Gap histogram over canonical periods
+    same = group[1:] == group[:-1]
+    gap = np.diff(charge_day)[same]
+    gap_group = group[1:][same]
+    distance = np.abs(np.log(np.maximum(gap, 0.5)[:, None] / np.array(PERIOD_DAYS)[None, :]))
+    nearest = distance.argmin(axis=1)
+    binned = distance[np.arange(len(gap)), nearest] <= np.log1p(PERIOD_TOLERANCE)
+
+    histogram = np.zeros((n, len(PERIODS)))
+    np.add.at(histogram, (gap_group[binned], nearest[binned]), 1)
+    intervals = np.bincount(gap_group, minlength=n)
+    best = histogram.argmax(axis=1)
+    best_count = histogram[np.arange(n), best]
+    share = best_count / np.maximum(intervals, 1)
+    detected = (best_count >= MIN_INTERVALS) & (share >= MIN_SHARE)
+    confidence = share * best_count / (best_count + 1)
+
+    in_best = binned & (nearest == best[gap_group])
+    gap_sum = np.bincount(gap_group, weights=np.where(in_best, gap, 0.0), minlength=n)
+    period_days = np.where(best_count > 0, gap_sum / np.maximum(best_count, 1), np.nan)
+
+    # 3. Next charge and churn
+    last_day = charge_day[last]
+    next_day = last_day + np.nan_to_num(period_days)
+    churned = detected & (today_day - last_day > CHURN_PERIODS * np.nan_to_num(period_days))
+
+    # 4. Prices over charges with a known amount
+    known = ~np.isnan(charge_amount)
+    known_amount = charge_amount[known]
+    known_group = group[known]
+    known_counts = np.bincount(known_group, minlength=n)
+    known_last = np.cumsum(known_counts) - 1
+    same_known = known_group[1:] == known_group[:-1]
+    changed = same_known & (np.abs(np.diff(known_amount)) > PRICE_EPSILON * np.abs(known_amount[:-1]))
+    price_changes = np.bincount(known_group[1:][changed], minlength=n)
+    price = np.full(n, np.nan)
+    has_price = known_counts >= 1
+    price[has_price] = known_amount[known_last[has_price]]
+    # Most recent change: last changed pair of each service (0 if the price never moved)
+    price_change = np.where(known_counts >= 2, 0.0, np.nan)
+    latest_change = np.full(n, -1)
+    changed_at = np.flatnonzero(changed)
+    np.maximum.at(latest_change, known_group[changed_at + 1], changed_at)
+    moved = latest_change >= 0
+    price_change[moved] = known_amount[latest_change[moved] + 1] - known_amount[latest_change[moved]]
+
+    last_dates, next_dates = _to_dates(last_day), _to_dates(next_day)
+    results = []
+    for i in range(n):
+        is_recurring = bool(detected[i])
+        results.append({
+            'service_id': int(services[i]),
+            'period': PERIODS[best[i]] if is_recurring else None,
+            'period_days': round(float(period_days[i]), 1) if is_recurring else None,
+            'confidence': round(float(confidence[i]), 3),
+            'charges': int(counts[i]),
+            'last_charge': last_dates[i],
+            'next_charge': next_dates[i] if is_recurring else None,
+            'status': ('churned' if churned[i] else 'active') if is_recurring else None,
+            'price': None if np.isnan(price[i]) else float(price[i]),
+            'price_change': None if np.isnan(price_change[i]) else round(float(price_change[i]), 2),
+            'price_changes': int(price_changes[i]),
+        })
+    return results
+
+
+def update_services(conn: sqlite3.Connection, today: date = None, dry_run: bool = False) -> List[Dict]:
+    """Infer recurrence for every service with evidence and store it in services"""
+    ensure_schema(conn)
+    results = infer(load_timeline(conn), today)
+    if not dry_run:
+        conn.executemany(UPDATE_SQL, [
+            (r['period'], r['status'], r['price'], r['period_days'], r['last_charge'],
+             r['next_charge'], r['price_change'], r['price_changes'], r['confidence'], r['service_id'])
+            for r in results
+        ])
+        conn.commit()
+    return results
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Recurring charge inference over evidence timelines')
+    parser.add_argument('db', help='Scanner SQLite database')
+    parser.add_argument('--dry-run', action='store_true', help='Print the estimates without writing them')
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        logger.error("❌ numpy is not installed (pip install numpy)")
+        return 1
+
+    conn = sqlite3.connect(args.db)
+    try:
+        results = update_services(conn, dry_run=args.dry_run)
+        names = dict(conn.execute('SELECT id, name FROM services'))
+        for r in results:
+            if r['period'] is None:
+                continue
+            change = f"  Δ {r['price_change']:+.2f}" if r['price_change'] else ""
+            print(f"{(names.get(r['service_id']) or '?')[:30]:30} {r['period']:9} {r['status']:8} "
+                  f"last {r['last_charge']}  next {r['next_charge']}  {r['charges']:3} charges{change}")
+        recurring = sum(1 for r in results if r['period'])
+        churned = sum(1 for r in results if r['status'] == 'churned')
+        logger.info(f"✅ {len(results)} services analyzed: {recurring} recurring, {churned} churned"
+                    + (" (dry run)" if args.dry_run else ""))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -124,6 +124,7 @@ def main():
 
     except KeyboardInterrupt:
         logger.warning("\n⚠️  Scan přerušen uživatelem (Ctrl+C)")
+        scanner.commit(force=True)
         logger.info(f"Částečné výsledky v: {DB_PATH}")
         scanner.print_statistics()
         return 130
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Scan Checkpoint v2.3
+====================
+
+Out-of-order-safe resume state for mbox scans.
+
+One row per mbox path in `mbox_checkpoints`:
+- watermark: byte offset below which every message is done
+- completed: byte ranges beyond the watermark that are already done
+  (adjacent messages merged), stored as "start+length,..."
+
+Workers may finish messages in any order (parallel LLM calls, parked
+emails retried later); mark_done() advances the watermark over every
+contiguous run of finished messages, so the completed set only holds the
+gaps left by the in-flight window. Saving is a single-row upsert whose size depends on that
+window, not on the mbox size. Resume skips exactly the done messages.
+
+Offsets come from mailbox.mbox's table of contents, so messages appended
+to the mbox later (Thunderbird) keep the existing offsets valid.
+"""
+
+import bisect
+import sqlite3
+import mailbox
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS mbox_checkpoints (
+        mbox_path TEXT PRIMARY KEY,
+        watermark INTEGER NOT NULL DEFAULT 0,
+        completed TEXT NOT NULL DEFAULT '',
+        status TEXT NOT NULL DEFAULT 'running',
+        scan_start_date TIMESTAMP,
+        last_update_date TIMESTAMP
+    )
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO mbox_checkpoints (
+        mbox_path, watermark, completed, status, scan_start_date, last_update_date
+    ) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(mbox_path) DO UPDATE SET
+        watermark = excluded.watermark,
+        completed = excluded.completed,
+        status = excluded.status,
+        scan_start_date = excluded.scan_start_date,
+        last_update_date = excluded.last_update_date
+'''
+
+
+def message_offsets(mbox: mailbox.mbox) -> List[Tuple[str, int, int]]:
+    """
+    (key, start, end) per message in file order; end is the next message's
+    start (the last message's own end), so finished neighbours join into
+    one range.
+    """
+    len(mbox)  # Builds the table of contents: mbox._toc = {key: (start, stop)}
+    entries = sorted((start, stop, key) for key, (start, stop) in mbox._toc.items())
+    if not entries:
+        return []
+    ends = [start for start, _stop, _key in entries[1:]] + [entries[-1][1]]
+    return [(key, start, end) for (start, _stop, key), end in zip(entries, ends)]
+
+
+def encode_completed(completed: Dict[int, int]) -> str:
+    """{start: end} → "start+length,..." (sorted)"""
+    return ','.join(f"{start}+{end - start}" for start, end in sorted(completed.items()))
+
+
+def decode_completed(text: str) -> Dict[int, int]:
+    completed = {}
+    for item in filter(None, (text or '').split(',')):
+        start, length = item.split('+')
+        completed[int(start)] = int(start) + int(length)
+    return completed
+
+
+class MboxCheckpoint:
+    """Low-watermark + completed ranges for one mbox (thread-safe)"""
+
+    def __init__(self, mbox_path: str, watermark: int = 0, completed: Dict[int, int] = None,
+                 status: str = 'running', scan_start_date: str = None):
+        self.mbox_path = str(mbox_path)
+        self.watermark = watermark
+        self.completed = dict(completed or {})  # start → end of each done range
+        self.ends = {end: start for start, end in self.completed.items()}
+        self.starts = None  # Sorted range starts for is_done(), rebuilt after changes
+        self.status = status
+        self.scan_start_date = scan_start_date or datetime.now().isoformat()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, mbox_path: str) -> "MboxCheckpoint":
+        """Saved state of a running scan, or a fresh checkpoint"""
+        conn.execute(CREATE_TABLE_SQL)
+        row = conn.execute('''
+            SELECT watermark, completed, scan_start_date FROM mbox_checkpoints
+            WHERE mbox_path = ? AND status = 'running'
+        ''', (str(mbox_path),)).fetchone()
+        if row is None:
+            return cls(mbox_path)
+        return cls(mbox_path, row[0], decode_completed(row[1]), 'running', row[2])
+
+    def is_done(self, start: int) -> bool:
+        """True if the message starting at this offset was finished"""
+        with self.lock:
+            if start < self.watermark:
+                return True
+            if self.starts is None:
+                self.starts = sorted(self.completed)
+            i = bisect.bisect_right(self.starts, start) - 1
+            return i >= 0 and start < self.completed[self.starts[i]]
+
+    def mark_done(self, start: int, end: int):
+        """Record one finished message [start, end); merge it with adjacent ranges"""
+        with self.lock:
+            if start < self.watermark or start in self.completed:
+                return
+            following = self.completed.pop(end, None)
+            if following is not None:
+                del self.ends[following]
+                end = following
+            preceding = self.ends.pop(start, None)
+            if preceding is not None:
+                del self.completed[preceding]
+                start = preceding
+            if start == self.watermark:
+                self.watermark = end
+            else:
+                self.completed[start] = end
+                self.ends[end] = start
+            self.starts = None
+
+    def finish(self):
+        with self.lock:
+            self.status = 'completed'
+
+    def row(self) -> Tuple:
+        """UPSERT_SQL parameters (a consistent snapshot)"""
+        with self.lock:
+            return (self.mbox_path, self.watermark, encode_completed(self.completed),
+                    self.status, self.scan_start_date, datetime.now().isoformat())
+
+    def __repr__(self) -> str:
+        return (f"MboxCheckpoint({self.mbox_path!r}, watermark={self.watermark}, "
+                f"completed={len(self.completed)}, status={self.status!r})")
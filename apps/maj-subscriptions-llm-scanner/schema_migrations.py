@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations v2.3
+======================
+
+Versioned schema for the subscriptions database.
+
+Every step in MIGRATIONS has a version number; applied versions are
+recorded in `schema_version`, so a database (fresh, or created by an older
+script) is brought up to date by running only the missing steps, in order.
+Steps are idempotent (IF NOT EXISTS, resumable data moves), so a step
+interrupted halfway is simply re-run.
+
+With --benchmark the top dashboard/scanner queries are timed before and
+after each step.
+
+Usage:
+    python schema_migrations.py /tmp/production_subscriptions.db
+    python schema_migrations.py /tmp/production_subscriptions.db --benchmark
+    python schema_migrations.py /tmp/production_subscriptions.db --status
+"""
+
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import statistics
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import body_store
+import evidence_search
+import recurrence
+import scan_checkpoint
+import sender_rules
+import spend_rollups
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BENCHMARK_REPEAT = 3
+
+# Top queries of the monitoring script and the scanner
+BENCHMARK_QUERIES = {
+    'evidence_count': 'SELECT COUNT(*) FROM email_evidence',
+    'avg_confidence': 'SELECT ROUND(AVG(confidence_score), 1) FROM email_evidence',
+    'llm_services': "SELECT COUNT(*) FROM services WHERE detected_via = 'llm_scanner_v2'",
+    'top_services': '''
+        SELECT s.name, COUNT(e.id) AS count
+        FROM services s
+        LEFT JOIN email_evidence e ON s.id = e.service_id
+        WHERE s.detected_via = 'llm_scanner_v2'
+        GROUP BY s.id
+        ORDER BY count DESC
+        LIMIT 10
+    ''',
+    'service_history': '''
+        SELECT service_id, email_date, detected_amount, detected_currency
+        FROM email_evidence
+        WHERE service_id = (SELECT MIN(id) FROM services)
+        ORDER BY email_date
+    ''',
+    'final_verdicts': 'SELECT DISTINCT email_message_id FROM llm_verdicts WHERE is_final = 1',
+    'evidence_by_message_id': "SELECT id FROM email_evidence WHERE email_message_id = '<benchmark@x>'",
+    'spend_per_service': '''
+        SELECT s.name, r.emails, r.last_seen, r.last_amount, r.last_currency, r.detected_period
+        FROM service_spend_summary r
+        JOIN services s ON s.id = r.service_id
+        ORDER BY r.emails DESC
+    ''',
+}
+
+
+# ============================================================================
+# MIGRATION STEPS
+# ============================================================================
+
+def m001_base_tables(conn: sqlite3.Connection):
+    """services + email_evidence (for fresh databases)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS services (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT,
+            price_amount REAL,
+            price_currency TEXT,
+            subscription_type TEXT,
+            status TEXT,
+            detected_via TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS email_evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            service_id INTEGER REFERENCES services(id),
+            email_message_id TEXT UNIQUE,
+            email_subject TEXT,
+            email_from TEXT,
+            email_to TEXT,
+            email_date TIMESTAMP,
+            email_body_compact TEXT,
+            email_body_full TEXT,
+            confidence_score INTEGER,
+            detected_amount REAL,
+            detected_currency TEXT,
+            detected_subscription_type TEXT,
+            llm_reasoning TEXT,
+            llm_model TEXT
+        )
+    ''')
+
+
+def m002_evidence_indexes(conn: sqlite3.Connection):
+    """Lookup indexes on email_evidence"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_email_message_id ON email_evidence(email_message_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_service_id ON email_evidence(service_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_email_date ON email_evidence(email_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_confidence_score ON email_evidence(confidence_score DESC)')
+
+
+def m003_scanner_tables(conn: sqlite3.Connection):
+    """Per-model verdicts, learned sender rules, mbox checkpoints"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS llm_verdicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_message_id TEXT,
+            model TEXT,
+            tier TEXT,
+            is_subscription INTEGER,
+            confidence INTEGER,
+            reasoning TEXT,
+            latency_seconds REAL,
+            is_final INTEGER,
+            created_at TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_verdicts_message_id ON llm_verdicts(email_message_id)')
+    conn.execute(sender_rules.CREATE_TABLE_SQL)
+    conn.execute(scan_checkpoint.CREATE_TABLE_SQL)
+
+
+def m004_body_blobs(conn: sqlite3.Connection):
+    """Move full bodies into the compressed, content-addressed email_bodies table"""
+    stats = body_store.migrate(conn)
+    if stats['rows']:
+        logger.info(f"📦 {stats['rows']} bodies moved to email_bodies ({stats['new_bodies']} unique)")
+
+
+def m005_fulltext_index(conn: sqlite3.Connection):
+    """FTS5 index over subject / sender / compact body"""
+    evidence_search.ensure_index(conn)
+
+
+def m006_covering_indexes(conn: sqlite3.Connection):
+    """Covering indexes for the dashboard and scanner queries"""
+    # top_services / llm_services: filter by detected_via, group by id, show name
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_services_detected_via ON services(detected_via, id, name)')
+    # service_history: one service's evidence in date order, amounts without table lookups
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_evidence_service_date
+        ON email_evidence(service_id, email_date, detected_amount, detected_currency)
+    ''')
+    # final_verdicts: prioritized scan's done-set
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_llm_verdicts_final ON llm_verdicts(is_final, email_message_id)')
+    # idx_service_id is a prefix of idx_evidence_service_date
+    conn.execute('DROP INDEX IF EXISTS idx_service_id')
+
+
+def m007_analyze(conn: sqlite3.Connection):
+    """Planner statistics for the new indexes"""
+    conn.execute('ANALYZE')
+
+
+def m008_spend_rollups(conn: sqlite3.Connection):
+    """Per-service spend rollups maintained by triggers"""
+    spend_rollups.ensure_rollups(conn)
+
+
+def m009_recurrence_columns(conn: sqlite3.Connection):
+    """Billing period / next charge / price change columns on services"""
+    recurrence.ensure_schema(conn)
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, m001_base_tables),
+    (2, m002_evidence_indexes),
+    (3, m003_scanner_tables),
+    (4, m004_body_blobs),
+    (5, m005_fulltext_index),
+    (6, m006_covering_indexes),
+    (7, m007_analyze),
+    (8, m008_spend_rollups),
+    (9, m009_recurrence_columns),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def current_version(conn: sqlite3.Connection) -> int:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP,
+            seconds REAL
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def benchmark(conn: sqlite3.Connection, repeat: int = BENCHMARK_REPEAT) -> Dict[str, Optional[float]]:
+    """Median runtime (ms) of each BENCHMARK_QUERIES query; None if it cannot run yet"""
+    timings = {}
+    for name, sql in BENCHMARK_QUERIES.items():
+        samples = []
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+        except sqlite3.OperationalError:
+            timings[name] = None
+            continue
+        timings[name] = round(statistics.median(samples), 3)
+    return timings
+
+
+def log_benchmark(before: Dict, after: Dict):
+    for name in BENCHMARK_QUERIES:
+        old, new = before.get(name), after.get(name)
+        if old is None and new is None:
+            continue
+        change = f" ({new / old:.2f}x)" if old and new is not None else ""
+        old_text = f"{old:.3f}" if old is not None else "-"
+        new_text = f"{new:.3f}" if new is not None else "-"
+        logger.info(f"   {name:24} {old_text:>10} → {new_text:>10} ms{change}")
+
+
+def migrate(conn: sqlite3.Connection, target: int = LATEST_VERSION,
+            run_benchmark: bool = False) -> List[int]:
+    """Apply the missing migration steps up to `target`; returns the applied versions"""
+    version = current_version(conn)
+    conn.commit()
+    applied = []
+
+    for step_version, step in MIGRATIONS:
+        if step_version <= version or step_version > target:
+            continue
+        description = (step.__doc__ or step.__name__).strip()
+        before = benchmark(conn) if run_benchmark else None
+
+        start = time.monotonic()
+        step(conn)
+        seconds = time.monotonic() - start
+        conn.execute('INSERT INTO schema_version (version, description, applied_at, seconds) VALUES (?, ?, ?, ?)',
+                     (step_version, description, datetime.now().isoformat(), round(seconds, 3)))
+        conn.commit()
+        applied.append(step_version)
+        logger.info(f"🔧 Schema v{step_version}: {description} ({seconds:.2f}s)")
+
+        if run_benchmark:
+            log_benchmark(before, benchmark(conn))
+
+    if applied:
+        conn.execute('PRAGMA optimize')
+    return applied
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Subscriptions database schema migrations')
+    parser.add_argument('db', help='SQLite database')
+    parser.add_argument('--target', type=int, default=LATEST_VERSION, help='Migrate up to this version')
+    parser.add_argument('--benchmark', action='store_true', help='Time the top queries around each step')
+    parser.add_argument('--status', action='store_true', help='Show applied versions and exit')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            current_version(conn)
+            for row in conn.execute('SELECT version, applied_at, seconds, description FROM schema_version ORDER BY version'):
+                print(f"v{row[0]:<3} {row[1][:19]}  {row[2]:8.2f}s  {row[3]}")
+            print(f"latest: v{LATEST_VERSION}")
+            return 0
+        applied = migrate(conn, args.target, args.benchmark)
+        logger.info(f"✅ Schema at v{current_version(conn)} ({len(applied)} steps applied)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Sender Rules v2.3
+=================
+
+Learned (sender, subject pattern) → verdict rules from past LLM verdicts.
+
+Once the LLM has judged e.g. 5 emails from billing@github.com with subject
+"Your receipt from GitHub" the same way, the rule answers instead of the
+LLM. Every LLM verdict updates the support counts; a sample of rule hits
+(audit) still goes to the LLM so drift lowers the rule's agreement and
+deactivates it.
+
+Rules live in the `sender_rules` table of the scanner database and are
+loaded into memory on start. Writes go through the scanner's connection
+(or its write-behind queue) and are committed with its next batch.
+"""
+
+import sqlite3
+import email.utils
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from template_index import normalize_text, extract_amount, extract_date
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+MIN_SUPPORT = 5          # LLM verdicts needed before a rule answers
+MIN_AGREEMENT = 0.95     # Share of verdicts agreeing with the majority
+
+CREATE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS sender_rules (
+        sender TEXT NOT NULL,
+        subject_pattern TEXT NOT NULL,
+        positives INTEGER DEFAULT 0,
+        negatives INTEGER DEFAULT 0,
+        confidence_sum REAL DEFAULT 0,
+        service_name TEXT,
+        subscription_type TEXT,
+        currency TEXT,
+        model TEXT,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (sender, subject_pattern)
+    )
+'''
+
+
+def rule_key(sender: str, subject: str) -> Tuple[str, str]:
+    """(lowercase sender address, normalized subject pattern)"""
+    address = email.utils.parseaddr(sender or '')[1] or (sender or '')
+    subject = (subject or '').strip()
+    while subject[:4].lower() in ('re: ', 'fw: ') or subject[:5].lower() == 'fwd: ':
+        subject = subject.split(':', 1)[1].strip()
+    return address.strip().lower(), normalize_text(subject, '')
+
+
+class SenderRuleTable:
+    """In-memory rule table backed by the `sender_rules` SQLite table"""
+
+    def __init__(self, conn: sqlite3.Connection, min_support: int = MIN_SUPPORT,
+                 min_agreement: float = MIN_AGREEMENT, write: Optional[Callable] = None):
+        self.conn = conn
+        self.write = write or conn.execute  # write(sql, params)
+        self.min_support = min_support
+        self.min_agreement = min_agreement
+        self.rules: Dict[Tuple[str, str], Dict] = {}
+        self.load()
+
+    def load(self):
+        """Load all rules from the database"""
+        self.conn.execute(CREATE_TABLE_SQL)
+        cursor = self.conn.execute('SELECT * FROM sender_rules')
+        columns = [c[0] for c in cursor.description]
+        for row in cursor:
+            rule = dict(zip(columns, row))
+            self.rules[(rule['sender'], rule['subject_pattern'])] = rule
+
+    @staticmethod
+    def support(rule: Dict) -> int:
+        return rule['positives'] + rule['negatives']
+
+    @staticmethod
+    def agreement(rule: Dict) -> float:
+        total = rule['positives'] + rule['negatives']
+        return max(rule['positives'], rule['negatives']) / total if total else 0.0
+
+    def is_active(self, rule: Dict) -> bool:
+        return (self.support(rule) >= self.min_support
+                and self.agreement(rule) >= self.min_agreement)
+
+    def lookup(self, sender: str, subject: str) -> Optional[Dict]:
+        """Active rule for this sender + subject pattern, or None"""
+        rule = self.rules.get(rule_key(sender, subject))
+        return rule if rule and self.is_active(rule) else None
+
+    def verdict(self, rule: Dict, subject: str, body: str) -> Dict:
+        """Build a verdict from a rule; amount and billing date come from the email"""
+        is_subscription = rule['positives'] >= rule['negatives']
+        result = {
+            'is_subscription': is_subscription,
+            'confidence': round(min(rule['confidence_sum'] / self.support(rule), 100 * self.agreement(rule))),
+            'service_name': rule['service_name'] if is_subscription else None,
+            'subscription_type': rule['subscription_type'] if is_subscription else None,
+            'currency': rule['currency'] if is_subscription else None,
+            'amount': None,
+            'reasoning': (f"Sender rule: {self.support(rule)} LLM verdicts, "
+                          f"{self.agreement(rule) * 100:.0f}% agreement"),
+            'model': rule['model'],
+            'rule': {'sender': rule['sender'], 'subject_pattern': rule['subject_pattern'],
+                     'support': self.support(rule)},
+        }
+        if is_subscription:
+            amount, currency = extract_amount(subject, body)
+            result['amount'] = amount
+            result['currency'] = currency or result['currency']
+            result['billing_date'] = extract_date(subject, body)
+        return result
+
+    def record(self, sender: str, subject: str, llm_result: Dict):
+        """Update support counts with a new LLM verdict (errors are ignored)"""
+        if llm_result.get('error'):
+            return
+        sender_key, pattern = rule_key(sender, subject)
+        if not sender_key or not pattern:
+            return
+        rule = self.rules.setdefault((sender_key, pattern), {
+            'sender': sender_key, 'subject_pattern': pattern,
+            'positives': 0, 'negatives': 0, 'confidence_sum': 0.0,
+            'service_name': None, 'subscription_type': None, 'currency': None, 'model': None,
+        })
+        try:
+            confidence = float(llm_result.get('confidence', 0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+
+        if llm_result.get('is_subscription'):
+            rule['positives'] += 1
+            for field in ('service_name', 'subscription_type', 'currency'):
+                rule[field] = llm_result.get(field) or rule[field]
+        else:
+            rule['negatives'] += 1
+        rule['confidence_sum'] += confidence
+        rule['model'] = llm_result.get('model') or rule['model']
+        rule['updated_at'] = datetime.now().isoformat()
+
+        self.write('''
+            INSERT OR REPLACE INTO sender_rules (
+                sender, subject_pattern, positives, negatives, confidence_sum,
+                service_name, subscription_type, currency, model, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            rule['sender'], rule['subject_pattern'], rule['positives'], rule['negatives'],
+            rule['confidence_sum'], rule['service_name'], rule['subscription_type'],
+            rule['currency'], rule['model'], rule['updated_at']
+        ))
+
+    def get_stats(self) -> Dict:
+        return {
+            'rules': len(self.rules),
+            'active': sum(1 for r in self.rules.values() if self.is_active(r)),
+        }
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Service Registry v2.3
+=====================
+
+In-memory name → id map of the `services` table.
+
+Names are folded to a canonical key (case and diacritics removed, legal
+suffixes and plan/edition words dropped), so "Microsoft", "Microsoft 365"
+and "MICROSOFT Corp." resolve to the same service row and lookups are a
+dict hit instead of a SELECT per detected subscription.
+"""
+
+import re
+import sqlite3
+import unicodedata
+from typing import Dict, Optional
+
+
+# Tokens that do not distinguish services ("Microsoft 365", "GitHub Pro",
+# "Spotify Premium", "Seznam.cz a.s.")
+GENERIC_TOKENS = {
+    # Legal forms
+    'inc', 'ltd', 'llc', 'corp', 'corporation', 'co', 'company', 'gmbh', 'ag', 'sa',
+    'sro', 'as', 'spol', 'se', 'bv', 'plc',
+    # Plans / editions
+    'pro', 'plus', 'premium', 'basic', 'standard', 'business', 'personal', 'family',
+    'individual', 'team', 'teams', 'enterprise', 'starter', 'max', 'ultimate',
+    'subscription', 'plan', 'membership', 'predplatne', 'abonnement',
+    # Billing senders
+    'billing', 'payments', 'store', 'noreply',
+    # Domain suffixes ("Seznam.cz", "netflix.com")
+    'com', 'cz', 'de', 'io', 'net', 'org', 'eu', 'app', 'ai', 'sk',
+}
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Lowercase and strip diacritics ('Předplatné' → 'predplatne')."""
+    normalized = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in normalized if not unicodedata.combining(c)).lower()
+
+
+def canonical_name(name: str) -> str:
+    """Canonical service key: folded, punctuation-free, generic tokens removed."""
+    folded = fold(name).strip()
+    # "s.r.o." / "a.s." → "sro" / "as"
+    folded = re.sub(r"\b(s)\.\s?(r)\.\s?(o)\.?", r"\1\2\3", folded)
+    folded = re.sub(r"\b(a)\.\s?(s)\.?", r"\1\2", folded)
+
+    tokens = [t for t in _non_alnum.split(folded) if t]
+    significant = [t for t in tokens if t not in GENERIC_TOKENS and not t.isdigit()]
+    # Keep the full name if everything was generic ("Pro", "365")
+    return " ".join(significant or tokens)
+
+
+class ServiceRegistry:
+    """Canonical name → service id, preloaded from and kept in sync with `services`"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.ids: Dict[str, int] = {}
+        self.names: Dict[int, str] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'merged': 0}
+        self.load()
+
+    def load(self):
+        """Preload all services (oldest row wins for duplicate keys)"""
+        self.ids.clear()
+        self.names.clear()
+        for service_id, name in self.conn.execute('SELECT id, name FROM services ORDER BY id'):
+            self.ids.setdefault(canonical_name(name), service_id)
+            self.names[service_id] = name
+
+    def lookup(self, name: str) -> Optional[int]:
+        """Service id for a name (or any near-identical name), else None"""
+        service_id = self.ids.get(canonical_name(name))
+        if service_id is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        if self.names.get(service_id) != name:
+            self.stats['merged'] += 1
+        return service_id
+
+    def register(self, name: str, service_id: int):
+        """Record a newly inserted service"""
+        self.ids.setdefault(canonical_name(name), service_id)
+        self.names[service_id] = name
+
+    def __len__(self) -> int:
+        return len(self.names)
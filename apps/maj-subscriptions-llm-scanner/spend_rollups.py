@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Spend Rollups v2.3
+==================
+
+Per-service spend totals, kept current while the scanner inserts evidence.
+
+Two rollup tables, maintained by triggers on email_evidence (so the
+scanner and its write-behind thread need no extra writes):
+- service_monthly_spend: amount + email count per service, month, currency
+- service_spend_summary: per service email count, first/last seen date,
+  latest amount/currency and detected period (monthly/yearly/...)
+
+Inserts update one row of each table in place. Deletes and updates
+recompute the affected service from its evidence rows (one indexed range),
+so the summary never drifts. Dashboards and reports read O(services) rows
+instead of grouping all of email_evidence; rebuild() recomputes everything.
+
+Usage:
+    python spend_rollups.py /tmp/production_subscriptions.db
+    python spend_rollups.py /tmp/production_subscriptions.db --months 6
+    python spend_rollups.py /tmp/production_subscriptions.db --rebuild
+"""
+
+import sys
+import sqlite3
+import logging
+import argparse
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+# Detected period → months it covers (to estimate the monthly cost)
+PERIOD_MONTHS = {
+    'weekly': 12 / 52,
+    'monthly': 1,
+    'quarterly': 3,
+    'yearly': 12,
+    'annual': 12,
+}
+DEFAULT_MONTHS = 12
+
+_month = "COALESCE(substr({row}.email_date, 1, 7), '')"  # '' = undated
+_currency = "COALESCE({row}.detected_currency, '')"
+
+# Latest non-null value of a column among one service's evidence rows
+_latest = '''(
+    SELECT x.{column} FROM email_evidence x
+    WHERE x.service_id = e.service_id AND x.{column} IS NOT NULL
+    ORDER BY x.email_date DESC LIMIT 1
+)'''
+
+SUMMARY_SELECT = f'''
+    SELECT e.service_id, COUNT(*), MIN(e.email_date), MAX(e.email_date),
+           {_latest.format(column='detected_amount')},
+           {_latest.format(column='detected_currency')},
+           {_latest.format(column='detected_subscription_type')}
+    FROM email_evidence e
+'''
+
+
+def _add_monthly(row: str) -> str:
+    # WHERE before ON CONFLICT: required for upsert on INSERT ... SELECT
+    return f'''
+        INSERT INTO service_monthly_spend (service_id, month, currency, amount, emails)
+        SELECT {row}.service_id, {_month.format(row=row)}, {_currency.format(row=row)},
+               COALESCE({row}.detected_amount, 0), 1
+        WHERE {row}.service_id IS NOT NULL
+        ON CONFLICT(service_id, month, currency) DO UPDATE SET
+            amount = amount + excluded.amount,
+            emails = emails + 1;
+    '''
+
+
+def _remove_monthly(row: str) -> str:
+    key = (f"service_id = {row}.service_id AND month = {_month.format(row=row)} "
+           f"AND currency = {_currency.format(row=row)}")
+    return f'''
+        UPDATE service_monthly_spend
+        SET amount = amount - COALESCE({row}.detected_amount, 0), emails = emails - 1
+        WHERE {key};
+        DELETE FROM service_monthly_spend WHERE {key} AND emails <= 0;
+    '''
+
+
+def _recompute_summary(row: str) -> str:
+    return f'''
+        DELETE FROM service_spend_summary WHERE service_id = {row}.service_id;
+        INSERT INTO service_spend_summary {SUMMARY_SELECT}
+        WHERE e.service_id = {row}.service_id
+        GROUP BY e.service_id;
+    '''
+
+
+CREATE_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS service_monthly_spend (
+        service_id INTEGER NOT NULL,
+        month TEXT NOT NULL,
+        currency TEXT NOT NULL,
+        amount REAL NOT NULL DEFAULT 0,
+        emails INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (service_id, month, currency)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS service_spend_summary (
+        service_id INTEGER PRIMARY KEY,
+        emails INTEGER NOT NULL DEFAULT 0,
+        first_seen TIMESTAMP,
+        last_seen TIMESTAMP,
+        last_amount REAL,
+        last_currency TEXT,
+        detected_period TEXT
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_spend_ai
+    AFTER INSERT ON email_evidence WHEN new.service_id IS NOT NULL BEGIN
+        {_add_monthly('new')}
+        INSERT INTO service_spend_summary (
+            service_id, emails, first_seen, last_seen, last_amount, last_currency, detected_period
+        ) VALUES (
+            new.service_id, 1, new.email_date, new.email_date,
+            new.detected_amount, new.detected_currency, new.detected_subscription_type
+        )
+        ON CONFLICT(service_id) DO UPDATE SET
+            emails = emails + 1,
+            first_seen = MIN(COALESCE(first_seen, excluded.first_seen), excluded.first_seen),
+            last_seen = MAX(COALESCE(last_seen, excluded.last_seen), excluded.last_seen),
+            last_amount = CASE WHEN excluded.last_seen >= last_seen
+                THEN COALESCE(excluded.last_amount, last_amount)
+                ELSE COALESCE(last_amount, excluded.last_amount) END,
+            last_currency = CASE WHEN excluded.last_seen >= last_seen
+                THEN COALESCE(excluded.last_currency, last_currency)
+                ELSE COALESCE(last_currency, excluded.last_currency) END,
+            detected_period = CASE WHEN excluded.last_seen >= last_seen
+                THEN COALESCE(excluded.detected_period, detected_period)
+                ELSE COALESCE(detected_period, excluded.detected_period) END;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_spend_ad
+    AFTER DELETE ON email_evidence WHEN old.service_id IS NOT NULL BEGIN
+        {_remove_monthly('old')}
+        {_recompute_summary('old')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_spend_au
+    AFTER UPDATE OF service_id, email_date, detected_amount, detected_currency,
+                    detected_subscription_type ON email_evidence BEGIN
+        {_remove_monthly('old')}
+        {_add_monthly('new')}
+        {_recompute_summary('old')}
+        {_recompute_summary('new')}
+    END
+    ''',
+]
+
+
+# email_evidence columns the rollups read (older databases may lack some)
+SOURCE_COLUMNS = {
+    'detected_amount': 'REAL',
+    'detected_currency': 'TEXT',
+    'detected_subscription_type': 'TEXT',
+}
+
+
+def ensure_rollups(conn: sqlite3.Connection):
+    """Create the rollup tables + triggers (and fill them from existing rows)"""
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(email_evidence)')}
+    for column, column_type in SOURCE_COLUMNS.items():
+        if column not in columns:
+            conn.execute(f'ALTER TABLE email_evidence ADD COLUMN {column} {column_type}')
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'service_spend_summary'"
+    ).fetchone()
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    if not exists:
+        rebuild(conn)
+
+
+def rebuild(conn: sqlite3.Connection):
+    """Recompute both rollup tables from email_evidence"""
+    conn.execute('DELETE FROM service_monthly_spend')
+    conn.execute('DELETE FROM service_spend_summary')
+    conn.execute(f'''
+        INSERT INTO service_monthly_spend (service_id, month, currency, amount, emails)
+        SELECT e.service_id, {_month.format(row='e')}, {_currency.format(row='e')},
+               COALESCE(SUM(e.detected_amount), 0), COUNT(*)
+        FROM email_evidence e
+        WHERE e.service_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    ''')
+    conn.execute(f'''
+        INSERT INTO service_spend_summary
+        {SUMMARY_SELECT}
+        WHERE e.service_id IS NOT NULL
+        GROUP BY e.service_id
+    ''')
+
+
+def monthly_estimate(amount, period) -> float:
+    """Latest amount spread over the months its period covers"""
+    if amount is None:
+        return None
+    return amount / PERIOD_MONTHS.get((period or '').lower(), 1)
+
+
+def service_spend(conn: sqlite3.Connection, months: int = DEFAULT_MONTHS) -> List[Dict]:
+    """
+    One dict per service: name, email count, first/last seen, latest
+    amount + currency, detected period, estimated monthly cost and the
+    amounts per currency over the last `months` months with evidence.
+    """
+    rows = conn.execute('''
+        SELECT r.service_id, s.name, r.emails, r.first_seen, r.last_seen,
+               r.last_amount, r.last_currency, r.detected_period
+        FROM service_spend_summary r
+        LEFT JOIN services s ON s.id = r.service_id
+        ORDER BY r.last_seen DESC
+    ''').fetchall()
+
+    recent = {}
+    cutoff = conn.execute('''
+        SELECT month FROM (SELECT DISTINCT month FROM service_monthly_spend ORDER BY month DESC LIMIT ?)
+        ORDER BY month LIMIT 1
+    ''', (months,)).fetchone()
+    if cutoff:
+        for service_id, currency, amount in conn.execute('''
+            SELECT service_id, currency, SUM(amount) FROM service_monthly_spend
+            WHERE month >= ? GROUP BY service_id, currency
+        ''', (cutoff[0],)):
+            recent.setdefault(service_id, {})[currency] = round(amount, 2)
+
+    columns = ['service_id', 'name', 'emails', 'first_seen', 'last_seen',
+               'last_amount', 'last_currency', 'detected_period']
+    result = []
+    for row in rows:
+        item = dict(zip(columns, row))
+        item['monthly_estimate'] = monthly_estimate(item['last_amount'], item['detected_period'])
+        item['recent_amounts'] = recent.get(item['service_id'], {})
+        result.append(item)
+    return result
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Per-service spend rollups')
+    parser.add_argument('db', help='Scanner SQLite database')
+    parser.add_argument('--months', type=int, default=DEFAULT_MONTHS, help='Window for the recent amounts')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute the rollups from email_evidence')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure_rollups(conn)
+        if args.rebuild:
+            rebuild(conn)
+            logger.info("✅ Rollups rebuilt")
+        conn.commit()
+        for item in service_spend(conn, args.months):
+            estimate = item['monthly_estimate']
+            monthly = f"{estimate:10.2f} {item['last_currency'] or '':3}/m" if estimate is not None else f"{'-':>16}"
+            recent = ', '.join(f"{amount:.2f} {currency or '?'}" for currency, amount in item['recent_amounts'].items())
+            print(f"{(item['name'] or '?')[:30]:30} {monthly}  {item['detected_period'] or '-':9} "
+                  f"{item['emails']:5} emails  last {(item['last_seen'] or '')[:10]}  [{recent}]")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -323,7 +323,8 @@ class SubscriptionScorer:
         subject: str,
         sender: str,
         body: str,
-        content_type: str = "text"
+        content_type: str = "text",
+        html: Optional[Dict] = None
     ) -> SubscriptionScore:
         """
         Score an email for subscription indicators.
@@ -333,6 +334,8 @@ class SubscriptionScorer:
             sender: Email sender address
             body: Email body text
             content_type: "text" or "html"
+            html: html_text record of the email's HTML part (structural
+                counts; used instead of scanning an HTML body)
 
         Returns:
             SubscriptionScore object with detailed breakdown
@@ -404,7 +407,11 @@ class SubscriptionScorer:
 
         # Category 5: Content Structure
         struct_score = 0
-        if content_type == "html" and "<table" in body.lower():
+        if html is not None:
+            has_table = html['tables'] > 0
+        else:
+            has_table = content_type == "html" and "<table" in body.lower()
+        if has_table:
             matched.append("html_table")
             struct_score = max(struct_score, 15)
 
@@ -454,8 +461,8 @@ class SubscriptionScorer:
         # Category 8: Negative Penalties
         penalties = 0
 
-        # Unsubscribe link (strong negative signal)
-        if self._match_pattern("unsubscribe_link", full_text):
+        # Unsubscribe link (strong negative signal; in HTML often only in the href)
+        if self._match_pattern("unsubscribe_link", full_text) or (html is not None and html['unsubscribe_links']):
             matched.append("unsubscribe_link")
             penalties += self.SCORING_TABLES["unsubscribe_link"]
             warnings.append("Contains 'unsubscribe' link (-30 penalty)")
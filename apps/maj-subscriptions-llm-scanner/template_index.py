@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Template Index v2.3
+===================
+
+Near-duplicate reuse of LLM verdicts for templated emails.
+
+Monthly invoices from the same service (Microsoft 365, GitHub, Netflix) are
+the same template with a different date and amount. Subject + body are
+normalized (digits, dates, URLs and ids masked) and fingerprinted with a
+64-bit SimHash; a new email whose fingerprint is close enough to a prior
+verdict from the same sender domain reuses that verdict. Only the amount
+and billing date are re-extracted locally.
+
+Usage:
+    index = TemplateIndex(threshold=0.92)
+    match = index.lookup(sender, subject, body)
+    if match is None:
+        verdict = llm(...)
+        index.add(sender, subject, body, verdict, message_id)
+"""
+
+import re
+import hashlib
+from datetime import datetime
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+SIMHASH_BITS = 64
+LSH_BANDS = 8                # 8 x 8-bit bands: any pair within 7 bits shares a band
+SHINGLE_SIZE = 3             # Word 3-grams
+MAX_TEXT_CHARS = 4000        # Fingerprint only the head of long bodies
+DEFAULT_THRESHOLD = 0.92     # 1 - hamming/64 → at most 5 differing bits
+MIN_REUSE_CONFIDENCE = 85    # Only confident, error-free verdicts are reused
+MAX_ENTRIES_PER_DOMAIN = 50  # Distinct templates kept per sender domain
+
+_BAND_BITS = SIMHASH_BITS // LSH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+# Masking (order matters: URLs and dates before bare digits)
+_url = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_email = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_date = re.compile(
+    r"\b\d{4}-\d{2}-\d{2}\b"
+    r"|\b\d{1,2}[./-]\s?\d{1,2}[./-]\s?\d{2,4}\b"
+    r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}\b"
+    r"|\b\d{1,2}\.?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{4}\b",
+    re.IGNORECASE,
+)
+_long_id = re.compile(r"\b(?=[a-z]*\d)[a-z0-9-]{12,}\b", re.IGNORECASE)
+_digits = re.compile(r"\d+(?:[.,\s]\d+)*")
+_token = re.compile(r"\w+|<\w+>")
+
+# Local re-extraction
+_amount_patterns = [
+    # $9.99, € 12,00, £5
+    (re.compile(r"(US\$|\$|€|£)\s?(\d[\d\s.,]*\d|\d)"), 'prefix'),
+    # 299 Kč, 1 500,00 CZK, 8,80 US$, 12.00 EUR
+    (re.compile(r"(\d[\d\s.,]*\d|\d)\s?(US\$|\$|€|£|Kč|CZK|EUR|USD|GBP)\b"), 'suffix'),
+    # EUR 12.00, CZK 299
+    (re.compile(r"\b(CZK|EUR|USD|GBP)\s?(\d[\d\s.,]*\d|\d)"), 'prefix'),
+]
+_currency_codes = {'US$': 'USD', '$': 'USD', '€': 'EUR', '£': 'GBP', 'Kč': 'CZK'}
+_total_hint = re.compile(r"total|celkem|summe|gesamt|amount|částka|betrag|charged|strženo", re.IGNORECASE)
+
+_month_names = {m: i for i, m in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+_date_formats = [
+    (re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b"), ('y', 'm', 'd')),
+    (re.compile(r"\b(\d{1,2})\.\s?(\d{1,2})\.\s?(\d{4})\b"), ('d', 'm', 'y')),
+    (re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b"), ('m', 'd', 'y')),
+    (re.compile(r"\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+(\d{1,2}),?\s+(\d{4})\b",
+                re.IGNORECASE), ('mon', 'd', 'y')),
+]
+
+
+# ============================================================================
+# NORMALIZATION + FINGERPRINT
+# ============================================================================
+
+def normalize_text(subject: str, body: str) -> str:
+    """Lowercase subject + body with URLs, dates, ids and digits masked."""
+    text = f"{subject or ''}\n{(body or '')[:MAX_TEXT_CHARS]}"
+    text = _url.sub(" <url> ", text)
+    text = _email.sub(" <email> ", text)
+    text = _date.sub(" <date> ", text)
+    text = _long_id.sub(" <id> ", text)
+    text = _digits.sub(" <num> ", text)
+    return " ".join(text.lower().split())
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word shingles (weighted by frequency)."""
+    tokens = _token.findall(text)
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = Counter([" ".join(tokens)])
+    else:
+        shingles = Counter(" ".join(tokens[i:i + SHINGLE_SIZE])
+                           for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+    vector = [0] * SIMHASH_BITS
+    for shingle, weight in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            vector[bit] += weight if (h >> bit) & 1 else -weight
+
+    fingerprint = 0
+    for bit, value in enumerate(vector):
+        if value > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def similarity(a: int, b: int) -> float:
+    """1 - hamming distance / 64."""
+    return 1.0 - bin(a ^ b).count("1") / SIMHASH_BITS
+
+
+def sender_domain(sender: str) -> str:
+    """Sender domain (lowercase), or the raw sender if no address is found."""
+    match = re.search(r'@([a-zA-Z0-9.-]+)', sender or '')
+    return match.group(1).lower() if match else (sender or '').strip().lower()
+
+
+# ============================================================================
+# LOCAL RE-EXTRACTION (amount + date)
+# ============================================================================
+
+def parse_number(raw: str) -> Optional[float]:
+    """Parse '1 500,00', '1,500.00', '8,80', '12.00' → float."""
+    raw = raw.replace(" ", "").replace(" ", "")
+    if "," in raw and "." in raw:
+        decimal = "," if raw.rfind(",") > raw.rfind(".") else "."
+        raw = raw.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in raw:
+        head, _, tail = raw.rpartition(",")
+        raw = f"{head.replace(',', '')}.{tail}" if len(tail) <= 2 else raw.replace(",", "")
+    elif raw.count(".") > 1 or (raw.count(".") == 1 and len(raw.rpartition(".")[2]) == 3):
+        raw = raw.replace(".", "")
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def extract_amount(subject: str, body: str) -> Tuple[Optional[float], Optional[str]]:
+    """
+    First money amount in the email, preferring lines with a total/amount label.
+
+    Returns (amount, currency) or (None, None).
+    """
+    lines = [subject or ''] + (body or '').splitlines()
+    found = []
+    for line in lines:
+        for regex, currency_side in _amount_patterns:
+            for match in regex.finditer(line):
+                if currency_side == 'prefix':
+                    currency, number = match.group(1), match.group(2)
+                else:
+                    number, currency = match.group(1), match.group(2)
+                amount = parse_number(number.strip())
+                if amount is not None:
+                    found.append((bool(_total_hint.search(line)), amount,
+                                  _currency_codes.get(currency, currency)))
+    if not found:
+        return None, None
+    labelled = [f for f in found if f[0]]
+    _, amount, currency = (labelled or found)[0]
+    return amount, currency
+
+
+def extract_date(subject: str, body: str) -> Optional[str]:
+    """First parseable date in the email as ISO string (YYYY-MM-DD)."""
+    text = f"{subject or ''}\n{body or ''}"
+    best = None
+    for regex, order in _date_formats:
+        match = regex.search(text)
+        if not match or (best and best[0] < match.start()):
+            continue
+        parts = dict(zip(order, match.groups()))
+        try:
+            month = _month_names[parts['mon'][:3].lower()] if 'mon' in parts else int(parts['m'])
+            value = datetime(int(parts['y']), month, int(parts['d'])).date().isoformat()
+        except (ValueError, KeyError):
+            continue
+        best = (match.start(), value)
+    return best[1] if best else None
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class TemplateIndex:
+    """
+    In-memory SimHash index of LLM verdicts, bucketed by sender domain + LSH band
+
+    Candidates must share the sender domain and at least one 8-bit band of
+    the fingerprint; the best one at or above the threshold is returned.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD,
+                 min_confidence: int = MIN_REUSE_CONFIDENCE):
+        self.threshold = threshold
+        self.min_confidence = min_confidence
+        self.entries: Dict[str, List[Dict]] = {}
+        self.buckets: Dict[Tuple[str, int, int], List[Dict]] = {}
+        self.stats = {'lookups': 0, 'hits': 0, 'added': 0}
+
+    @staticmethod
+    def _bands(fingerprint: int):
+        for band in range(LSH_BANDS):
+            yield band, (fingerprint >> (band * _BAND_BITS)) & _BAND_MASK
+
+    def reusable(self, verdict: Dict) -> bool:
+        """Only confident, error-free verdicts become templates"""
+        if verdict.get('error'):
+            return False
+        try:
+            return float(verdict.get('confidence', 0)) >= self.min_confidence
+        except (TypeError, ValueError):
+            return False
+
+    def add(self, sender: str, subject: str, body: str, verdict: Dict, message_id: str = None) -> bool:
+        """Index a verdict; returns False if it is not reusable or already covered"""
+        if not self.reusable(verdict):
+            return False
+        domain = sender_domain(sender)
+        fingerprint = simhash(normalize_text(subject, body))
+        entries = self.entries.setdefault(domain, [])
+        if any(e['fingerprint'] == fingerprint for e in entries) or len(entries) >= MAX_ENTRIES_PER_DOMAIN:
+            return False
+
+        entry = {
+            'fingerprint': fingerprint,
+            'verdict': {k: v for k, v in verdict.items() if k not in ('small_model_verdict', 'template')},
+            'message_id': message_id,
+        }
+        entries.append(entry)
+        for band, value in self._bands(fingerprint):
+            self.buckets.setdefault((domain, band, value), []).append(entry)
+        self.stats['added'] += 1
+        return True
+
+    def remove(self, sender: str, message_id: str):
+        """Drop a template (e.g. after a failed spot check)"""
+        domain = sender_domain(sender)
+        entries = self.entries.get(domain, [])
+        for entry in [e for e in entries if e['message_id'] == message_id]:
+            entries.remove(entry)
+            for band, value in self._bands(entry['fingerprint']):
+                self.buckets[(domain, band, value)].remove(entry)
+
+    def lookup(self, sender: str, subject: str, body: str) -> Optional[Dict]:
+        """
+        Find a prior verdict for a near-duplicate email
+
+        Returns {'verdict', 'similarity', 'source_message_id'} or None.
+        """
+        self.stats['lookups'] += 1
+        domain = sender_domain(sender)
+        if domain not in self.entries:
+            return None
+
+        fingerprint = simhash(normalize_text(subject, body))
+        best, best_similarity = None, 0.0
+        for band, value in self._bands(fingerprint):
+            for entry in self.buckets.get((domain, band, value), ()):
+                score = similarity(fingerprint, entry['fingerprint'])
+                if score > best_similarity:
+                    best, best_similarity = entry, score
+
+        if best is None or best_similarity < self.threshold:
+            return None
+        self.stats['hits'] += 1
+        return {
+            'verdict': best['verdict'],
+            'similarity': round(best_similarity, 3),
+            'source_message_id': best['message_id'],
+        }
+
+    def reuse(self, match: Dict, subject: str, body: str) -> Dict:
+        """Copy a matched verdict, re-extracting amount and billing date locally"""
+        result = dict(match['verdict'])
+        if result.get('is_subscription'):
+            amount, currency = extract_amount(subject, body)
+            result['amount'] = amount
+            if currency:
+                result['currency'] = currency
+            result['billing_date'] = extract_date(subject, body)
+        result['template'] = {
+            'source_message_id': match['source_message_id'],
+            'similarity': match['similarity'],
+        }
+        return result
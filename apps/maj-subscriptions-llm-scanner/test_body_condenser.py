@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test salience-based body condensation: budget, order, gap markers, boilerplate
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from body_condenser import CHARS_PER_TOKEN, GAP_MARKER, condense_body, evaluate, score_unit, split_units
+from fake_ollama_server import FakeOllamaServer
+
+FILLER = [f"Paragraph {i} of our story about the team, the weather and the new office." for i in range(40)]
+PRICE = "Your Premium subscription renews on 15.01.2026 for $9.99 per month."
+FOOTER = "Unsubscribe | Privacy policy | © 2025 Example Inc. All rights reserved."
+
+
+def long_body() -> str:
+    return "\n".join(["Hello Jane,", ""] + FILLER[:25] + [PRICE] + FILLER[25:] + ["", FOOTER])
+
+
+def kept_units(condensed: str) -> list:
+    return [line for line in condensed.split("\n") if line != GAP_MARKER]
+
+
+def test_short_body_whitespace_only():
+    """Bodies within budget come back whole, whitespace collapsed, no markers"""
+    body = "Hi   there,\n\n\tYour receipt\n-----\nTotal: 4 USD\n"
+    assert condense_body(body) == "Hi there,\nYour receipt\nTotal: 4 USD"
+    assert condense_body("") == ""
+
+
+def test_budget_respected():
+    """Selected units fit the character budget for every size"""
+    body = long_body()
+    assert len(body) > 2000
+    for max_tokens in (20, 40, 100, 300):
+        kept = kept_units(condense_body(body, max_tokens))
+        assert kept, max_tokens
+        assert sum(len(unit) + 1 for unit in kept) <= max_tokens * CHARS_PER_TOKEN, max_tokens
+
+
+def test_price_line_survives_truncation():
+    """The renewal/price line deep in the body is kept where body[:budget] would lose it"""
+    body = long_body()
+    max_tokens = 60
+    assert PRICE not in body[:max_tokens * CHARS_PER_TOKEN]
+    assert PRICE in condense_body(body, max_tokens)
+
+
+def test_original_order_and_gap_markers():
+    """Kept units appear in body order; every skipped stretch is one GAP_MARKER"""
+    body = long_body()
+    units = split_units(body)
+    condensed = condense_body(body, 60)
+    lines = condensed.split("\n")
+    positions = [units.index(line) for line in lines if line != GAP_MARKER]
+    assert positions == sorted(positions)
+
+    expected = []
+    last = -1
+    for position in positions:
+        if position != last + 1:
+            expected.append(GAP_MARKER)
+        expected.append(units[position])
+        last = position
+    if last != len(units) - 1:
+        expected.append(GAP_MARKER)
+    assert lines == expected
+    assert GAP_MARKER + "\n" + GAP_MARKER not in condensed
+
+
+def test_boilerplate_demoted():
+    """Footer boilerplate scores below neutral text and is dropped while the price line stays"""
+    assert score_unit(FOOTER) < 0 < score_unit(PRICE)
+    assert score_unit("Unsubscribe from our $9.99 monthly plan") == -1
+    condensed = condense_body(long_body(), 60)
+    assert FOOTER not in condensed
+    assert condensed.endswith(GAP_MARKER)
+
+
+def test_neighbour_of_salient_line_kept():
+    """A label line next to an amount ("Total:" / "$9.99") is kept with it"""
+    body = "\n".join(FILLER[:20] + ["Amount due", "$49.00"] + FILLER[20:])
+    kept = kept_units(condense_body(body, 30))
+    assert "$49.00" in kept and "Amount due" in kept
+
+
+def test_nothing_fits_falls_back_to_prefix():
+    """A single unit longer than the budget is cut to the budget"""
+    body = "x" * 250 + "\n" + "y" * 250
+    assert condense_body(body, 10) == "x" * 40
+
+
+def test_evaluate_leaves_database_untouched():
+    """evaluate() reads an unmigrated DB read-only and calls the model without the scanner"""
+    server = FakeOllamaServer(responder=lambda model, prompt: json.dumps(
+        {"is_subscription": True, "confidence": 90, "reasoning": "test"})).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'labelled.db')
+        conn = sqlite3.connect(db)
+        conn.execute('CREATE TABLE email_evidence (id INTEGER PRIMARY KEY, email_subject TEXT, '
+                     'email_from TEXT, email_body_full TEXT)')
+        conn.execute('INSERT INTO email_evidence (email_subject, email_from, email_body_full) VALUES (?, ?, ?)',
+                     ('Renewal', 'billing@x.com', long_body()))
+        conn.commit()
+        schema = conn.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall()
+        conn.close()
+
+        labels = os.path.join(tmp, 'labels.json')
+        with open(labels, 'w', encoding='utf-8') as f:
+            json.dump({'high_confidence_samples': [
+                {'subject': 'Renewal', 'sender': 'billing@x.com', 'llm_result': {'is_subscription': True}},
+                {'subject': 'Missing', 'sender': 'nobody@x.com', 'llm_result': {'is_subscription': False}},
+            ]}, f)
+        try:
+            report = evaluate(db, labels, max_tokens=60, ollama_url=server.url, model='test-model')
+        finally:
+            server.stop()
+
+        assert report['samples'] == 1
+        assert report['truncated']['correct'] == report['condensed']['correct'] == 1
+        assert report['condensed']['chars'] < report['truncated']['chars'] == 2000
+        conn = sqlite3.connect(db)
+        assert conn.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall() == schema
+        assert conn.execute('SELECT email_body_full FROM email_evidence').fetchone()[0] == long_body()
+        conn.close()
+        assert not any(t.name == 'db-writer' and t.is_alive() for t in threading.enumerate())
+
+
+if __name__ == "__main__":
+    tests = [test_short_body_whitespace_only, test_budget_respected, test_price_line_survives_truncation,
+             test_original_order_and_gap_markers, test_boilerplate_demoted,
+             test_neighbour_of_salient_line_kept, test_nothing_fits_falls_back_to_prefix,
+             test_evaluate_leaves_database_untouched]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test body store: round trip, dedup, in-place migration, lazy reads
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import body_store
+from body_store import BodyStore
+from production_llm_scanner_v2 import ImprovedLLMScanner
+
+
+def make_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE email_evidence (
+            id INTEGER PRIMARY KEY, email_message_id TEXT UNIQUE,
+            email_body_compact TEXT, email_body_full TEXT
+        )
+    ''')
+    return conn
+
+
+def test_encode_round_trip():
+    """Compressed blob decodes to the same text (incl. surrogate-escaped bytes)"""
+    body = 'Předplatné obnoveno – Total: 249 Kč\n' * 50 + '\udcff'
+    digest, codec, size, data = body_store.encode(body)
+    assert digest == body_store.body_hash(body) and size == len(body)
+    assert len(data) < len(body)
+    assert body_store.decompress(codec, data) == body
+    assert body_store.encode('') is None and body_store.encode(None) is None
+
+
+def test_migrate_in_place_dedups_and_is_resumable():
+    """Inline bodies move to email_bodies; identical bodies are stored once"""
+    conn = make_db()
+    newsletter = '<html>' + 'Big SALE! ' * 200 + '</html>'
+    rows = [('<1@x>', newsletter), ('<2@x>', newsletter), ('<3@x>', 'Receipt #3 total $4.00'), ('<4@x>', '')]
+    conn.executemany('INSERT INTO email_evidence (email_message_id, email_body_full) VALUES (?, ?)', rows)
+
+    stats = body_store.migrate(conn, batch=3)
+    assert stats['rows'] == 4 and stats['new_bodies'] == 2
+    assert body_store.inline_bodies(conn) == 0
+    assert body_store.migrate(conn)['rows'] == 0
+
+    store = BodyStore(conn, cache_size=1)
+    assert store.body_for('<2@x>') == newsletter
+    assert store.body_for('<3@x>') == 'Receipt #3 total $4.00'
+    assert store.body_for('<4@x>') is None
+    assert len(store.cache) == 1
+    assert body_store.store_stats(conn)['referencing_rows'] == 3
+
+
+def test_duplicate_evidence_leaves_no_orphan_body():
+    """A body is stored only when its evidence row is accepted"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'scan.db')
+        scanner = ImprovedLLMScanner(db, small_model=None, template_similarity=None, sender_rules=False)
+        try:
+            result = {'confidence': 90, 'reasoning': 'test'}
+            for body in ('Receipt: total $4.00 ' * 20, 'Different body of the re-sent receipt ' * 20):
+                scanner.save_email_evidence(None, '<dup@x>', 'Receipt', 'shop@x.com', 'me@x.com',
+                                            body, datetime(2026, 1, 1), result)
+            scanner.flush()
+        finally:
+            scanner.close()
+        conn = sqlite3.connect(db)
+        hashes = [row[0] for row in conn.execute('SELECT hash FROM email_bodies')]
+        assert hashes == [body_store.body_hash('Receipt: total $4.00 ' * 20)]
+        assert BodyStore(conn).body_for('<dup@x>') == 'Receipt: total $4.00 ' * 20
+        conn.close()
+
+
+if __name__ == "__main__":
+    tests = [test_encode_round_trip, test_migrate_in_place_dedups_and_is_resumable,
+             test_duplicate_evidence_leaves_no_orphan_body]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test the small → large model cascade against the fake Ollama server
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_ollama_server import FakeOllamaServer
+from production_llm_scanner_v2 import ImprovedLLMScanner
+
+SMALL, LARGE = 'small-test', 'large-test'
+
+
+def responder(model: str, prompt: str):
+    """Subject 'conf:<n>:<yes|no>' / 'missing' / 'error' scripts the small model; large says yes"""
+    if model == LARGE:
+        return json.dumps({"is_subscription": True, "confidence": 95, "reasoning": "large"})
+    subject = re.search(r'Subject: (\S+)', prompt).group(1)
+    if subject == 'error':
+        return 400
+    if subject == 'missing':
+        return json.dumps({"is_subscription": True, "reasoning": "no confidence"})
+    _, confidence, answer = subject.split(':')
+    return json.dumps({"is_subscription": answer == 'yes', "confidence": int(confidence),
+                       "reasoning": "small"})
+
+
+def candidate(subject: str) -> dict:
+    return {'subject': subject, 'sender': 'billing@example.com', 'body': 'Your plan renews at 9 USD',
+            'message_id': f'<{subject}@example.com>'}
+
+
+def test_cascade_escalation_and_verdicts():
+    """Only confident small-model verdicts are final; the rest (and errors) go to the large model"""
+    server = FakeOllamaServer(models=[SMALL, LARGE], responder=responder).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), ollama_url=server.url,
+                                     backends=[{'url': server.url}], model=LARGE, small_model=SMALL,
+                                     template_similarity=None, sender_rules=False)
+        try:
+            cases = {
+                'conf:95:no': (SMALL, False),   # Above the threshold → final
+                'conf:85:yes': (SMALL, True),   # Threshold itself is accepted
+                'conf:50:yes': (LARGE, True),   # Uncertain
+                'conf:10:no': (LARGE, True),    # Least certain answers must not be final
+                'missing': (LARGE, True),       # No confidence → not trusted
+                'error': (LARGE, True),         # Small model failed
+            }
+            for subject, (model, is_subscription) in cases.items():
+                result = scanner.analyze_with_models(candidate(subject))
+                assert result['model'] == model, f"{subject}: answered by {result['model']}"
+                assert result['is_subscription'] == is_subscription, subject
+
+            assert scanner.stats['cascade_small_only'] == 2
+            assert scanner.stats['cascade_escalated'] == 4
+            assert scanner.stats['large_model_calls'] == 4
+            assert scanner.stats['cascade_agreed'] == 2  # conf:50:yes, missing
+            scanner.print_cascade_report()
+
+            scanner.flush()
+            conn = sqlite3.connect(os.path.join(tmp, 'scan.db'))
+            rows = conn.execute("""
+                SELECT email_message_id, model, tier, is_final FROM llm_verdicts
+            """).fetchall()
+            conn.close()
+            verdicts = {}
+            for message_id, model, tier, is_final in rows:
+                verdicts.setdefault(message_id, {})[tier] = (model, is_final)
+            assert verdicts['<conf:95:no@example.com>'] == {'small': (SMALL, 1)}
+            for subject in ('conf:50:yes', 'conf:10:no', 'missing', 'error'):
+                assert verdicts[f'<{subject}@example.com>'] == {
+                    'small': (SMALL, 0), 'large': (LARGE, 1)}, subject
+        finally:
+            scanner.close()
+            server.stop()
+
+
+def test_needs_escalation():
+    """Errors, missing/invalid and below-threshold confidence escalate"""
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), small_model=SMALL,
+                                     cascade_accept=80, template_similarity=None, sender_rules=False)
+        try:
+            assert not scanner.needs_escalation({'is_subscription': False, 'confidence': 80})
+            assert not scanner.needs_escalation({'is_subscription': True, 'confidence': '99'})
+            assert scanner.needs_escalation({'is_subscription': True, 'confidence': 79.9})
+            assert scanner.needs_escalation({'is_subscription': False, 'confidence': 0})
+            assert scanner.needs_escalation({'is_subscription': True})
+            assert scanner.needs_escalation({'is_subscription': True, 'confidence': None})
+            assert scanner.needs_escalation({'is_subscription': True, 'confidence': 'high'})
+            assert scanner.needs_escalation({'is_subscription': False, 'confidence': 99, 'error': 'x'})
+        finally:
+            scanner.close()
+
+
+if __name__ == "__main__":
+    tests = [test_cascade_escalation_and_verdicts, test_needs_escalation]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
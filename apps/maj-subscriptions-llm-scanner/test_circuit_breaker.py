@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test circuit breaker, latency tracker / adaptive timeout and parking on an open circuit
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_ollama_server import FakeOllamaServer
+from llm_client import CircuitBreaker, CircuitOpenError, CircuitState, LatencyTracker, OllamaClient
+from production_llm_scanner_v2 import ImprovedLLMScanner
+
+
+def test_breaker_opens_probes_and_recovers():
+    """Threshold opens the circuit; after the recovery timeout exactly one probe goes through"""
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.1)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED and breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN and not breaker.allow_request()
+    assert 0 < breaker.seconds_until_probe() <= 0.1
+
+    time.sleep(0.12)
+    assert breaker.allow_request() and breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow_request()  # Only one probe in flight
+    breaker.record_failure()  # Failed probe re-opens immediately
+    assert breaker.state == CircuitState.OPEN and breaker.times_opened == 2
+
+    time.sleep(0.12)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED and breaker.consecutive_failures == 0
+    breaker.trip()
+    assert breaker.state == CircuitState.OPEN and breaker.times_opened == 3
+
+
+def test_latency_percentiles_and_adaptive_timeout():
+    """Static timeout until enough samples, then p99 × 2 clamped to [minimum, default]"""
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(50) is None
+    assert tracker.adaptive_timeout(120) == 120
+
+    for i in range(1, 101):
+        tracker.record(i / 10)  # 0.1 .. 10 s
+    assert tracker.percentile(50) == 5.1 and tracker.percentile(99) == 9.9
+    assert tracker.adaptive_timeout(120) == 19.8
+    assert tracker.adaptive_timeout(10, minimum=5) == 10  # Never above the static timeout
+    assert tracker.adaptive_timeout(120, minimum=30) == 30
+
+    stats = tracker.get_stats()
+    assert stats['samples'] == 100 and sum(stats['histogram'].values()) == 100
+    assert stats['histogram']['<=1s'] == 10
+
+    tracker.record(500)  # Window keeps the last 100 samples; histogram counts every call
+    assert len(tracker.samples) == 100 and tracker.get_stats()['histogram']['>180s'] == 1
+
+
+def test_client_errors_do_not_trip_breaker():
+    """4xx answers leave the circuit closed; 5xx answers open it"""
+    server = FakeOllamaServer(error_rate=1.0, error_status=404).start()
+    try:
+        client = OllamaClient(server.url, 'missing-model', failure_threshold=2)
+        for _ in range(3):
+            try:
+                client.generate('x')
+                assert False, "expected HTTPError"
+            except requests.HTTPError:
+                pass
+        assert client.backends[0].breaker.state == CircuitState.CLOSED
+        server.error_status = 503
+        for _ in range(2):
+            try:
+                client.generate('x')
+            except requests.HTTPError:
+                pass
+        assert client.backends[0].breaker.state == CircuitState.OPEN
+        try:
+            client.generate('x')
+            assert False, "expected CircuitOpenError"
+        except CircuitOpenError:
+            pass
+    finally:
+        server.stop()
+
+
+def test_connection_errors_park_email():
+    """Connection errors that open the circuit during retries raise CircuitOpenError (park)"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        dead_url = f"http://127.0.0.1:{sock.getsockname()[1]}/api/generate"
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), ollama_url=dead_url,
+                                     backends=[{'url': dead_url}], small_model=None,
+                                     template_similarity=None, sender_rules=False)
+        try:
+            try:
+                scanner.analyze_with_llm_retry('Invoice', 'billing@x.com', 'Total 4 USD')
+                assert False, "expected CircuitOpenError"
+            except CircuitOpenError:
+                pass
+            assert scanner.stats['errors'] == 3
+        finally:
+            scanner.close()
+
+
+def test_scanner_health_checks_close_recovered_circuit():
+    """The scanner's background health check closes the circuit of a backend that is back up"""
+    server = FakeOllamaServer(models=['m']).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), ollama_url=server.url,
+                                     backends=[{'url': server.url}], model='m', small_model=None,
+                                     template_similarity=None, sender_rules=False,
+                                     health_check_interval=0.05)
+        try:
+            breaker = scanner.llm.backends[0].breaker
+            breaker.trip()
+            deadline = time.time() + 2
+            while breaker.state != CircuitState.CLOSED and time.time() < deadline:
+                time.sleep(0.02)
+            assert breaker.state == CircuitState.CLOSED, breaker.state
+            assert scanner.llm.health_thread.is_alive()
+        finally:
+            scanner.close()
+            server.stop()
+        assert not scanner.llm.health_thread.is_alive()
+
+
+if __name__ == "__main__":
+    tests = [test_breaker_opens_probes_and_recovers, test_latency_percentiles_and_adaptive_timeout,
+             test_client_errors_do_not_trip_breaker, test_connection_errors_park_email,
+             test_scanner_health_checks_close_recovered_circuit]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
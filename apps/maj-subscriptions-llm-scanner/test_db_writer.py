@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test write-behind DB writer: ordering, batching, duplicates, backpressure, failures
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from db_writer import DBWriter
+
+
+def test_rows_batched_and_duplicates_rejected():
+    """Rows from several producers land; one duplicate does not drop its batch"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'w.db')
+        sqlite3.connect(db).execute('CREATE TABLE t (k TEXT PRIMARY KEY, v INTEGER)')
+        writer = DBWriter(db, ["PRAGMA journal_mode = WAL"], queue_size=10, batch_rows=25)
+
+        def produce(prefix):
+            for i in range(100):
+                writer.execute('INSERT INTO t (k, v) VALUES (?, ?)', (f'{prefix}{i}', i))
+
+        threads = [threading.Thread(target=produce, args=(p,)) for p in 'abc']
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.execute('INSERT INTO t (k, v) VALUES (?, ?)', ('a0', -1))
+        assert writer.flush(timeout=10)
+
+        stats = writer.get_stats()
+        assert stats['applied'] == 300 and stats['failed'] == 1
+        assert stats['batches'] >= 300 // 25 and stats['queue_depth'] == 0
+        count = sqlite3.connect(db).execute('SELECT COUNT(*) FROM t').fetchone()[0]
+        assert count == 300
+        writer.close()
+
+
+def test_call_returns_result_in_order():
+    """call() sees earlier queued rows and returns fn(conn)'s result"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'w.db')
+        sqlite3.connect(db).execute('CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)')
+        writer = DBWriter(db, batch_seconds=60)
+        writer.execute('INSERT INTO t (name) VALUES (?)', ('first',))
+        new_id = writer.call(lambda conn: conn.execute("INSERT INTO t (name) VALUES ('x')").lastrowid)
+        assert new_id == 2
+        writer.close()
+        assert not writer.thread.is_alive()
+
+
+def test_failed_commit_fails_waiters():
+    """A batch that cannot commit stops the writer; flush/call raise instead of hanging"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'w.db')
+        conn = sqlite3.connect(db)
+        conn.executescript("""
+            CREATE TABLE parent (id INTEGER PRIMARY KEY);
+            CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED);
+        """)
+        conn.close()
+        writer = DBWriter(db, ["PRAGMA foreign_keys = ON"], batch_seconds=60)
+        writer.execute('INSERT INTO parent (id) VALUES (1)')
+        writer.execute('INSERT INTO child (parent_id) VALUES (?)', (42,))  # Fails only on COMMIT
+        writer.execute('INSERT INTO parent (id) VALUES (2)')
+
+        try:
+            writer.flush(timeout=10)
+            assert False, "expected the COMMIT failure"
+        except RuntimeError as e:
+            assert 'FOREIGN KEY' in str(e) and isinstance(e.__cause__, sqlite3.Error)
+        writer.thread.join(10)
+        assert not writer.thread.is_alive() and writer.get_stats()['failed'] == 3
+        for submit in (lambda: writer.execute('INSERT INTO parent (id) VALUES (3)'),
+                       lambda: writer.call(lambda c: 1, timeout=10)):
+            try:
+                submit()
+                assert False, "expected a stopped writer to refuse work"
+            except RuntimeError:
+                pass
+        assert sqlite3.connect(db).execute('SELECT COUNT(*) FROM parent').fetchone()[0] == 0
+        try:
+            writer.close()
+            assert False, "expected close() to report the lost writes"
+        except RuntimeError as e:
+            assert 'FOREIGN KEY' in str(e)
+
+
+def test_call_timeout():
+    """call() gives up after its timeout instead of waiting forever"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'w.db')
+        writer = DBWriter(db)
+        release = threading.Event()
+        writer.run(lambda conn: release.wait(10))
+        try:
+            writer.call(lambda conn: 1, timeout=0.1)
+            assert False, "expected TimeoutError"
+        except TimeoutError:
+            pass
+        release.set()
+        assert writer.flush(timeout=10)
+        writer.close()
+
+
+def test_close_reports_writer_still_draining():
+    """close() raises instead of returning silently while the writer is still busy"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = DBWriter(os.path.join(tmp, 'w.db'))
+        release = threading.Event()
+        writer.run(lambda conn: release.wait(10))
+        try:
+            writer.close(timeout=0.1)
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert 'still draining' in str(e)
+        release.set()
+        writer.close()
+        assert not writer.thread.is_alive()
+
+
+def test_scanner_close_surfaces_writer_failure():
+    """ImprovedLLMScanner.close() raises if its writer lost writes, and still closes the DB"""
+    from production_llm_scanner_v2 import ImprovedLLMScanner
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), small_model=None,
+                                     template_similarity=None, sender_rules=False)
+        scanner.writer.run(lambda conn: conn.execute('COMMIT'))  # The batch COMMIT then fails
+        try:
+            scanner.close()
+            assert False, "expected RuntimeError"
+        except RuntimeError:
+            pass
+        assert scanner.conn is None and scanner.writer is None
+
+
+if __name__ == "__main__":
+    tests = [test_rows_batched_and_duplicates_rejected, test_call_returns_result_in_order,
+             test_failed_commit_fails_waiters, test_call_timeout, test_close_reports_writer_still_draining,
+             test_scanner_close_surfaces_writer_failure]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test evidence search: trigger sync, diacritics folding, ranking, snippets
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import evidence_search
+from evidence_search import ensure_index, match_query, search
+
+
+def make_db() -> sqlite3.Connection:
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE email_evidence (
+            id INTEGER PRIMARY KEY, service_id INTEGER, email_message_id TEXT UNIQUE,
+            email_subject TEXT, email_from TEXT, email_date TEXT,
+            email_body_compact TEXT, confidence_score INTEGER
+        )
+    ''')
+    return conn
+
+
+def add(conn, message_id, subject, sender, body):
+    conn.execute('''
+        INSERT INTO email_evidence (email_message_id, email_subject, email_from, email_body_compact)
+        VALUES (?, ?, ?, ?)
+    ''', (message_id, subject, sender, body))
+
+
+def test_existing_rows_backfilled_and_triggers_sync():
+    """Rows before ensure_index are indexed; inserts/updates/deletes follow"""
+    conn = make_db()
+    add(conn, '<1@x>', 'Předplatné Deníku N', 'predplatne@denikn.cz', 'Vaše předplatné bylo obnoveno')
+    assert ensure_index(conn)
+
+    add(conn, '<2@x>', 'Ihre Rechnung', 'rechnung@spiegel.de', 'Gebühr für Ihr Abonnement: 9,99 €')
+    assert [h['message_id'] for h in search(conn, 'predplatne')] == ['<1@x>']
+    assert [h['message_id'] for h in search(conn, 'gebuhr abo*')] == ['<2@x>']
+
+    conn.execute("UPDATE email_evidence SET email_subject = 'Faktura' WHERE email_message_id = '<1@x>'")
+    assert search(conn, 'faktura')[0]['message_id'] == '<1@x>'
+    conn.execute("DELETE FROM email_evidence WHERE email_message_id = '<2@x>'")
+    assert search(conn, 'gebuhr') == []
+
+
+def test_ranking_snippets_and_query_sanitizing():
+    """Subject hits rank above body hits; operators in user input are harmless"""
+    conn = make_db()
+    ensure_index(conn)
+    add(conn, '<1@x>', 'Newsletter', 'news@shop.cz', 'Tip: Netflix má nové filmy')
+    add(conn, '<2@x>', 'Netflix - potvrzení platby', 'info@netflix.com', 'Platba 259 Kč přijata')
+
+    hits = search(conn, 'netflix')
+    assert [h['message_id'] for h in hits] == ['<2@x>', '<1@x>']
+    assert '[Netflix]' in hits[0]['snippet']
+    assert match_query('Seznam.cz a.s. AND -') == '"Seznam" "cz" "a" "s" "AND"'
+    assert search(conn, '"') == []
+    assert search(conn, 'email_from:netflix', raw=True)[0]['message_id'] == '<2@x>'
+
+
+if __name__ == "__main__":
+    if not evidence_search.fts5_available(sqlite3.connect(':memory:')):
+        print("⚠️  SQLite without FTS5 - skipping")
+        sys.exit(0)
+    tests = [test_existing_rows_backfilled_and_triggers_sync, test_ranking_snippets_and_query_sanitizing]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test columnar export: partitions, body columns, JSONL fallback, manifest, output safety
+"""
+
+import os
+import gzip
+import json
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import body_store
+import export_results
+from schema_migrations import migrate
+
+
+def _database(path):
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    conn.execute("INSERT INTO services (name, detected_via) VALUES ('Netflix', 'llm_scanner_v2')")
+    encoded = body_store.encode('Full body – Předplatné 199 Kč')
+    conn.execute(body_store.INSERT_SQL, encoded)
+    for i, day in enumerate(['2023-12-31T23:00:00', '2024-01-05T09:00:00', '2024-02-05T09:00:00']):
+        conn.execute('''
+            INSERT INTO email_evidence (service_id, email_message_id, email_subject, email_date,
+                                        email_body_compact, email_body_hash, detected_amount)
+            VALUES (1, ?, 'Faktura', ?, 'compact', ?, 199)
+        ''', (f'<{i}@x>', day, encoded[0]))
+    conn.commit()
+    conn.close()
+
+
+def _read_jsonl(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_jsonl_export_partitioned_without_bodies():
+    """Year partitions, no body columns, manifest with counts"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db, out = os.path.join(tmp, 's.db'), os.path.join(tmp, 'export')
+        _database(db)
+        manifest = export_results.export(db, out, fmt='jsonl')
+
+        evidence = os.path.join(out, 'email_evidence')
+        assert sorted(os.listdir(evidence)) == ['year=2023', 'year=2024']
+        rows = _read_jsonl(os.path.join(evidence, 'year=2024', 'part-0.jsonl.gz'))
+        assert len(rows) == 2 and 'email_body_compact' not in rows[0] and rows[0]['detected_amount'] == 199
+        assert manifest['tables']['email_evidence'] == {'rows': 3, 'partitions': ['year=2023', 'year=2024']}
+        assert manifest['tables']['service_spend_summary']['rows'] == 1
+        with open(os.path.join(out, 'manifest.json'), encoding='utf-8') as f:
+            assert json.load(f)['statistics']['evidence'] == 3
+
+
+def test_bodies_resolved_from_store():
+    """--with-bodies fills email_body_full from the compressed store"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db, out = os.path.join(tmp, 's.db'), os.path.join(tmp, 'export')
+        _database(db)
+        export_results.export(db, out, fmt='jsonl', with_bodies=True, partition=False)
+        rows = _read_jsonl(os.path.join(out, 'email_evidence', 'part-0.jsonl.gz'))
+        assert {row['email_body_full'] for row in rows} == {'Full body – Předplatné 199 Kč'}
+
+        if export_results.PYARROW_AVAILABLE:
+            import pyarrow.parquet as pq
+            export_results.export(db, out, fmt='parquet')
+            table = pq.read_table(os.path.join(out, 'email_evidence'))
+            assert table.num_rows == 3 and 'email_body_compact' not in table.column_names
+
+
+def test_refuses_to_replace_foreign_directory():
+    """Only a previous export or an empty directory is replaced without force"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db, out = os.path.join(tmp, 's.db'), os.path.join(tmp, 'home')
+        _database(db)
+        os.makedirs(out)
+        with open(os.path.join(out, 'notes.txt'), 'w') as f:
+            f.write('keep me')
+        try:
+            export_results.export(db, out, fmt='jsonl')
+            assert False, "expected RuntimeError"
+        except RuntimeError as e:
+            assert '--force' in str(e)
+        assert os.listdir(out) == ['notes.txt']
+
+        export_results.export(db, out, fmt='jsonl', force=True)
+        assert 'notes.txt' not in os.listdir(out)
+        export_results.export(db, out, fmt='jsonl')  # Previous export: replaced
+        assert os.path.isfile(os.path.join(out, 'manifest.json'))
+
+        empty = os.path.join(tmp, 'empty')
+        os.makedirs(empty)
+        export_results.export(db, empty, fmt='jsonl')
+        assert os.path.isfile(os.path.join(empty, 'manifest.json'))
+
+
+if __name__ == "__main__":
+    tests = [test_jsonl_export_partitioned_without_bodies, test_bodies_resolved_from_store,
+             test_refuses_to_replace_foreign_directory]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test fake Ollama server: synth/replay/record, fault injection, concurrency
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_ollama_server import FakeOllamaServer, prompt_key
+from llm_client import OllamaClient
+
+EMAIL_PROMPT = '''Vrať JSON s "is_subscription".
+EMAIL:
+From: billing@github.com
+Subject: Your GitHub subscription renewal
+Body: Your monthly subscription renews on 1.12.2025, total $4.00'''
+
+
+def test_synth_email_verdict_and_streaming():
+    """Synthesized verdict parses; streaming client stops early"""
+    server = FakeOllamaServer(seed=1).start()
+    try:
+        client = OllamaClient(server.url, 'm')
+        verdict = json.loads(client.generate(EMAIL_PROMPT))
+        assert verdict['is_subscription'] is True
+        assert verdict['amount'] == 4.0
+
+        text = client.generate(EMAIL_PROMPT, stream=True, required_fields=['is_subscription', 'confidence'])
+        assert json.loads(text)['is_subscription'] is True
+        assert client.get_stats()['early_stops'] == 1
+    finally:
+        server.stop()
+
+
+def test_replay_and_record():
+    """Record mode stores upstream answers; replay mode serves them by prompt hash"""
+    upstream = FakeOllamaServer(seed=2).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rec.jsonl')
+        recorder = FakeOllamaServer(mode='record', recordings=path, upstream=upstream.url).start()
+        try:
+            recorded = OllamaClient(recorder.url, 'm').generate(EMAIL_PROMPT)
+        finally:
+            recorder.stop()
+            upstream.stop()
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'key': prompt_key('m', EMAIL_PROMPT), 'response': '{"replayed": true}'}) + '\n')
+        replayer = FakeOllamaServer(mode='replay', recordings=path, strict=True).start()
+        try:
+            client = OllamaClient(replayer.url, 'm')
+            assert json.loads(client.generate(EMAIL_PROMPT)) == {'replayed': True}
+            try:
+                client.generate('unknown prompt')
+                assert False, "expected 404 on strict replay miss"
+            except requests.HTTPError as e:
+                assert e.response.status_code == 404
+        finally:
+            replayer.stop()
+    assert 'is_subscription' in recorded
+
+
+def test_fault_injection_and_concurrency_limit():
+    """Errors are injected at the given rate; concurrency slots are respected"""
+    server = FakeOllamaServer(error_rate=1.0, error_status=503, seed=3).start()
+    try:
+        response = requests.post(server.url, json={'model': 'm', 'prompt': 'x', 'stream': False})
+        assert response.status_code == 503
+    finally:
+        server.stop()
+
+    server = FakeOllamaServer(latency='const:0.2', max_concurrency=2).start()
+    try:
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            codes = list(executor.map(
+                lambda _: requests.post(server.url, json={'model': 'm', 'prompt': 'x', 'stream': False}).status_code,
+                range(6)))
+        elapsed = time.monotonic() - start
+        stats = requests.get(f"{server.base_url}/stats").json()
+        assert codes == [200] * 6
+        assert stats['max_in_flight'] == 2
+        assert elapsed >= 0.55  # 6 requests / 2 slots * 0.2 s
+    finally:
+        server.stop()
+
+    server = FakeOllamaServer(timeout_rate=1.0, hang_seconds=2).start()
+    try:
+        try:
+            requests.post(server.url, json={'model': 'm', 'prompt': 'x', 'stream': False}, timeout=0.3)
+            assert False, "expected timeout"
+        except requests.Timeout:
+            pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    tests = [test_synth_email_verdict_and_streaming, test_replay_and_record,
+             test_fault_injection_and_concurrency_limit]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
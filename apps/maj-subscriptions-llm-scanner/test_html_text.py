@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test HTML → text stage: visible text, structural counts, message normalization, scorer use
+"""
+
+import os
+import sys
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from html_text import html_to_text, normalize_message
+from subscription_scorer import SubscriptionScorer
+
+RECEIPT_HTML = """<!DOCTYPE html><html><head><title>Receipt</title>
+<style>td { padding: 4px }</style></head><body>
+<table><tr><td>Plan:</td><td>Spotify&nbsp;Premium</td></tr>
+<tr><td>Total:</td><td>169,00&nbsp;Kč</td></tr></table>
+<p>Your subscription
+   renews on 1.&nbsp;2.&nbsp;2026</p><!-- <p>hidden</p> -->
+<a href="https://spotify.com/account">Account</a> |
+<A HREF='https://spotify.com/u?e=1'>Unsubscribe</A>
+<a href="https://spotify.com/prefs">Manage your preferences</a> <a name="top">top</a>
+<img src="https://spotify.com/logo.png" width="120" height="40">
+<img src="https://t.spotify.com/o.gif" width="1" height="1">
+<img src="https://t.spotify.com/p.gif" style="display:none">
+<script>document.write('<table>');</script>&lt;not a tag&gt;</body></html>"""
+
+
+def test_text_and_counts():
+    """Scripts, styles, comments and markup are dropped; counts come from the same pass"""
+    html = html_to_text(RECEIPT_HTML)
+    assert html['text'].splitlines() == [
+        'Plan: Spotify Premium',
+        'Total: 169,00 Kč',
+        'Your subscription renews on 1. 2. 2026',
+        'Account | Unsubscribe Manage your preferences top <not a tag>',
+    ], html['text']
+    assert (html['links'], html['images'], html['tables']) == (3, 3, 1)
+    assert (html['tracking_pixels'], html['unsubscribe_links']) == (2, 2)
+    assert html_to_text('') == {'text': '', 'has_html': False, 'links': 0, 'images': 0, 'tables': 0,
+                                'tracking_pixels': 0, 'unsubscribe_links': 0, 'list_unsubscribe': False}
+
+
+def test_normalize_message():
+    """HTML-only emails get the HTML text as body; plain text wins when present"""
+    msg = EmailMessage()
+    msg['List-Unsubscribe'] = '<mailto:u@spotify.com>'
+    msg.set_content(RECEIPT_HTML, subtype='html')
+    record = normalize_message(msg)
+    assert record['body'].startswith('Plan: Spotify Premium') and '<td>' not in record['body']
+    assert record['html']['list_unsubscribe'] and record['html']['tables'] == 1
+
+    msg = EmailMessage()
+    msg.set_content('Plain receipt: 169 Kč')
+    msg.add_alternative(RECEIPT_HTML, subtype='html')
+    msg.add_attachment('<table></table>'.encode(), maintype='text', subtype='html', filename='a.html')
+    record = normalize_message(msg)
+    assert record['body'].strip() == 'Plain receipt: 169 Kč'
+    assert record['html']['tables'] == 1 and not record['html']['list_unsubscribe']
+
+
+def test_scorer_reads_counts():
+    """SubscriptionScorer uses the record's table/unsubscribe counts instead of raw markup"""
+    scorer = SubscriptionScorer(fuzzy=False)
+    html = html_to_text(RECEIPT_HTML)
+    from_raw = scorer.score_email('Your receipt', 'no-reply@spotify.com', RECEIPT_HTML, content_type='html')
+    from_record = scorer.score_email('Your receipt', 'no-reply@spotify.com', html['text'], html=html)
+    assert 'html_table' in from_raw.matched_patterns and 'html_table' in from_record.matched_patterns
+    assert 'unsubscribe_link' in from_record.matched_patterns
+    no_table = scorer.score_email('Your receipt', 'no-reply@spotify.com', 'Total: 169,00 Kč',
+                                  html=html_to_text('<p>Total: 169,00 Kč</p>'))
+    assert 'html_table' not in no_table.matched_patterns
+
+
+if __name__ == "__main__":
+    tests = [test_text_and_counts, test_normalize_message, test_scorer_reads_counts]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
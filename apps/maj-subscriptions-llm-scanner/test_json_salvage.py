@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Test JSON salvage of malformed LLM output
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from json_salvage import salvage_json
+
+REQUIRED = ['is_subscription']
+FIELDS = ['is_subscription', 'confidence', 'service_name', 'amount', 'currency',
+          'subscription_type', 'reasoning']
+
+
+def test_salvage_methods():
+    """Strict, repaired and field-level recovery; garbage gives None"""
+    cases = [
+        ('{"is_subscription": true, "confidence": 90}',
+         {'is_subscription': True, 'confidence': 90}, 'strict'),
+        ('```json\n{"is_subscription": true, "confidence": 90}\n```\nHope this helps!',
+         {'is_subscription': True, 'confidence': 90}, 'strict'),
+        ('Sure, here it is: {"is_subscription": true, "confidence": 90} Let me know.',
+         {'is_subscription': True, 'confidence': 90}, 'repaired'),
+        ("{'is_subscription': True, 'service_name': 'Netflix', 'amount': None,}",
+         {'is_subscription': True, 'service_name': 'Netflix', 'amount': None}, 'repaired'),
+        ('{"is_subscription": false, "confidence": 70, "reasoning": "Jednorázový ná',
+         {'is_subscription': False, 'confidence': 70, 'reasoning': 'Jednorázový ná'}, 'repaired'),
+        ('{"is_subscription": true, "confidence": 95, "amount": ',
+         {'is_subscription': True, 'confidence': 95}, 'repaired'),
+        ('{is_subscription: true, subscription_type: monthly}',
+         {'is_subscription': True, 'subscription_type': 'monthly'}, 'repaired'),
+        ('is_subscription = true\nconfidence = 60 (not JSON)',
+         {'is_subscription': True, 'confidence': 60}, 'fields'),
+    ]
+    for text, expected, method in cases:
+        assert salvage_json(text, REQUIRED, FIELDS) == (expected, method), text
+
+    assert salvage_json('I cannot determine this.', REQUIRED, FIELDS) == (None, None)
+    assert salvage_json('{"confidence": 50}', REQUIRED, FIELDS) == (None, None)
+
+
+if __name__ == "__main__":
+    tests = [test_salvage_methods]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test LLM client load balancing against local stub Ollama servers
+Least-outstanding-requests routing, model lists, failover, health checks
+"""
+
+import json
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from llm_client import OllamaClient, CircuitOpenError
+
+
+class StubOllama:
+    """Minimal /api/generate + /api/tags server on a random local port"""
+
+    def __init__(self, name: str, delay: float = 0.0, status: int = 200):
+        self.name = name
+        self.delay = delay
+        self.status = status
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(stub.status, {"models": []})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.hits += 1
+                time.sleep(stub.delay)
+                self._reply(stub.status, {"response": json.dumps({"backend": stub.name})})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/generate"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_least_outstanding_routing():
+    """Slow backend accumulates in-flight calls, fast backend takes the rest"""
+    slow, fast = StubOllama('slow', delay=0.5), StubOllama('fast', delay=0.02)
+    try:
+        client = OllamaClient(model='m', backends=[
+            {"url": slow.url, "models": ["m"], "weight": 1},
+            {"url": fast.url, "models": ["m"], "weight": 1},
+        ])
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: client.generate("x"), range(40)))
+
+        print(f"slow={slow.hits} fast={fast.hits}")
+        assert fast.hits > slow.hits * 3
+        per_backend = {b['url']: b for b in client.get_stats()['backends']}
+        assert per_backend[fast.url]['successes'] == fast.hits
+        assert per_backend[fast.url]['throughput_per_min'] > 0
+    finally:
+        slow.close()
+        fast.close()
+
+
+def test_model_lists_and_weights():
+    """Requests only go to backends serving the model"""
+    a, b = StubOllama('a'), StubOllama('b')
+    try:
+        client = OllamaClient(model='small', backends=[
+            {"url": a.url, "models": ["small"], "weight": 1},
+            {"url": b.url, "models": ["big"], "weight": 4},
+        ])
+        for _ in range(5):
+            assert json.loads(client.generate("x"))['backend'] == 'a'
+        assert json.loads(client.generate("x", model='big'))['backend'] == 'b'
+        try:
+            client.generate("x", model='unknown')
+            assert False, "expected CircuitOpenError"
+        except CircuitOpenError:
+            pass
+    finally:
+        a.close()
+        b.close()
+
+
+def test_failover_and_health_check():
+    """5xx and dead hosts fail over; health check opens/closes circuits"""
+    broken, good = StubOllama('broken', status=503), StubOllama('good')
+    dead_url = "http://127.0.0.1:9/api/generate"  # Nothing listens on discard port
+    try:
+        client = OllamaClient(model='m', recovery_timeout=60, backends=[
+            {"url": broken.url}, {"url": dead_url}, {"url": good.url},
+        ])
+        for _ in range(6):
+            assert json.loads(client.generate("x"))['backend'] == 'good'
+        assert client.get_stats()['failovers'] > 0
+
+        assert client.check_health() == 1
+        states = {b['url']: b['circuit_state'] for b in client.get_stats()['backends']}
+        assert states[good.url] == 'CLOSED'
+        assert states[broken.url] == 'OPEN'
+        assert states[dead_url] == 'OPEN'
+
+        broken.status = 200
+        assert client.check_health() == 2
+    finally:
+        broken.close()
+        good.close()
+
+
+if __name__ == "__main__":
+    tests = [test_least_outstanding_routing, test_model_lists_and_weights,
+             test_failover_and_health_check]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
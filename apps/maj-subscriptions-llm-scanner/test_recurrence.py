@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test recurring charge inference: periods, merging, churn, price changes
+"""
+
+import os
+import sqlite3
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from recurrence import load_timeline, update_services
+from schema_migrations import migrate
+
+
+def _timeline(conn, service_id, dates, amounts):
+    for i, (day, amount) in enumerate(zip(dates, amounts)):
+        conn.execute('''
+            INSERT INTO email_evidence (service_id, email_message_id, email_date, detected_amount)
+            VALUES (?, ?, ?, ?)
+        ''', (service_id, f'<{service_id}-{i}@x>', f'{day}T09:00:00', amount))
+
+
+def test_periods_next_charge_and_price_change():
+    """Monthly with a price rise + duplicate receipts, yearly, irregular"""
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute("INSERT INTO services (name, subscription_type) VALUES ('Netflix', 'yearly'), ('Domain', NULL), ('Shop', 'monthly')")
+    _timeline(conn, 1, ['2025-01-05', '2025-01-06', '2025-02-05', '2025-03-05', '2025-04-05', '2025-05-05'],
+              [199, None, 199, 199, 259, 259])
+    _timeline(conn, 2, ['2021-07-01', '2022-07-01', '2023-07-02'], [300, 300, 300])
+    _timeline(conn, 3, ['2025-01-01', '2025-01-20', '2025-04-11'], [10, 20, 30])
+
+    results = {r['service_id']: r for r in update_services(conn, today=date(2025, 5, 20))}
+    netflix, domain, shop = results[1], results[2], results[3]
+    assert netflix['period'] == 'monthly' and netflix['charges'] == 5
+    assert netflix['next_charge'] == '2025-06-04' and netflix['status'] == 'active'
+    assert netflix['price'] == 259 and netflix['price_change'] == 60 and netflix['price_changes'] == 1
+    assert domain['period'] == 'yearly' and domain['status'] == 'churned'
+    assert shop['period'] is None and shop['next_charge'] is None
+
+    rows = dict((row[0], row[1:]) for row in conn.execute(
+        'SELECT id, subscription_type, status, price_amount, next_charge_date FROM services'))
+    assert rows[1] == ('monthly', 'active', 259.0, '2025-06-04')
+    assert rows[2][:2] == ('yearly', 'churned')
+    assert rows[3] == ('monthly', None, 30.0, None)  # LLM guess kept when nothing dominates
+
+
+def test_text_amounts_become_nan():
+    """Text in detected_amount (older rows, '9,99') is unknown, not a crash"""
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute("INSERT INTO services (name) VALUES ('Spotify')")
+    _timeline(conn, 1, ['2025-01-10', '2025-02-10', '2025-03-10'], ['9,99', 9.99, 10])
+    timeline = load_timeline(conn)
+    assert timeline.shape == (3, 3)
+    amounts = timeline[:, 2]
+    assert amounts[0] != amounts[0] and list(amounts[1:]) == [9.99, 10.0]  # NaN, then numbers
+    result = update_services(conn, today=date(2025, 3, 20))[0]
+    assert result['period'] == 'monthly' and result['price'] == 10
+
+
+if __name__ == "__main__":
+    tests = [test_periods_next_charge_and_price_change, test_text_amounts_become_nan]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test mbox checkpoints: out-of-order completion, compact ranges, exact resume
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import mailbox
+import email.message
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from scan_checkpoint import MboxCheckpoint, UPSERT_SQL, message_offsets, decode_completed
+
+
+def test_out_of_order_completion_and_exact_resume():
+    """Random completion order: watermark covers the contiguous prefix, resume skips exactly the done set"""
+    ranges = [(i * 100, i * 100 + 100) for i in range(200)]
+    order = list(range(200))
+    random.Random(7).shuffle(order)
+    in_flight = set(order[150:])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'cp.db'))
+        checkpoint = MboxCheckpoint.load(conn, '/mail/INBOX')
+        done = set()
+        for i in order[:150]:
+            checkpoint.mark_done(*ranges[i])
+            done.add(i)
+            first_open = min(set(range(200)) - done)
+            assert checkpoint.watermark == ranges[first_open][0]
+        conn.execute(UPSERT_SQL, checkpoint.row())
+        conn.execute(UPSERT_SQL, checkpoint.row())  # Saving again replaces the row
+        conn.commit()
+        assert conn.execute('SELECT COUNT(*) FROM mbox_checkpoints').fetchone()[0] == 1
+
+        resumed = MboxCheckpoint.load(conn, '/mail/INBOX')
+        assert resumed.watermark == ranges[min(in_flight)][0]
+        assert [i for i in range(200) if not resumed.is_done(ranges[i][0])] == sorted(in_flight)
+
+        # Adjacent finished messages are merged: one range per gap between in-flight messages
+        assert len(resumed.completed) <= len(in_flight)
+        for start, end in decode_completed(checkpoint.row()[2]).items():
+            assert not any(start <= ranges[i][0] < end for i in in_flight)
+
+        for i in in_flight:
+            resumed.mark_done(*ranges[i])
+        assert resumed.watermark == ranges[-1][1] and resumed.completed == {}
+
+
+def test_message_offsets_and_running_only():
+    """Offsets follow file order and tile the mbox; completed scans start fresh"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'INBOX')
+        box = mailbox.mbox(path)
+        for i in range(5):
+            msg = email.message.EmailMessage()
+            msg['Subject'] = f'Message {i}'
+            msg.set_content('x' * (i * 10))
+            box.add(msg)
+        box.flush()
+
+        offsets = message_offsets(mailbox.mbox(path))
+        assert len(offsets) == 5 and offsets[0][1] == 0
+        assert all(offsets[i][2] == offsets[i + 1][1] for i in range(4))
+
+        conn = sqlite3.connect(':memory:')
+        checkpoint = MboxCheckpoint.load(conn, path)
+        for _key, start, end in offsets:
+            checkpoint.mark_done(start, end)
+        checkpoint.finish()
+        conn.execute(UPSERT_SQL, checkpoint.row())
+        assert MboxCheckpoint.load(conn, path).watermark == 0
+
+
+if __name__ == "__main__":
+    tests = [test_out_of_order_completion_and_exact_resume, test_message_offsets_and_running_only]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test budgeted best-first scanning: durations, budgets, recall estimate, ordering
+"""
+
+import email.message
+import email.utils
+import json
+import mailbox
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_ollama_server import FakeOllamaServer
+from production_llm_scanner_v2 import ImprovedLLMScanner
+from scan_scheduler import PRIORITY_BUCKETS, RecallEstimator, ScanBudget, parse_duration
+
+# (subject, sender, body) in mbox order; SubscriptionScorer ranks them
+# Netflix (50%), Invoice (22.5%), Trial (12.5%), then the 0% ties in mbox order
+EMAILS = [
+    ('Weekly newsletter', 'news@example.com', 'Try our premium features today!'),
+    ('Payment received', 'shop@example.com', 'We received your payment for order 1234.'),
+    ('Trial ending soon', 'hello@app.io', 'Your trial ends soon, choose a plan.'),
+    ('Invoice for your Premium plan', 'invoice@example.com', 'Invoice total 299 Kč. Thank you for your payment.'),
+    ('Your Netflix subscription renewed', 'billing@netflix.com',
+     'Your monthly subscription renewed. Amount charged: $15.99 per month. Next payment 15.01.2026.'),
+]
+BEST_FIRST = ['Your Netflix subscription renewed', 'Invoice for your Premium plan', 'Trial ending soon',
+              'Weekly newsletter', 'Payment received']
+
+
+def test_parse_duration():
+    """h/m/s combinations and plain seconds; anything else is a ValueError"""
+    assert parse_duration('90m') == 5400
+    assert parse_duration('2h') == 7200
+    assert parse_duration('1h30m') == 5400
+    assert parse_duration('1h 30m 15s') == 5415
+    assert parse_duration('45s') == 45
+    assert parse_duration('1.5h') == 5400
+    assert parse_duration(' 120 ') == 120
+    assert parse_duration(30) == 30
+    for bad in ('', 'soon', '10x', '1h30', 'h', '5m later', '-5m'):
+        try:
+            parse_duration(bad)
+            assert False, f"expected ValueError for {bad!r}"
+        except ValueError:
+            pass
+
+
+def test_budget_exhausted():
+    """Deadline and call cap each end the budget; no limits never do"""
+    assert ScanBudget().exhausted(10 ** 6) is None
+
+    calls = ScanBudget(max_llm_calls=3)
+    assert calls.exhausted(2) is None
+    assert calls.exhausted(3) == "3 LLM calls"
+
+    deadline = ScanBudget(deadline_seconds=0.05)
+    assert deadline.exhausted(0) is None
+    time.sleep(0.06)
+    assert deadline.exhausted(0) == "deadline 0s"
+    assert ScanBudget(deadline_seconds=60, max_llm_calls=1).exhausted(1) == "1 LLM calls"
+
+
+def test_recall_estimator():
+    """Buckets of 10 points, rates smoothed towards the bucket prior, recall of found vs expected"""
+    assert [RecallEstimator.bucket(p) for p in (0, 9.9, 10, 55, 99.9, 100, 150, -5)] == \
+        [0, 0, 1, 5, 9, 9, 9, 0]
+
+    estimator = RecallEstimator([95, 92, 91, 15, 12])
+    assert estimator.pending[9] == 3 and estimator.pending[1] == 2
+    assert estimator.rate(9) == 0.95 and estimator.rate(1) == 0.15  # Prior only
+
+    estimator.record(95, True)
+    estimator.record(92, True)
+    assert estimator.rate(9) == (2 + 2.0 * 0.95) / (2 + 2.0)
+    estimator.record(15, False)
+    assert estimator.rate(1) == (0 + 2.0 * 0.15) / (1 + 2.0)
+
+    estimate = estimator.estimate()
+    expected_missed = estimator.rate(9) + estimator.rate(1)
+    assert estimate['processed'] == 3 and estimate['remaining'] == 2 and estimate['found'] == 2
+    assert estimate['expected_missed'] == round(expected_missed, 1)
+    assert estimate['recall'] == round(2 / (2 + expected_missed) * 100, 1)
+
+    assert RecallEstimator([]).estimate()['recall'] == 100.0
+    assert len(estimator.pending) == PRIORITY_BUCKETS
+
+
+def write_mbox(path: str):
+    box = mailbox.mbox(path)
+    for i, (subject, sender, body) in enumerate(EMAILS):
+        msg = email.message.EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = sender
+        msg['To'] = 'me@example.com'
+        msg['Message-ID'] = f'<scheduler-{i}@example.com>'
+        msg['Date'] = email.utils.formatdate(localtime=True)
+        msg.set_content(body)
+        box.add(msg)
+    box.flush()
+
+
+def run_scan(tmp: str, trip_breaker: bool = False, **budget):
+    """scan_prioritized against a fake server that says "subscription" to everything"""
+    asked = []
+
+    def responder(model, prompt):
+        asked.append(re.search(r'Subject: (.*)', prompt).group(1).strip())
+        return json.dumps({"is_subscription": True, "confidence": 95, "service_name": asked[-1][:20],
+                           "reasoning": "test"})
+
+    server = FakeOllamaServer(models=['test-model'], responder=responder).start()
+    write_mbox(os.path.join(tmp, 'INBOX'))
+    scanner = ImprovedLLMScanner(os.path.join(tmp, 'scan.db'), ollama_url=server.url,
+                                 backends=[{'url': server.url}], model='test-model', small_model=None,
+                                 template_similarity=None, sender_rules=False)
+    try:
+        if trip_breaker:
+            scanner.llm.backends[0].breaker.trip()  # Every email parks until the probe succeeds
+        results = scanner.scan_prioritized(os.path.join(tmp, 'INBOX'), **budget)
+        return scanner.stats, results, asked
+    finally:
+        scanner.close()
+        server.stop()
+
+
+def test_best_first_order_and_deferral():
+    """LLM sees emails in scorer order; the call budget defers the least promising ones"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stats, results, asked = run_scan(tmp, max_llm_calls=3)
+        assert asked == BEST_FIRST[:3], asked
+        assert len(results) == 3 and stats['deferred'] == 2
+        assert 0 < stats['estimated_recall'] < 100
+
+
+def test_drained_parked_emails_count_towards_recall():
+    """Emails parked on an open circuit and drained later are recorded by the estimator"""
+    with tempfile.TemporaryDirectory() as tmp:
+        stats, results, asked = run_scan(tmp, trip_breaker=True)
+        assert stats['parked'] == len(EMAILS) and stats['unprocessed'] == 0
+        assert asked == BEST_FIRST, asked  # Parked in priority order, drained in that order
+        assert len(results) == len(EMAILS)
+        assert stats['estimated_recall'] == 100.0
+
+
+if __name__ == "__main__":
+    tests = [test_parse_duration, test_budget_exhausted, test_recall_estimator,
+             test_best_first_order_and_deferral, test_drained_parked_emails_count_towards_recall]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test schema migrations: fresh database, legacy database, partial target
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import schema_migrations
+from schema_migrations import LATEST_VERSION, benchmark, current_version, migrate
+
+
+def test_fresh_database_reaches_latest_once():
+    """All steps run on an empty database; a second run applies nothing"""
+    conn = sqlite3.connect(':memory:')
+    assert migrate(conn) == list(range(1, LATEST_VERSION + 1))
+    assert current_version(conn) == LATEST_VERSION
+    assert migrate(conn) == []
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_evidence_service_date', 'idx_llm_verdicts_final', 'idx_services_detected_via'} <= indexes
+    assert 'idx_service_id' not in indexes
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0] == 1
+
+
+def test_legacy_database_migrated_in_place():
+    """Existing rows survive; inline bodies move to email_bodies"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE services (id INTEGER PRIMARY KEY, name TEXT, detected_via TEXT)')
+    conn.execute('''
+        CREATE TABLE email_evidence (
+            id INTEGER PRIMARY KEY, service_id INTEGER, email_message_id TEXT UNIQUE,
+            email_subject TEXT, email_from TEXT, email_date TEXT, email_body_compact TEXT,
+            email_body_full TEXT, confidence_score INTEGER, detected_amount REAL, detected_currency TEXT
+        )
+    ''')
+    conn.execute("INSERT INTO services (name, detected_via) VALUES ('GitHub', 'llm_scanner_v2')")
+    conn.execute('''
+        INSERT INTO email_evidence (service_id, email_message_id, email_subject, email_body_full)
+        VALUES (1, '<1@x>', 'Your receipt', 'Total: $4.00')
+    ''')
+    conn.commit()
+
+    assert migrate(conn, target=3) == [1, 2, 3]
+    assert conn.execute('SELECT email_body_full FROM email_evidence').fetchone()[0] == 'Total: $4.00'
+
+    before = benchmark(conn, repeat=1)
+    assert migrate(conn) == list(range(4, LATEST_VERSION + 1))
+    after = benchmark(conn, repeat=1)
+    assert set(before) == set(after) == set(schema_migrations.BENCHMARK_QUERIES)
+    assert all(value is not None for value in after.values())
+
+    assert conn.execute('SELECT email_body_full, email_body_hash IS NOT NULL FROM email_evidence').fetchone() == (None, 1)
+    assert conn.execute('SELECT COUNT(*) FROM email_bodies').fetchone()[0] == 1
+
+
+if __name__ == "__main__":
+    tests = [test_fresh_database_reaches_latest_once, test_legacy_database_migrated_in_place]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test learned sender rules: support threshold, persistence, drift deactivation
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sender_rules import SenderRuleTable, rule_key
+
+SENDER = 'GitHub <billing@github.com>'
+VERDICT = {'is_subscription': True, 'confidence': 95, 'service_name': 'GitHub',
+           'currency': 'USD', 'subscription_type': 'monthly', 'model': 'm'}
+
+
+def test_rule_activates_after_support_and_persists():
+    """5 agreeing verdicts activate the rule; it survives a reload"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'rules.db')
+        conn = sqlite3.connect(db)
+        table = SenderRuleTable(conn, min_support=5)
+        for month in range(1, 6):
+            assert table.lookup(SENDER, f'Your receipt from GitHub #{month}00{month}') is None
+            table.record(SENDER, f'Your receipt from GitHub #{month}00{month}', VERDICT)
+        conn.commit()
+        conn.close()
+
+        reloaded = SenderRuleTable(sqlite3.connect(db), min_support=5)
+        rule = reloaded.lookup('billing@github.com', 'Re: Your receipt from GitHub #6006')
+        assert rule is not None
+
+        result = reloaded.verdict(rule, 'Your receipt from GitHub', 'Total: $4.00\nDate: 2025-12-01')
+        assert result['is_subscription'] is True and result['service_name'] == 'GitHub'
+        assert result['amount'] == 4.0 and result['billing_date'] == '2025-12-01'
+        assert reloaded.get_stats() == {'rules': 1, 'active': 1}
+
+
+def test_drift_deactivates_rule():
+    """A disagreeing audit verdict drops agreement below the threshold"""
+    with tempfile.TemporaryDirectory() as tmp:
+        table = SenderRuleTable(sqlite3.connect(os.path.join(tmp, 'rules.db')), min_support=5)
+        for _ in range(5):
+            table.record(SENDER, 'Your receipt from GitHub', VERDICT)
+        table.record(SENDER, 'Your receipt from GitHub', {'is_subscription': True, 'error': 'x'})
+        assert table.lookup(SENDER, 'Your receipt from GitHub') is not None
+
+        table.record(SENDER, 'Your receipt from GitHub', {'is_subscription': False, 'confidence': 90})
+        assert table.lookup(SENDER, 'Your receipt from GitHub') is None
+        assert rule_key(SENDER, 'Fwd: Your receipt from GitHub')[1] == 'your receipt from github'
+
+
+if __name__ == "__main__":
+    tests = [test_rule_activates_after_support_and_persists, test_drift_deactivates_rule]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test service registry: canonical names, preload, register
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from service_registry import ServiceRegistry, canonical_name
+
+
+def test_canonical_names():
+    """Case, diacritics, legal forms and plan words are ignored"""
+    assert canonical_name('Microsoft 365') == canonical_name('MICROSOFT Corp.') == 'microsoft'
+    assert canonical_name('GitHub Pro') == canonical_name('GitHub, Inc.') == 'github'
+    assert canonical_name('Seznam.cz a.s.') == canonical_name('seznam') == 'seznam'
+    assert canonical_name('Předplatné Deníku N') == canonical_name('deniku n')
+    assert canonical_name('Google One') != canonical_name('Google Workspace')
+    assert canonical_name('Pro') == 'pro'  # All-generic names are kept
+
+
+def test_registry_preload_and_register():
+    """Existing rows are preloaded; new rows are visible without a SELECT"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE services (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.execute("INSERT INTO services (name) VALUES ('Microsoft'), ('Netflix')")
+
+    registry = ServiceRegistry(conn)
+    assert registry.lookup('Microsoft 365') == 1
+    assert registry.lookup('netflix.com') == 2
+    assert registry.lookup('Spotify Premium') is None
+
+    registry.register('Spotify', 3)
+    assert registry.lookup('SPOTIFY') == 3
+    assert registry.stats == {'hits': 3, 'misses': 1, 'merged': 3}
+
+
+if __name__ == "__main__":
+    tests = [test_canonical_names, test_registry_preload_and_register]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
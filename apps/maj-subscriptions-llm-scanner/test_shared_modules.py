@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Test that modules shared with maj-subscriptions-local are identical copies
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OTHER_APP = os.path.join(HERE, '..', 'maj-subscriptions-local')
+
+# Copied into both apps instead of imported across app directories
+SHARED_MODULES = ['html_text.py', 'body_store.py', 'evidence_search.py']
+
+
+def test_shared_modules_identical():
+    """Every shared module matches the other app's copy byte for byte"""
+    for name in SHARED_MODULES:
+        with open(os.path.join(HERE, name), 'rb') as f:
+            mine = f.read()
+        with open(os.path.join(OTHER_APP, name), 'rb') as f:
+            theirs = f.read()
+        assert mine == theirs, f"{name} differs between maj-subscriptions-llm-scanner and maj-subscriptions-local"
+
+
+if __name__ == "__main__":
+    tests = [test_shared_modules_identical]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
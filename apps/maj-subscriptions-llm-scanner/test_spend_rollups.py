@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test spend rollups: incremental triggers match a full rebuild
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from schema_migrations import migrate
+from spend_rollups import rebuild, service_spend
+
+
+def _snapshot(conn):
+    monthly = conn.execute('''
+        SELECT service_id, month, currency, ROUND(amount, 2), emails
+        FROM service_monthly_spend ORDER BY 1, 2, 3
+    ''').fetchall()
+    summary = conn.execute('SELECT * FROM service_spend_summary ORDER BY service_id').fetchall()
+    return monthly, summary
+
+
+def _evidence(conn, message_id, service_id, date, amount, currency, period=None):
+    conn.execute('''
+        INSERT INTO email_evidence (service_id, email_message_id, email_date,
+                                    detected_amount, detected_currency, detected_subscription_type)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (service_id, message_id, date, amount, currency, period))
+
+
+def test_inserts_update_rollups_incrementally():
+    """Out-of-order inserts give the same rollups as a rebuild"""
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute("INSERT INTO services (name) VALUES ('Netflix'), ('GitHub')")
+    _evidence(conn, '<1@x>', 1, '2025-03-02T10:00:00', 199.0, 'CZK', 'monthly')
+    _evidence(conn, '<2@x>', 1, '2025-01-02T10:00:00', 199.0, 'CZK', 'monthly')
+    _evidence(conn, '<3@x>', 1, '2025-03-20T10:00:00', 50.0, 'CZK', None)
+    _evidence(conn, '<4@x>', 2, '2025-02-11T08:00:00', 48.0, 'USD', 'yearly')
+    _evidence(conn, '<5@x>', None, '2025-02-11T08:00:00', 1.0, 'USD')
+
+    incremental = _snapshot(conn)
+    assert (1, '2025-03', 'CZK', 249.0, 2) in incremental[0]
+    assert incremental[1][0] == (1, 3, '2025-01-02T10:00:00', '2025-03-20T10:00:00', 50.0, 'CZK', 'monthly')
+    rebuild(conn)
+    assert _snapshot(conn) == incremental
+
+    spend = {item['name']: item for item in service_spend(conn)}
+    assert spend['GitHub']['monthly_estimate'] == 4.0
+    assert spend['Netflix']['recent_amounts'] == {'CZK': 448.0}
+
+
+def test_updates_and_deletes_keep_rollups_exact():
+    """Reassigned and deleted evidence leaves no stale rows"""
+    conn = sqlite3.connect(':memory:')
+    migrate(conn)
+    conn.execute("INSERT INTO services (name) VALUES ('Spotify'), ('Apple')")
+    _evidence(conn, '<1@x>', 1, '2025-05-01', 169.0, 'CZK', 'monthly')
+    _evidence(conn, '<2@x>', 1, '2025-06-01', 169.0, 'CZK', 'monthly')
+    conn.execute("UPDATE email_evidence SET service_id = 2, detected_amount = 29.0 WHERE email_message_id = '<2@x>'")
+    conn.execute("DELETE FROM email_evidence WHERE email_message_id = '<1@x>'")
+
+    incremental = _snapshot(conn)
+    assert incremental == ([(2, '2025-06', 'CZK', 29.0, 1)],
+                           [(2, 1, '2025-06-01', '2025-06-01', 29.0, 'CZK', 'monthly')])
+    rebuild(conn)
+    assert _snapshot(conn) == incremental
+
+
+if __name__ == "__main__":
+    tests = [test_inserts_update_rollups_incrementally, test_updates_and_deletes_keep_rollups_exact]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test template index: near-duplicate verdict reuse, local amount/date extraction
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from template_index import TemplateIndex, extract_amount, extract_date, normalize_text
+
+INVOICE = """Hi Martin,
+
+Thanks for being a GitHub Pro member. This is your receipt for {month}.
+
+Receipt #{receipt}
+Date: {date}
+Plan: GitHub Pro (monthly)
+Total: {amount}
+
+Your subscription renews automatically. Manage billing at https://github.com/settings/billing?ref={receipt}
+
+GitHub, Inc. 88 Colin P Kelly Jr Street, San Francisco, CA 94107"""
+
+VERDICT = {'is_subscription': True, 'confidence': 95, 'service_name': 'GitHub',
+           'amount': 4.0, 'currency': 'USD', 'subscription_type': 'monthly', 'model': 'm'}
+
+
+def test_monthly_invoices_reuse_verdict():
+    """Same template, different month/amount/receipt → reuse with local amount + date"""
+    index = TemplateIndex(threshold=0.92)
+    october = INVOICE.format(month='October', receipt='A1B2C3D4E5F6G7', date='2025-10-01', amount='$4.00')
+    november = INVOICE.format(month='November', receipt='Z9Y8X7W6V5U4T3', date='2025-11-01', amount='$7.00')
+
+    assert index.add('GitHub <billing@github.com>', 'Your GitHub receipt', october, VERDICT, '<oct@github>')
+    match = index.lookup('GitHub <billing@github.com>', 'Your GitHub receipt', november)
+    assert match is not None and match['source_message_id'] == '<oct@github>'
+
+    result = index.reuse(match, 'Your GitHub receipt', november)
+    assert result['is_subscription'] is True
+    assert result['amount'] == 7.0 and result['currency'] == 'USD'
+    assert result['billing_date'] == '2025-11-01'
+    assert VERDICT['amount'] == 4.0  # Stored verdict is not mutated
+
+
+def test_no_reuse_across_domains_or_templates():
+    """Other sender domain or a different email never matches"""
+    index = TemplateIndex(threshold=0.92)
+    body = INVOICE.format(month='October', receipt='A1B2C3D4E5F6G7', date='2025-10-01', amount='$4.00')
+    index.add('billing@github.com', 'Your GitHub receipt', body, VERDICT, '<oct@github>')
+
+    assert index.lookup('billing@evil.example', 'Your GitHub receipt', body) is None
+    assert index.lookup('billing@github.com', 'Security alert: new sign-in',
+                        'We noticed a new sign-in to your account from Chrome on Windows. '
+                        'If this was you, you can ignore this email.') is None
+
+    # Low-confidence / failed verdicts are never indexed
+    assert not index.add('x@y.com', 's', 'b', {'is_subscription': True, 'confidence': 60})
+    assert not index.add('x@y.com', 's', 'b', {'is_subscription': False, 'confidence': 0, 'error': 'x'})
+
+
+def test_local_extraction():
+    """Amounts and dates in CZ/EN formats"""
+    assert extract_amount('', 'Celkem k úhradě: 1 299,00 Kč') == (1299.0, 'CZK')
+    assert extract_amount('', 'Položka 2 ks\nTotal: EUR 12.50') == (12.5, 'EUR')
+    assert extract_amount('', 'Thanks!') == (None, None)
+    assert extract_date('', 'Obnovení proběhne 15.01.2026') == '2026-01-15'
+    assert extract_date('', 'renews on December 1, 2025') == '2025-12-01'
+    assert '<num>' in normalize_text('Invoice 12345', '') and '<date>' in normalize_text('', '1.12.2025')
+
+
+if __name__ == "__main__":
+    tests = [test_monthly_invoices_reuse_verdict, test_no_reuse_across_domains_or_templates,
+             test_local_extraction]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmark: MarketingEmailDetector.analyze (single-pass extract_features)
+vs. the previous implementation (reference copy below)
+
+Runs both on the same corpus, fails (exit 1) on any difference in verdict,
+confidence, reasons or score breakdown, and prints emails/s of both.
+
+Usage:
+    python benchmark_marketing_detector.py                 # synthetic corpus
+    python benchmark_marketing_detector.py --count 5000
+    python benchmark_marketing_detector.py --db data/subscriptions.db --limit 2000
+    python benchmark_marketing_detector.py --sender-cache    # + SenderVerdictCache run
+"""
+
+import re
+import sys
+import time
+import random
+import sqlite3
+import argparse
+from typing import Dict, Any, List, Tuple
+from email.utils import parseaddr
+
+import marketing_email_detector
+from marketing_email_detector import MarketingEmailDetector, SenderVerdictCache
+
+
+def reference_analyze(self, email_data: Dict[str, Any]) -> Tuple[bool, int, Dict[str, Any]]:
+    """MarketingEmailDetector.analyze before the single-pass feature extractor"""
+    score = 0
+    reasons = []
+
+    subject = email_data.get('subject', '')
+    from_addr = email_data.get('from', '')
+    body = email_data.get('body', '')
+    html_body = email_data.get('html_body', '')
+
+    combined_text = f"{subject} {body} {html_body}".lower()
+
+    _, email_addr = parseaddr(from_addr)
+    if email_addr and '@' in email_addr:
+        domain = email_addr.split('@')[1].lower()
+        # Domain index lookup (originally a substring scan of NEWSLETTER_DOMAINS)
+        if domain in marketing_email_detector.NEWSLETTER_INDEX:
+            return True, 100, {
+                'confidence': 100,
+                'reasons': [f'Known newsletter domain: {domain}'],
+                'is_whitelisted': False,
+                'score_breakdown': {'newsletter_domain': 100}
+            }
+
+    not_marketing_matches = len(self.not_marketing_regex.findall(combined_text))
+    if not_marketing_matches > 0:
+        not_marketing_penalty = min(60, not_marketing_matches * 50)
+        score -= not_marketing_penalty
+        reasons.append(f"Important notification detected: {not_marketing_matches} indicators (invoice/receipt/renewal)")
+
+    is_whitelisted_sender = False
+    if marketing_email_detector.LISTS_AVAILABLE:
+        _, email_addr = parseaddr(from_addr)
+        if email_addr:
+            domain = email_addr.split('@')[1] if '@' in email_addr else ''
+            if marketing_email_detector.is_whitelisted(email_addr, domain):
+                score -= 20
+                is_whitelisted_sender = True
+                reasons.append(f'Whitelisted: {domain} (but testing for marketing)')
+            if marketing_email_detector.is_blacklisted(email_addr, domain):
+                score += 60
+                reasons.append(f'Blacklisted domain: {domain}')
+
+    subject_matches = len(self.subject_regex.findall(subject))
+    if subject_matches > 0:
+        subject_score = min(25, subject_matches * 15)
+        score += subject_score
+        reasons.append(f"Marketing keywords in subject: {subject_matches}")
+
+    if subject and len([c for c in subject if c.isupper()]) / len(subject) > 0.5:
+        score += 10
+        reasons.append("Excessive capitalization in subject")
+
+    _, email_addr = parseaddr(from_addr)
+    from_matches = []
+    if email_addr:
+        from_matches = self.from_regex.findall(email_addr.lower())
+        if from_matches:
+            score += 20
+            reasons.append(f"Marketing sender pattern: {from_matches[0]}")
+
+    if self.unsubscribe_regex.search(combined_text):
+        score += 30
+        reasons.append("Unsubscribe link found")
+
+    body_matches = len(self.body_regex.findall(combined_text))
+    if body_matches > 0:
+        body_score = min(15, body_matches * 3)
+        score += body_score
+        reasons.append(f"Marketing phrases in body: {body_matches}")
+
+    link_count = 0
+    img_count = 0
+    if html_body:
+        link_count = len(re.findall(r'<a\s+href=', html_body, re.IGNORECASE))
+        if link_count > 5:
+            score += 5
+            reasons.append(f"Many links in HTML: {link_count}")
+        img_count = len(re.findall(r'<img\s+', html_body, re.IGNORECASE))
+        if img_count > 3:
+            score += 5
+            reasons.append(f"Many images: {img_count}")
+
+    if re.search(r'(tracking|pixel|beacon|analytics)', combined_text, re.IGNORECASE):
+        score += 5
+        reasons.append("Tracking elements detected")
+
+    confidence = max(0, min(100, score))
+    is_marketing = confidence >= 25
+
+    details = {
+        'confidence': confidence,
+        'reasons': reasons,
+        'is_whitelisted': is_whitelisted_sender,
+        'score_breakdown': {
+            'subject_analysis': subject_matches * 8 if subject_matches else 0,
+            'sender_analysis': 20 if from_matches else 0 if email_addr else 0,
+            'unsubscribe_present': 30 if self.unsubscribe_regex.search(combined_text) else 0,
+            'body_phrases': min(15, body_matches * 3) if body_matches else 0,
+            'html_elements': min(10, (5 if link_count > 5 else 0) + (5 if img_count > 3 else 0)) if html_body else 0,
+            'whitelist_bonus': -20 if is_whitelisted_sender else 0,
+        }
+    }
+
+    return is_marketing, confidence, details
+
+
+# Phrases from every pattern family, plus overlapping and case-folding traps
+PHRASES = [
+    'sale', '50% off', 'Limited Time', "don't miss", 'Sleva', 'výprodej', 'Angebote', 'Rabatt',
+    'Black Friday', 'newsletter', 'Top Stories', 'týdenní přehled', 'unsubscribe', 'Unsubscribe now',
+    'opt-out', 'Zrušit odběr', 'vom Newsletter abmelden', 'manage your preferences', 'view in browser',
+    'click here', 'Shop Now', 'learn more', 'sign up', 'subscribe now', 'while supplies last',
+    'subscription renewal', 'Payment received', 'invoice', 'Order #4711', 'password reset',
+    'statement', 'Obnova předplatného', 'faktura', 'předplatné', 'renewal order', 'tracking',
+    'PIXEL', 'beacon', 'Analytics', 'unſubscribe', 'İnvoice', 'ınvoice', 'ſale', 'tracKing', '🎉', '🔥',
+]
+SENDERS = [
+    'newsletter@shop.example.com', 'No-Reply <noreply@github.com>', 'billing@netflix.com',
+    'info@mail.vodafone.de', 'Jan Novák <jan.novak@seznam.cz>', 'deals@deals.de', 'team@notion.so',
+    'broken-address', '', 'hello@promo.example.org', 'Support <support@apple.com>',
+    'N26 <no-reply@emails.n26.com>', 'news@mygrouponline.com', 'Groupon <deals@r.groupon.co.uk>',
+]
+
+
+def synthetic_corpus(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    emails = []
+    for _ in range(count):
+        subject = ' '.join(rng.choice(PHRASES) for _ in range(rng.randint(0, 4)))
+        if rng.random() < 0.2:
+            subject = subject.upper()
+        body = ' lorem ipsum '.join(rng.choice(PHRASES) for _ in range(rng.randint(0, 12)))
+        html_body = ''
+        if rng.random() < 0.6:
+            blocks = []
+            for _ in range(rng.randint(1, 40)):
+                blocks.append(rng.choice([
+                    f'<a href="https://x.example/{rng.randint(0, 999)}">{rng.choice(PHRASES)}</a>',
+                    '<A  HREF="#">Link</A>', '<img src="logo.png">', '<IMG\tsrc="p.gif" width=1>',
+                    f'<p>{rng.choice(PHRASES)} ' + 'text ' * rng.randint(5, 80) + '</p>',
+                    '<a name="top"></a>', '<imgx>', '<div style="color:red">Hi</div>',
+                ]))
+            html_body = '<html><body>' + ''.join(blocks) + '</body></html>'
+        emails.append({'subject': subject, 'from': rng.choice(SENDERS), 'body': body, 'html_body': html_body})
+    return emails
+
+
+def db_corpus(db_path: str, limit: int) -> List[Dict[str, Any]]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('''
+            SELECT email_subject, email_from, email_body_compact FROM email_evidence LIMIT ?
+        ''', (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [{'subject': s or '', 'from': f or '', 'body': b or '', 'html_body': b or ''} for s, f, b in rows]
+
+
+def timed(fn, emails: List[Dict[str, Any]], repeat: int) -> Tuple[float, List]:
+    best, results = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [fn(email) for email in emails]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single-pass marketing detector')
+    parser.add_argument('--count', type=int, default=3000, help='Synthetic emails')
+    parser.add_argument('--db', help='Use email_evidence rows from this database instead')
+    parser.add_argument('--limit', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sender-cache', action='store_true',
+                        help='Also measure SenderVerdictCache (speed and verdict agreement, not identity)')
+    args = parser.parse_args()
+
+    emails = db_corpus(args.db, args.limit) if args.db else synthetic_corpus(args.count)
+    detector = MarketingEmailDetector()
+
+    old_seconds, old_results = timed(lambda e: reference_analyze(detector, e), emails, args.repeat)
+    new_seconds, new_results = timed(detector.analyze, emails, args.repeat)
+
+    mismatches = [i for i, (old, new) in enumerate(zip(old_results, new_results)) if old != new]
+    marketing = sum(1 for result in new_results if result[0])
+    print(f"Emails:     {len(emails)} ({marketing} marketing)")
+    print(f"Reference:  {old_seconds:.3f}s ({len(emails) / old_seconds:,.0f} emails/s)")
+    print(f"Single-pass:{new_seconds:.3f}s ({len(emails) / new_seconds:,.0f} emails/s), "
+          f"{old_seconds / new_seconds:.2f}x")
+    if mismatches:
+        i = mismatches[0]
+        print(f"❌ {len(mismatches)} results differ, first #{i}:")
+        print(f"   reference:   {old_results[i]}")
+        print(f"   single-pass: {new_results[i]}")
+        return 1
+    print("✅ Identical verdicts, confidences, reasons and breakdowns")
+
+    if args.sender_cache:
+        cached = MarketingEmailDetector(sender_cache=SenderVerdictCache())
+        start = time.perf_counter()
+        cached_results = [cached.analyze(email) for email in emails]
+        cached_seconds = time.perf_counter() - start
+        agree = sum(1 for old, new in zip(new_results, cached_results) if old[0] == new[0])
+        stats = cached_results[-1][2]['sender_cache'] if cached_results else {}
+        print(f"Cached:     {cached_seconds:.3f}s ({len(emails) / cached_seconds:,.0f} emails/s), "
+              f"{new_seconds / cached_seconds:.2f}x, verdicts agree {agree}/{len(emails)}, "
+              f"hits {stats.get('hits', 0)}, re-verified {stats.get('reverifications', 0)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Domain Index v1.0
+Hashovaný index domén odesílatelů (newsletter / whitelist / blacklist)
+
+Lookup prochází doménu od nejkonkrétnější k registrovatelné doméně
+(sub.mail.example.com → mail.example.com → example.com), takže stojí
+O(počet labelů) slovníkových dotazů bez ohledu na velikost seznamů.
+Položky:
+- "example.com" / "@example.com"  → doména včetně všech subdomén
+- "billing@example.com"           → jen tato adresa
+- "groupon" (bez tečky)           → registrovatelná doména s tímto jménem
+                                    (groupon.de, groupon.co.uk, ne mygroupon.com)
+
+Index ze souborů (email_whitelist.json, ...) se při změně mtime sám
+znovu načte (kontrola nejvýš jednou za RELOAD_CHECK_SECONDS), bez restartu.
+"""
+
+import os
+import json
+import time
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RELOAD_CHECK_SECONDS = 5.0
+
+# Víceúrovňové veřejné suffixy (registrovatelná doména = 3 labely)
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'me.uk',
+    'com.au', 'net.au', 'org.au', 'co.nz', 'co.jp', 'ne.jp', 'or.jp',
+    'co.in', 'co.za', 'co.kr', 'co.il', 'com.br', 'com.mx', 'com.ar',
+    'com.cn', 'com.hk', 'com.sg', 'com.tr', 'com.pl', 'com.ua',
+}
+
+
+def normalize_domain(domain: str) -> str:
+    return (domain or '').strip().strip('.').lower()
+
+
+def registrable_domain(domain: str) -> str:
+    """mail.shop.example.co.uk → example.co.uk"""
+    labels = normalize_domain(domain).split('.')
+    if len(labels) >= 3 and '.'.join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def domain_candidates(domain: str) -> List[str]:
+    """Doména a její rodiče až po registrovatelnou doménu (nejkonkrétnější první)"""
+    domain = normalize_domain(domain)
+    if not domain:
+        return []
+    stop = registrable_domain(domain)
+    candidates = [domain]
+    while domain != stop and '.' in domain:
+        domain = domain.split('.', 1)[1]
+        candidates.append(domain)
+    return candidates
+
+
+class DomainIndex:
+    """Domény / adresy / jména → položka seznamu (dict)"""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]] = (), paths: Iterable[str] = ()):
+        self.paths = list(paths)
+        self.mtimes: Dict[str, Optional[float]] = {}
+        self.last_check = 0.0
+        self.tables = self._build(entries)
+        if self.paths:
+            self.reload()
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> 'DomainIndex':
+        """Index z prostého seznamu ('aida.de', 'groupon', ...)"""
+        return cls({'domain': name} for name in names)
+
+    @classmethod
+    def from_files(cls, *paths: str) -> 'DomainIndex':
+        """Index z JSON seznamů (chybějící soubor = prázdný seznam), s hot reloadem"""
+        return cls(paths=paths)
+
+    @staticmethod
+    def _build(entries: Iterable[Dict[str, Any]]) -> tuple:
+        domains, addresses, labels = {}, {}, {}
+        for entry in entries:
+            key = (entry.get('pattern') or entry.get('domain') or '').strip().lower()
+            if '@' in key:
+                local, _, domain = key.partition('@')
+                if local:
+                    addresses.setdefault(key, entry)
+                    continue
+                key = domain
+            key = normalize_domain(key)
+            if not key:
+                continue
+            if '.' in key:
+                domains.setdefault(key, entry)
+            else:
+                labels.setdefault(key, entry)
+        return domains, addresses, labels
+
+    def reload(self) -> bool:
+        """Znovu načte soubory; při chybě (rozepsaný JSON) ponechá starý index"""
+        mtimes = {path: (os.path.getmtime(path) if os.path.exists(path) else None) for path in self.paths}
+        entries = []
+        try:
+            for path, mtime in mtimes.items():
+                if mtime is not None:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        entries.extend(json.load(f))
+        except (OSError, ValueError) as e:
+            self.mtimes = mtimes  # Další pokus až po další změně souboru
+            logger.warning(f"⚠️  Domain list reload failed, keeping previous index: {e}")
+            return False
+        self.tables = self._build(entries)  # Jedno přiřazení = atomická výměna pro čtecí vlákna
+        self.mtimes = mtimes
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self.last_check < RELOAD_CHECK_SECONDS:
+            return
+        self.last_check = now
+        for path in self.paths:
+            mtime = os.path.getmtime(path) if os.path.exists(path) else None
+            if mtime != self.mtimes.get(path):
+                self.reload()
+                return
+
+    def lookup(self, domain: str, email_addr: str = '') -> Optional[Dict[str, Any]]:
+        """Položka pro adresu / doménu (nejkonkrétnější shoda), jinak None"""
+        if self.paths:
+            self._maybe_reload()
+        domains, addresses, labels = self.tables
+        if email_addr and addresses:
+            entry = addresses.get(email_addr.strip().lower())
+            if entry is not None:
+                return entry
+        if not domain and email_addr and '@' in email_addr:
+            domain = email_addr.rsplit('@', 1)[1]
+        candidates = domain_candidates(domain)
+        for candidate in candidates:
+            entry = domains.get(candidate)
+            if entry is not None:
+                return entry
+        if candidates and labels:
+            return labels.get(candidates[-1].split('.', 1)[0])
+        return None
+
+    def __contains__(self, domain: str) -> bool:
+        return self.lookup(domain) is not None
+
+    def __len__(self) -> int:
+        return sum(len(table) for table in self.tables)
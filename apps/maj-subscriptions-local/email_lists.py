@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Email Lists v1.0
+Whitelist/Blacklist odesílatelů pro MarketingEmailDetector
+
+Seznamy jsou v email_whitelist.json a email_blacklist.json (vedle modulu):
+[{"domain": "example.com", "pattern": "@example.com", "category": "bank",
+  "confidence": 100, "reason": "Důležitý odesilatel"}, ...]
+
+Načtou se jednou do DomainIndex (lookup přes subdomény až po registrovatelnou
+doménu, O(labely)); úprava JSON souboru se projeví bez restartu.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+from domain_index import DomainIndex
+
+LISTS_DIR = os.path.dirname(os.path.abspath(__file__))
+WHITELIST_PATH = os.path.join(LISTS_DIR, 'email_whitelist.json')
+BLACKLIST_PATH = os.path.join(LISTS_DIR, 'email_blacklist.json')
+
+WHITELIST = DomainIndex.from_files(WHITELIST_PATH)
+BLACKLIST = DomainIndex.from_files(BLACKLIST_PATH)
+
+
+def whitelist_entry(email_addr: str, domain: str = '') -> Optional[Dict[str, Any]]:
+    return WHITELIST.lookup(domain, email_addr)
+
+
+def blacklist_entry(email_addr: str, domain: str = '') -> Optional[Dict[str, Any]]:
+    return BLACKLIST.lookup(domain, email_addr)
+
+
+def is_whitelisted(email_addr: str, domain: str = '') -> bool:
+    """Odesílatel (nebo jeho nadřazená doména) je na whitelistu"""
+    return whitelist_entry(email_addr, domain) is not None
+
+
+def is_blacklisted(email_addr: str, domain: str = '') -> bool:
+    """Odesílatel (nebo jeho nadřazená doména) je na blacklistu"""
+    return blacklist_entry(email_addr, domain) is not None
+
+
+def get_list_reason(email_addr: str, domain: str = '') -> Optional[str]:
+    """Důvod z whitelistu, jinak z blacklistu (None pokud na žádném není)"""
+    entry = whitelist_entry(email_addr, domain) or blacklist_entry(email_addr, domain)
+    if entry is None:
+        return None
+    return entry.get('reason') or entry.get('category')
+
+
+def reload_lists():
+    """Okamžité znovunačtení obou seznamů (jinak automaticky při změně souboru)"""
+    WHITELIST.reload()
+    BLACKLIST.reload()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Evidence Search v2.3
+====================
+
+FTS5 full-text index over email_evidence (subject, sender, compact body).
+
+The index is an external-content FTS5 table kept in sync by triggers, so
+the scanner (and its write-behind thread) need no extra writes. The
+tokenizer folds diacritics ("predplatne" finds "Předplatné", "gebuhr"
+finds "Gebühr"), and search() returns bm25-ranked hits with snippets.
+
+The same module lives in maj-subscriptions-llm-scanner and
+maj-subscriptions-local (the grouping tool's query uses match_query);
+keep the two copies identical.
+
+Usage:
+    python evidence_search.py /tmp/production_subscriptions.db "netflix faktura"
+    python evidence_search.py /tmp/production_subscriptions.db "abo*" --limit 50
+    python evidence_search.py /tmp/production_subscriptions.db --rebuild
+"""
+
+import re
+import sys
+import sqlite3
+import logging
+import argparse
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+FTS_TABLE = 'email_evidence_fts'
+TOKENIZER = "unicode61 remove_diacritics 2"
+COLUMN_WEIGHTS = (3.0, 2.0, 1.0)  # bm25 weights: subject, sender, body
+SNIPPET_TOKENS = 12
+DEFAULT_LIMIT = 20
+
+CREATE_SQL = [
+    f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        email_subject, email_from, email_body_compact,
+        content='email_evidence', content_rowid='id',
+        tokenize="{TOKENIZER}"
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_fts_ai AFTER INSERT ON email_evidence BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, email_subject, email_from, email_body_compact)
+        VALUES (new.id, new.email_subject, new.email_from, new.email_body_compact);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_fts_ad AFTER DELETE ON email_evidence BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, email_subject, email_from, email_body_compact)
+        VALUES ('delete', old.id, old.email_subject, old.email_from, old.email_body_compact);
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS email_evidence_fts_au
+    AFTER UPDATE OF email_subject, email_from, email_body_compact ON email_evidence BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, email_subject, email_from, email_body_compact)
+        VALUES ('delete', old.id, old.email_subject, old.email_from, old.email_body_compact);
+        INSERT INTO {FTS_TABLE} (rowid, email_subject, email_from, email_body_compact)
+        VALUES (new.id, new.email_subject, new.email_from, new.email_body_compact);
+    END
+    ''',
+]
+
+_term = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    """True if this SQLite build has FTS5"""
+    return conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0] == 1
+
+
+def ensure_index(conn: sqlite3.Connection) -> bool:
+    """Create the FTS table + triggers (and backfill existing rows); False without FTS5"""
+    if not fts5_available(conn):
+        logger.warning("⚠️  SQLite built without FTS5 - evidence search disabled")
+        return False
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    for sql in CREATE_SQL:
+        conn.execute(sql)
+    if not exists:
+        rebuild(conn)
+    return True
+
+
+def rebuild(conn: sqlite3.Connection):
+    """Re-index all of email_evidence"""
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_query(text: str) -> str:
+    """
+    Plain words → FTS5 query (every term must match, "abo*" = prefix).
+
+    Terms are quoted, so user input with FTS5 operators or punctuation
+    ("s.r.o.", "AND", "-") cannot produce a syntax error.
+    """
+    terms = []
+    for term in _term.findall(text or ''):
+        prefix = term.endswith('*')
+        word = term.rstrip('*')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms)
+
+
+def search(conn: sqlite3.Connection, text: str, limit: int = DEFAULT_LIMIT,
+           raw: bool = False) -> List[Dict]:
+    """
+    Ranked evidence hits for a query.
+
+    `text` is plain words (see match_query) or, with raw=True, FTS5
+    syntax (e.g. 'email_from:netflix OR email_subject:faktura'). Each hit
+    carries the evidence columns, the bm25 rank (lower is better) and a
+    snippet with the matched terms in [brackets].
+    """
+    query = text if raw else match_query(text)
+    if not query:
+        return []
+    weights = ', '.join(str(w) for w in COLUMN_WEIGHTS)
+    cursor = conn.execute(f'''
+        SELECT e.id, e.email_message_id, e.email_subject, e.email_from, e.email_date,
+               e.service_id, e.confidence_score,
+               bm25({FTS_TABLE}, {weights}) AS rank,
+               snippet({FTS_TABLE}, -1, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {FTS_TABLE}
+        JOIN email_evidence e ON e.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (query, limit))
+    columns = ['id', 'message_id', 'subject', 'sender', 'date', 'service_id',
+               'confidence', 'rank', 'snippet']
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='Full-text search over email evidence')
+    parser.add_argument('db', help='Scanner SQLite database')
+    parser.add_argument('query', nargs='?', default='', help='Words to search for ("abo*" = prefix)')
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+    parser.add_argument('--raw', action='store_true', help='Query is FTS5 syntax')
+    parser.add_argument('--rebuild', action='store_true', help='Re-index all evidence rows')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if not ensure_index(conn):
+            return 1
+        if args.rebuild:
+            rebuild(conn)
+            logger.info("✅ Index rebuilt")
+        conn.commit()
+        for hit in search(conn, args.query, args.limit, raw=args.raw):
+            print(f"{hit['rank']:7.2f}  {(hit['date'] or '')[:10]}  {hit['sender'][:30]:30}  {hit['subject'][:60]}")
+            print(f"         {hit['snippet']}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,10 +5,16 @@ Rule-based classifier pro detekci marketingových/spam emailů
 + Whitelist/Blacklist integrace
 """
 
+import os
 import re
-from typing import Dict, Any, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from email.utils import parseaddr
 
+from domain_index import DomainIndex
+
 # Import whitelist/blacklist
 try:
     from email_lists import is_whitelisted, is_blacklisted, get_list_reason
@@ -18,6 +24,21 @@ except ImportError:
     print("⚠️  Whitelist/Blacklist není dostupný")
 
 
+# classify_batch: emailů na úlohu a rozpracovaných úloh na proces (strop paměti)
+BATCH_CHUNK_SIZE = 256
+BATCH_PENDING_PER_WORKER = 2
+# Jen tato pole se posílají do procesů (ne celé řádky/dicty volajícího)
+EMAIL_FIELDS = ('subject', 'from', 'body', 'html_body', 'html')
+
+# SenderVerdictCache: odesílatel se přeskakuje až po N shodných marketingových
+# verdiktech; důvěra každým přeskočeným emailem klesá (× DECAY) a pod prahem
+# se odesílatel znovu ověří plnou analýzou (100 → ověření po 8 emailech)
+SENDER_CACHE_SIZE = 10000
+SENDER_CACHE_MIN_OBSERVATIONS = 3
+SENDER_CACHE_MIN_CONFIDENCE = 80
+SENDER_CACHE_DECAY = 0.97
+
+
 class MarketingEmailDetector:
     """
     Detekuje marketingové emaily pomocí pravidel a heuristik
@@ -48,6 +69,7 @@ class MarketingEmailDetector:
     ]
 
     # Known newsletter/marketing domains (instant classification)
+    # Doména platí i pro subdomény; jméno bez tečky = registrovatelná doména s tímto jménem
     NEWSLETTER_DOMAINS = [
         'aida.de', 'aidaline.de', 'kopp-report.de', 'kopp-verlag.de',
         'bild.de', 'spiegel.de', 'focus.de', 'welt.de', 'zeit.de',
@@ -100,27 +122,15 @@ class MarketingEmailDetector:
         r'\b(renewal order|order receipt)\b',  # Renewal receipts
     ]
 
-    def __init__(self):
-        self.subject_regex = re.compile(
-            '|'.join(self.MARKETING_SUBJECT_PATTERNS),
-            re.IGNORECASE
-        )
-        self.from_regex = re.compile(
-            '|'.join(self.MARKETING_FROM_PATTERNS),
-            re.IGNORECASE
-        )
-        self.unsubscribe_regex = re.compile(
-            '|'.join(self.UNSUBSCRIBE_PATTERNS),
-            re.IGNORECASE
-        )
-        self.body_regex = re.compile(
-            '|'.join(self.MARKETING_BODY_PATTERNS),
-            re.IGNORECASE
-        )
-        self.not_marketing_regex = re.compile(
-            '|'.join(self.NOT_MARKETING_PATTERNS),
-            re.IGNORECASE
-        )
+    def __init__(self, sender_cache: Optional['SenderVerdictCache'] = None):
+        # Sdílené, jednou zkompilované vzory (viz modul níže)
+        self.subject_regex = SUBJECT_REGEX
+        self.from_regex = FROM_REGEX
+        self.unsubscribe_regex = UNSUBSCRIBE_REGEX
+        self.body_regex = BODY_REGEX
+        self.not_marketing_regex = NOT_MARKETING_REGEX
+        # Volitelná cache verdiktů podle odesílatele (None = vždy plná analýza)
+        self.sender_cache = sender_cache
 
     def analyze(self, email_data: Dict[str, Any]) -> Tuple[bool, int, Dict[str, Any]]:
         """
@@ -128,39 +138,52 @@ class MarketingEmailDetector:
 
         Args:
             email_data: Dictionary s klíči: subject, from, body, html_body (optional)
+                nebo místo html_body 'html' = výstup html_text.html_to_text()
+                (text + počty odkazů/obrázků/pixelů; HTML se pak neprochází)
 
         Returns:
             Tuple[is_marketing, confidence_score, details]
             - is_marketing: True pokud je email detekován jako marketing
             - confidence_score: 0-100 skóre důvěry
-            - details: Důvody klasifikace
+            - details: Důvody klasifikace (+ 'sender_cache' statistiky, je-li cache zapnutá)
         """
-        score = 0
-        max_score = 100
-        reasons = []
+        cache = self.sender_cache
+        if cache is not None:
+            _, email_addr = parseaddr(email_data.get('from', ''))
+            sender = email_addr.lower()
+            cached = cache.lookup(sender, email_data.get('subject', ''))
+            if cached is not None:
+                return cached
+            is_marketing, confidence, details = self._analyze(email_data, email_addr)
+            cache.record(sender, is_marketing, confidence, details)
+            details['sender_cache'] = cache.get_stats(hit=False)
+            return is_marketing, confidence, details
+        return self._analyze(email_data)
+
+    def _analyze(self, email_data: Dict[str, Any], email_addr: str = None) -> Tuple[bool, int, Dict[str, Any]]:
+        """Plná analýza jednoho emailu (bez sender cache)"""
+        features = extract_features(email_data, email_addr)
 
-        subject = email_data.get('subject', '')
-        from_addr = email_data.get('from', '')
-        body = email_data.get('body', '')
-        html_body = email_data.get('html_body', '')
+        # HIGHEST PRIORITY: Check known newsletter domains (instant classification)
+        if features['newsletter_domain']:
+            domain = features['domain']
+            return True, 100, {
+                'confidence': 100,
+                'reasons': [f'Known newsletter domain: {domain}'],
+                'is_whitelisted': False,
+                'score_breakdown': {'newsletter_domain': 100}
+            }
 
-        # Combined text for analysis
-        combined_text = f"{subject} {body} {html_body}".lower()
+        return self.score(features)
 
-        # HIGHEST PRIORITY: Check known newsletter domains (instant classification)
-        _, email_addr = parseaddr(from_addr)
-        if email_addr and '@' in email_addr:
-            domain = email_addr.split('@')[1].lower()
-            if any(nl_domain in domain for nl_domain in self.NEWSLETTER_DOMAINS):
-                return True, 100, {
-                    'confidence': 100,
-                    'reasons': [f'Known newsletter domain: {domain}'],
-                    'is_whitelisted': False,
-                    'score_breakdown': {'newsletter_domain': 100}
-                }
+    def score(self, features: Dict[str, Any]) -> Tuple[bool, int, Dict[str, Any]]:
+        """Skóre a důvody z hodnot spočítaných v extract_features()"""
+        score = 0
+        reasons = []
+        email_addr = features['email_addr']
 
         # 0. NOT-MARKETING check (důležité notifikace) - HIGHEST PRIORITY
-        not_marketing_matches = len(self.not_marketing_regex.findall(combined_text))
+        not_marketing_matches = features['not_marketing_matches']
         if not_marketing_matches > 0:
             not_marketing_penalty = min(60, not_marketing_matches * 50)  # Silnější penalty!
             score -= not_marketing_penalty
@@ -170,73 +193,63 @@ class MarketingEmailDetector:
         # Whitelist = důležitý odesilatel, ALE musí se testovat na marketing markery
         # (včera faktura, zítra může být marketing)
         is_whitelisted_sender = False
-        if LISTS_AVAILABLE:
-            _, email_addr = parseaddr(from_addr)
-            if email_addr:
-                domain = email_addr.split('@')[1] if '@' in email_addr else ''
-
-                # Whitelist check - SNÍŽÍ score o 20 bodů (ne okamžitý return!)
-                if is_whitelisted(email_addr, domain):
-                    score -= 20  # Bonus pro důležité odesílatele
-                    is_whitelisted_sender = True
-                    reasons.append(f'Whitelisted: {domain} (but testing for marketing)')
-
-                # Blacklist check - přidá vysoké skóre
-                if is_blacklisted(email_addr, domain):
-                    score += 60  # Silný indikátor marketingu
-                    reasons.append(f'Blacklisted domain: {domain}')
+        if LISTS_AVAILABLE and email_addr:
+            domain = features['list_domain']
+
+            # Whitelist check - SNÍŽÍ score o 20 bodů (ne okamžitý return!)
+            if is_whitelisted(email_addr, domain):
+                score -= 20  # Bonus pro důležité odesílatele
+                is_whitelisted_sender = True
+                reasons.append(f'Whitelisted: {domain} (but testing for marketing)')
+
+            # Blacklist check - přidá vysoké skóre
+            if is_blacklisted(email_addr, domain):
+                score += 60  # Silný indikátor marketingu
+                reasons.append(f'Blacklisted domain: {domain}')
 
         # 1. Analýza předmětu (25 bodů)
-        subject_matches = len(self.subject_regex.findall(subject))
+        subject_matches = features['subject_matches']
         if subject_matches > 0:
             subject_score = min(25, subject_matches * 15)  # Zvýšeno z 10 na 15 (2 matches = 30 bodů)
             score += subject_score
             reasons.append(f"Marketing keywords in subject: {subject_matches}")
 
         # Check for excessive capitalization
-        if subject and len([c for c in subject if c.isupper()]) / len(subject) > 0.5:
+        if features['excessive_caps']:
             score += 10
             reasons.append("Excessive capitalization in subject")
 
         # 2. Analýza odesílatele (20 bodů)
-        _, email_addr = parseaddr(from_addr)
-        from_matches = []
-        if email_addr:
-            from_matches = self.from_regex.findall(email_addr.lower())
-            if from_matches:
-                score += 20
-                reasons.append(f"Marketing sender pattern: {from_matches[0]}")
+        from_matches = features['from_matches']
+        if from_matches:
+            score += 20
+            reasons.append(f"Marketing sender pattern: {from_matches[0]}")
 
         # 3. Unsubscribe link (30 bodů - silný indikátor)
-        if self.unsubscribe_regex.search(combined_text):
+        if features['unsubscribe']:
             score += 30
             reasons.append("Unsubscribe link found")
 
         # 4. Marketingové fráze v těle (15 bodů)
-        body_matches = len(self.body_regex.findall(combined_text))
+        body_matches = features['body_matches']
         if body_matches > 0:
             body_score = min(15, body_matches * 3)
             score += body_score
             reasons.append(f"Marketing phrases in body: {body_matches}")
 
         # 5. HTML analýza (10 bodů)
-        link_count = 0
-        img_count = 0
-        if html_body:
-            # Počet odkazů
-            link_count = len(re.findall(r'<a\s+href=', html_body, re.IGNORECASE))
+        link_count = features['link_count']
+        img_count = features['img_count']
+        if features['has_html']:
             if link_count > 5:
                 score += 5
                 reasons.append(f"Many links in HTML: {link_count}")
-
-            # Obrázky
-            img_count = len(re.findall(r'<img\s+', html_body, re.IGNORECASE))
             if img_count > 3:
                 score += 5
                 reasons.append(f"Many images: {img_count}")
 
         # 6. Tracking pixels (5 bodů)
-        if re.search(r'(tracking|pixel|beacon|analytics)', combined_text, re.IGNORECASE):
+        if features['tracking']:
             score += 5
             reasons.append("Tracking elements detected")
 
@@ -252,36 +265,310 @@ class MarketingEmailDetector:
             'is_whitelisted': is_whitelisted_sender,
             'score_breakdown': {
                 'subject_analysis': subject_matches * 8 if subject_matches else 0,
-                'sender_analysis': 20 if from_matches else 0 if email_addr else 0,
-                'unsubscribe_present': 30 if self.unsubscribe_regex.search(combined_text) else 0,
+                'sender_analysis': 20 if from_matches else 0,
+                'unsubscribe_present': 30 if features['unsubscribe'] else 0,
                 'body_phrases': min(15, body_matches * 3) if body_matches else 0,
-                'html_elements': min(10, (5 if link_count > 5 else 0) + (5 if img_count > 3 else 0)) if html_body else 0,
+                'html_elements': min(10, (5 if link_count > 5 else 0) + (5 if img_count > 3 else 0)) if features['has_html'] else 0,
                 'whitelist_bonus': -20 if is_whitelisted_sender else 0,
             }
         }
 
         return is_marketing, confidence, details
 
-    def classify_batch(self, emails: list) -> list:
+    def classify_batch(self, emails: Iterable[Dict[str, Any]], workers: int = None,
+                       chunk_size: int = BATCH_CHUNK_SIZE, id_key: str = 'id',
+                       with_details: bool = False) -> Iterator[Dict[str, Any]]:
         """
-        Klasifikuje více emailů najednou
+        Klasifikuje více emailů najednou - průběžně a paralelně
 
         Args:
-            emails: List[Dict] - seznam emailů k analýze
-
-        Returns:
-            List[Dict] s výsledky klasifikace
+            emails: libovolný iterable (i generátor čtoucí z DB/mboxu)
+            workers: počet procesů (default: všechna jádra; 1 = v tomto procesu)
+            chunk_size: emailů na jednu úlohu pro proces
+            id_key: klíč s ID emailu (chybí-li, ID = pořadí ve vstupu)
+            with_details: přidat 'details' (důvody, score_breakdown)
+
+        Yields:
+            {'id', 'is_marketing', 'confidence'[, 'details']} ve vstupním pořadí,
+            bez kopií těl. Ze vstupu se čte jen tolik, kolik se vejde do
+            workers × BATCH_PENDING_PER_WORKER rozpracovaných chunků, takže
+            paměť nezávisí na velikosti schránky.
+
+        (Se sender_cache dostane každý proces vlastní kopii cache, verdikty
+        pak závisí i na tom, které emaily odesílatele zpracoval tentýž proces.)
         """
-        results = []
-        for email in emails:
-            is_marketing, confidence, details = self.analyze(email)
-            results.append({
-                'email': email,
-                'is_marketing': is_marketing,
-                'confidence': confidence,
-                'details': details
-            })
-        return results
+        workers = workers or os.cpu_count() or 1
+        chunks = _id_chunks(emails, chunk_size, id_key)
+        if workers <= 1:
+            for chunk in chunks:
+                yield from _classify_chunk(chunk, with_details, self)
+            return
+
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(type(self), self.sender_cache)) as pool:
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(_classify_chunk, chunk, with_details))
+                    if len(pending) >= workers * BATCH_PENDING_PER_WORKER:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                # Konzument skončil dřív: nezačaté chunky zahodit
+                for future in pending:
+                    future.cancel()
+
+
+# ============================================================================
+# PRECOMPILED PATTERNS + FEATURE EXTRACTION
+# ============================================================================
+
+SUBJECT_REGEX = re.compile('|'.join(MarketingEmailDetector.MARKETING_SUBJECT_PATTERNS), re.IGNORECASE)
+FROM_REGEX = re.compile('|'.join(MarketingEmailDetector.MARKETING_FROM_PATTERNS), re.IGNORECASE)
+UNSUBSCRIBE_REGEX = re.compile('|'.join(MarketingEmailDetector.UNSUBSCRIBE_PATTERNS), re.IGNORECASE)
+BODY_REGEX = re.compile('|'.join(MarketingEmailDetector.MARKETING_BODY_PATTERNS), re.IGNORECASE)
+NOT_MARKETING_REGEX = re.compile('|'.join(MarketingEmailDetector.NOT_MARKETING_PATTERNS), re.IGNORECASE)
+TRACKING_PATTERN = r'(tracking|pixel|beacon|analytics)'
+TRACKING_REGEX = re.compile(TRACKING_PATTERN, re.IGNORECASE)
+
+
+def _lowercase_text_regex(patterns) -> 're.Pattern':
+    """
+    Varianta vzoru pro text už převedený na malá písmena: bez IGNORECASE
+    může re použít rychlé hledání literálního prefixu (řádově rychlejší).
+    Platí jen pokud jsou všechny vzory malými písmeny.
+    """
+    joined = '|'.join(patterns)
+    if joined != joined.lower():
+        return re.compile(joined, re.IGNORECASE)
+    return re.compile(joined)
+
+
+# Malá písmena, která IGNORECASE považuje za shodná s jiným malým písmenem
+# ve vzorech (ı ~ i, ſ ~ s). Text s nimi jde přes IGNORECASE varianty.
+CASE_FOLD_TRAPS = ('\u0131', '\u017f')
+
+NOT_MARKETING_LOWER = _lowercase_text_regex(MarketingEmailDetector.NOT_MARKETING_PATTERNS)
+UNSUBSCRIBE_LOWER = _lowercase_text_regex(MarketingEmailDetector.UNSUBSCRIBE_PATTERNS)
+BODY_LOWER = _lowercase_text_regex(MarketingEmailDetector.MARKETING_BODY_PATTERNS)
+TRACKING_LOWER = _lowercase_text_regex([TRACKING_PATTERN])
+NEWSLETTER_INDEX = DomainIndex.from_names(MarketingEmailDetector.NEWSLETTER_DOMAINS)
+
+# <a href= a <img v jednom průchodu HTML (oba začínají '<', nemohou se překrývat)
+HTML_TAG_REGEX = re.compile(r'<(?:(a\s+href=)|img\s+)', re.IGNORECASE)
+
+
+def extract_features(email_data: Dict[str, Any], email_addr: str = None) -> Dict[str, Any]:
+    """
+    Všechny hodnoty, které potřebuje MarketingEmailDetector.score(), v jednom průchodu
+
+    Text (předmět + tělo + HTML) se spojí a převede na malá písmena jednou,
+    adresa odesílatele se parsuje jednou a každý vzor běží nad textem
+    nejvýš jednou, bez IGNORECASE (text už je malými písmeny; viz
+    CASE_FOLD_TRAPS). Kategorie s počty (not-marketing, fráze v těle) zůstávají
+    samostatné regexy: sloučená alternace by změnila findall počty u
+    překrývajících se shod ("unsubscribe now" obsahuje "subscribe now").
+    Pro známé newsletter domény se text vůbec neprochází. email_addr = už
+    naparsovaná adresa z 'from' (jinak se parsuje zde).
+
+    Má-li email záznam 'html' z html_text (jednou spočítaný text a počty),
+    vzory běží nad jeho textem a počty se berou z něj; unsubscribe / tracking
+    pak zahrnují i odkazy a pixely, které jsou jen v atributech.
+    """
+    subject = email_data.get('subject', '')
+    from_addr = email_data.get('from', '')
+    body = email_data.get('body', '')
+    html_body = email_data.get('html_body', '')
+    html = email_data.get('html')
+
+    if email_addr is None:
+        _, email_addr = parseaddr(from_addr)
+    has_at = '@' in email_addr
+    domain = email_addr.split('@')[1].lower() if email_addr and has_at else ''
+    features = {
+        'email_addr': email_addr,
+        'domain': domain,
+        'list_domain': email_addr.split('@')[1] if has_at else '',
+        'newsletter_domain': bool(domain) and domain in NEWSLETTER_INDEX,
+    }
+    if features['newsletter_domain']:
+        return features
+
+    # Combined text for analysis
+    if html is not None:
+        html_body = html['text']
+    combined_text = f"{subject} {body} {html_body}".lower()
+    if any(trap in combined_text for trap in CASE_FOLD_TRAPS):
+        not_marketing, unsubscribe, body_phrases, tracking = (
+            NOT_MARKETING_REGEX, UNSUBSCRIBE_REGEX, BODY_REGEX, TRACKING_REGEX)
+    else:
+        not_marketing, unsubscribe, body_phrases, tracking = (
+            NOT_MARKETING_LOWER, UNSUBSCRIBE_LOWER, BODY_LOWER, TRACKING_LOWER)
+
+    link_count = img_count = 0
+    if html is not None:
+        link_count, img_count = html['links'], html['images']
+    elif html_body:
+        for link in HTML_TAG_REGEX.findall(html_body):
+            if link:
+                link_count += 1
+            else:
+                img_count += 1
+
+    features.update({
+        'not_marketing_matches': len(not_marketing.findall(combined_text)),
+        'subject_matches': len(SUBJECT_REGEX.findall(subject)),
+        'excessive_caps': bool(subject) and sum(map(str.isupper, subject)) / len(subject) > 0.5,
+        'from_matches': FROM_REGEX.findall(email_addr.lower()) if email_addr else [],
+        'unsubscribe': unsubscribe.search(combined_text) is not None or bool(
+            html and (html['unsubscribe_links'] or html['list_unsubscribe'])),
+        'body_matches': len(body_phrases.findall(combined_text)),
+        'has_html': html['has_html'] if html is not None else bool(html_body),
+        'link_count': link_count,
+        'img_count': img_count,
+        'tracking': tracking.search(combined_text) is not None or bool(html and html['tracking_pixels']),
+    })
+    return features
+
+
+# ============================================================================
+# SENDER VERDICT CACHE
+# ============================================================================
+
+class SenderVerdictCache:
+    """
+    Poslední verdikty podle adresy odesílatele (LRU)
+
+    Newsletter odesílatel posílá stovky téměř stejných emailů; jakmile má
+    min_observations shodných marketingových verdiktů s důvěrou nad prahem,
+    další jeho emaily se neanalyzují. Každý takto přeskočený email sníží
+    důvěru (× decay); pod prahem jde další email znovu přes plnou analýzu.
+    Shoda obnoví důvěru, jiný verdikt (newsletter → faktury) záznam zahodí
+    a odesílatel si důvěru musí získat znovu.
+
+    Přeskakují se jen marketingové verdikty a nikdy email, jehož předmět
+    obsahuje not-marketing indikátor (faktura, platba, předplatné), ani
+    odesílatel na whitelistu.
+    """
+
+    def __init__(self, max_entries: int = SENDER_CACHE_SIZE,
+                 min_observations: int = SENDER_CACHE_MIN_OBSERVATIONS,
+                 min_confidence: int = SENDER_CACHE_MIN_CONFIDENCE,
+                 decay: float = SENDER_CACHE_DECAY):
+        self.max_entries = max_entries
+        self.min_observations = min_observations
+        self.min_confidence = min_confidence
+        self.decay = decay
+        self.entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.reverifications = 0
+        self.flips = 0
+        self.evictions = 0
+
+    def _trusted(self, entry: Dict[str, Any]) -> bool:
+        return (entry['is_marketing'] and entry['observations'] >= self.min_observations
+                and entry['confidence'] >= self.min_confidence)
+
+    def lookup(self, sender: str, subject: str = '') -> Optional[Tuple[bool, int, Dict[str, Any]]]:
+        """Verdikt z cache (jako analyze()), nebo None = analyzovat a zavolat record()"""
+        entry = self.entries.get(sender) if sender else None
+        if entry is None or not self._trusted(entry):
+            self.misses += 1
+            return None
+        confidence = entry['confidence'] * self.decay ** (entry['served'] + 1)
+        if confidence < self.min_confidence or NOT_MARKETING_REGEX.search(subject or ''):
+            self.reverifications += 1
+            return None
+
+        self.hits += 1
+        entry['served'] += 1
+        self.entries.move_to_end(sender)
+        confidence = int(confidence)
+        return True, confidence, {
+            'confidence': confidence,
+            'reasons': [f"Cached sender verdict: {sender} ({entry['observations']} analyzed emails)"],
+            'is_whitelisted': False,
+            'score_breakdown': {'sender_cache': confidence},
+            'sender_cache': self.get_stats(hit=True),
+        }
+
+    def record(self, sender: str, is_marketing: bool, confidence: int, details: Dict[str, Any]):
+        """Výsledek plné analýzy emailu od odesílatele"""
+        if not sender or 'newsletter_domain' in details['score_breakdown']:
+            return  # Známé newsletter domény jsou okamžité i bez cache
+        entry = self.entries.get(sender)
+        if entry is not None and entry['is_marketing'] != is_marketing:
+            self.flips += 1
+            entry = None
+        if details['is_whitelisted']:
+            self.entries.pop(sender, None)
+            return
+        if entry is None:
+            entry = self.entries[sender] = {'is_marketing': is_marketing, 'confidence': confidence,
+                                            'observations': 1, 'served': 0}
+        else:
+            entry.update(confidence=confidence, observations=entry['observations'] + 1, served=0)
+        self.entries.move_to_end(sender)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_stats(self, hit: bool = False) -> Dict[str, Any]:
+        return {
+            'hit': hit,
+            'senders': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reverifications': self.reverifications,
+            'flips': self.flips,
+            'evictions': self.evictions,
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+
+# ============================================================================
+# PARALLEL BATCH (classify_batch)
+# ============================================================================
+
+_worker_detector = None
+
+
+def _init_worker(detector_class=MarketingEmailDetector, sender_cache=None):
+    global _worker_detector
+    _worker_detector = detector_class(sender_cache=sender_cache)
+
+
+def _id_chunks(emails: Iterable[Dict[str, Any]], chunk_size: int,
+               id_key: str) -> Iterator[List[Tuple[Any, Dict[str, Any]]]]:
+    """Líně čte vstup po chuncích (id, email jen s EMAIL_FIELDS)"""
+    iterator = iter(emails)
+    position = 0
+    while True:
+        chunk = []
+        for email in islice(iterator, chunk_size):
+            email_id = email.get(id_key, position)
+            chunk.append((email_id, {key: email[key] for key in EMAIL_FIELDS if key in email}))
+            position += 1
+        if not chunk:
+            return
+        yield chunk
+
+
+def _classify_chunk(chunk: List[Tuple[Any, Dict[str, Any]]], with_details: bool,
+                    detector: MarketingEmailDetector = None) -> List[Dict[str, Any]]:
+    detector = detector or _worker_detector or MarketingEmailDetector()
+    results = []
+    for email_id, email in chunk:
+        is_marketing, confidence, details = detector.analyze(email)
+        result = {'id': email_id, 'is_marketing': is_marketing, 'confidence': confidence}
+        if with_details:
+            result['details'] = details
+        results.append(result)
+    return results
 
 
 if __name__ == "__main__":
@@ -43,10 +43,11 @@ logger = logging.getLogger(__name__)
 # ==================== CONFIGURATION ====================
 
 # Model configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_NAME = "deepseek-v3.1:671b-cloud"  # 671 BILLION parameters!
 OLLAMA_TIMEOUT = 180  # 3 minutes per document (complex analysis)
 MAX_RETRIES = 3
+NUM_PREDICT = 500  # Max generated tokens (response JSON is ~250 tokens)
 
 # Parallel processing
 INITIAL_WORKERS = 12  # Start with 12 workers
@@ -251,7 +252,7 @@ Vrať POUZE validní JSON (bez markdown bloků):
                     "stream": False,
                     "options": {
                         "temperature": 0.1,  # Low temperature for consistent results
-                        "num_predict": 1000
+                        "num_predict": NUM_PREDICT
                     }
                 },
                 timeout=OLLAMA_TIMEOUT
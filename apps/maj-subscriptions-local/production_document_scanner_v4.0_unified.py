@@ -14,6 +14,7 @@ Performance:
 - qwen2.5:72b: ~5-10s/doc (8 workers)
 """
 
+import os
 import psutil
 import time
 import threading
@@ -49,7 +50,7 @@ CONFIG = {
     "max_mem_percent": 90,  # Auto-scale down if RAM > 90%
     
     # Ollama config
-    "ollama_url": "http://192.168.10.83:11434",
+    "ollama_url": os.getenv("OLLAMA_URL", "http://192.168.10.83:11434").rsplit("/api/", 1)[0],
     "timeout": 180,         # 3 minutes timeout
     "temperature": 0.05,    # Very deterministic
 }
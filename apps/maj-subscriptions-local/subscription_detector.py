@@ -6,6 +6,7 @@ Hybrid approach: Keyword pre-filter + LLM final decision
 Simplified version without Thunderbird integration - designed for unified-mcp-server
 """
 
+import os
 import requests
 import json
 from typing import Dict, Optional
@@ -16,7 +17,7 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Ollama configuration
-OLLAMA_URL = "http://192.168.10.83:11434/api/generate"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://192.168.10.83:11434/api/generate")
 MODEL_NAME = "kimi-k2:1t-cloud"
 OLLAMA_TIMEOUT = 120
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test streaming classify_batch: same verdicts as analyze, lazy input, no bodies in results
+"""
+
+import os
+import sys
+import itertools
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from benchmark_marketing_detector import synthetic_corpus
+from marketing_email_detector import MarketingEmailDetector
+
+
+def test_parallel_matches_analyze():
+    """Process pool and in-process runs yield analyze()'s verdicts in input order"""
+    detector = MarketingEmailDetector()
+    emails = synthetic_corpus(600)
+    expected = [detector.analyze(email)[:2] for email in emails]
+
+    for workers in (1, 3):
+        stream = ({**email, 'id': f'<{i}@x>', 'raw': b'x' * 1000} for i, email in enumerate(emails))
+        results = list(detector.classify_batch(stream, workers=workers, chunk_size=50))
+        assert [r['id'] for r in results] == [f'<{i}@x>' for i in range(len(emails))]
+        assert [(r['is_marketing'], r['confidence']) for r in results] == expected
+        assert set(results[0]) == {'id', 'is_marketing', 'confidence'}
+
+
+def test_input_consumed_lazily():
+    """Only the in-flight chunks are read from an endless input"""
+    detector = MarketingEmailDetector()
+    consumed = itertools.count()
+    endless = ({'subject': 'Invoice', 'body': str(next(consumed))} for _ in itertools.repeat(None))
+    batch = detector.classify_batch(endless, workers=2, chunk_size=10, with_details=True)
+    first = list(itertools.islice(batch, 15))
+    batch.close()
+    assert [r['id'] for r in first] == list(range(15)) and 'details' in first[0]
+    assert next(consumed) <= 2 * 2 * 10 + 10 + 1
+
+
+if __name__ == "__main__":
+    tests = [test_parallel_matches_analyze, test_input_consumed_lazily]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test domain index: suffix walking, brand labels, addresses, hot reload
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import domain_index
+from domain_index import DomainIndex, registrable_domain
+from marketing_email_detector import NEWSLETTER_INDEX
+
+
+def test_suffix_walk_and_labels():
+    """Subdomains match their parents; bare names match whole labels only"""
+    assert registrable_domain('a.b.shop.example.co.uk') == 'example.co.uk'
+    assert 'news.mail.aida.de' in NEWSLETTER_INDEX
+    assert 'groupon.de' in NEWSLETTER_INDEX and 'r.groupon.co.uk' in NEWSLETTER_INDEX
+    assert 'mygrouponline.com' not in NEWSLETTER_INDEX      # substring scan used to match
+    assert 'notbild.de' not in NEWSLETTER_INDEX and 'de' not in NEWSLETTER_INDEX
+
+    index = DomainIndex([
+        {'pattern': '@n26.com', 'reason': 'bank'},
+        {'pattern': '@emails.n26.com', 'reason': 'bank mailing'},
+        {'pattern': 'billing@example.com', 'reason': 'one address'},
+    ])
+    assert index.lookup('EMAILS.N26.com.')['reason'] == 'bank mailing'
+    assert index.lookup('x.n26.com')['reason'] == 'bank'
+    assert index.lookup('', 'Billing@Example.com')['reason'] == 'one address'
+    assert index.lookup('example.com', 'sales@example.com') is None
+
+
+def test_hot_reload():
+    """Editing the JSON file changes lookups without a new index; broken JSON keeps the old one"""
+    old_interval = domain_index.RELOAD_CHECK_SECONDS
+    domain_index.RELOAD_CHECK_SECONDS = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'list.json')
+            index = DomainIndex.from_files(path)
+            assert 'stripe.com' not in index
+
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump([{'domain': 'stripe.com', 'pattern': '@stripe.com'}], f)
+            assert 'mail.stripe.com' in index
+
+            time.sleep(0.01)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('[{"domain": ')
+            os.utime(path, (time.time() + 5, time.time() + 5))
+            assert 'stripe.com' in index
+    finally:
+        domain_index.RELOAD_CHECK_SECONDS = old_interval
+
+
+if __name__ == "__main__":
+    tests = [test_suffix_walk_and_labels, test_hot_reload]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test MarketingEmailDetector on html_text records: same verdicts, counts from the record, no HTML re-scan
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import marketing_email_detector
+from benchmark_marketing_detector import synthetic_corpus
+from html_text import html_to_text
+from marketing_email_detector import MarketingEmailDetector
+
+NEWSLETTER_HTML = ('<table><tr><td><a href="https://shop.example.org/p/1">Spring</a>'
+                   '<a href="https://shop.example.org/p/2">Collection</a></td></tr></table>'
+                   '<img src="https://t.example.org/o.gif" width="1" height="1">'
+                   '<a href="https://shop.example.org/unsubscribe?id=7">Click to stop these emails</a>')
+
+
+def to_record(email):
+    record = {key: value for key, value in email.items() if key != 'html_body'}
+    record['html'] = html_to_text(email.get('html_body', ''))
+    return record
+
+
+def test_record_verdicts_match_raw_html():
+    """On the synthetic corpus the record gives the same verdicts as raw HTML"""
+    detector = MarketingEmailDetector()
+    emails = synthetic_corpus(1000)
+    raw = [detector.analyze(email)[0] for email in emails]
+    assert [detector.analyze(to_record(email))[0] for email in emails] == raw
+
+
+def test_counts_and_attribute_signals_from_record():
+    """Links, pixels and the unsubscribe href come from the record, HTML is not scanned again"""
+    email = to_record({'subject': 'Spring collection', 'from': 'Jana <jana@shop.example.org>',
+                       'body': '', 'html_body': NEWSLETTER_HTML})
+    record = email['html']
+    assert (record['links'], record['tracking_pixels'], record['unsubscribe_links']) == (3, 1, 1)
+
+    original = marketing_email_detector.HTML_TAG_REGEX
+    marketing_email_detector.HTML_TAG_REGEX = None  # Any raw-HTML scan would fail
+    try:
+        _, confidence, details = MarketingEmailDetector().analyze(email)
+    finally:
+        marketing_email_detector.HTML_TAG_REGEX = original
+    assert 'Unsubscribe link found' in details['reasons'], details['reasons']
+    assert 'Tracking elements detected' in details['reasons']
+    assert confidence == 35
+
+    raw_confidence = MarketingEmailDetector().analyze({**email, 'html': None, 'html_body': NEWSLETTER_HTML})[1]
+    assert raw_confidence == 30  # Raw scan has no notion of a 1×1 image
+
+
+def test_list_unsubscribe_and_batch_fields():
+    """List-Unsubscribe header counts as unsubscribe; classify_batch forwards the record"""
+    email = to_record({'subject': 'Hello', 'from': 'x@y.cz', 'body': 'Hi', 'html_body': '<p>Hi</p>'})
+    email['html']['list_unsubscribe'] = True
+    detector = MarketingEmailDetector()
+    assert 'Unsubscribe link found' in detector.analyze(email)[2]['reasons']
+    result = next(detector.classify_batch([email], workers=1, with_details=True))
+    assert 'Unsubscribe link found' in result['details']['reasons']
+
+
+if __name__ == "__main__":
+    tests = [test_record_verdicts_match_raw_html, test_counts_and_attribute_signals_from_record,
+             test_list_unsubscribe_and_batch_fields]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -6,6 +6,7 @@ Seskupuje podobné emaily a umožňuje klasifikaci celé skupiny
 + Default zobrazení: jen neklasifikované
 """
 
+import sys
 import sqlite3
 import json
 from typing import List, Dict, Any
@@ -13,6 +14,9 @@ from collections import defaultdict
 from difflib import SequenceMatcher
 from datetime import datetime
 from marketing_email_detector import MarketingEmailDetector
+from html_text import html_to_text
+from body_store import BodyStore
+from evidence_search import match_query
 
 DB_PATH = '/Users/m.a.j.puzik/apps/maj-subscriptions-local/data/subscriptions.db'
 
@@ -236,44 +240,88 @@ def group_emails(emails: List[Dict]) -> List[Dict]:
 
     return groups
 
-def load_emails(limit: int = 5000) -> List[Dict]:
-    """Načte emaily z databáze"""
+def load_emails(limit: int = 5000, query: str = None) -> List[Dict]:
+    """Načte emaily z databáze (s query jen výsledky fulltextu, nejlepší první)"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT email_subject, email_from, email_body_compact, email_body_full, email_date
-        FROM email_evidence
-        ORDER BY email_date DESC
-        LIMIT ?
-    """, (limit,))
+    # Plné tělo (email_body_full / email_bodies) se načítá až v analyze_groups
+    if query:
+        # FTS5 index email_evidence_fts; match_query uvozuje termy (operátory, uvozovky, "abo*")
+        match = match_query(query)
+        if not match:
+            conn.close()
+            return []
+        cursor.execute("""
+            SELECT e.id, e.email_subject, e.email_from, e.email_body_compact, e.email_date
+            FROM email_evidence_fts f
+            JOIN email_evidence e ON e.id = f.rowid
+            WHERE email_evidence_fts MATCH ?
+            ORDER BY f.rank
+            LIMIT ?
+        """, (match, limit))
+    else:
+        cursor.execute("""
+            SELECT id, email_subject, email_from, email_body_compact, email_date
+            FROM email_evidence
+            ORDER BY email_date DESC
+            LIMIT ?
+        """, (limit,))
 
     emails = []
     for row in cursor.fetchall():
         emails.append({
-            'subject': row[0] or '',
-            'from': row[1] or '',
-            'body': row[2] or '',
-            'html_body': row[3] or '',
+            'id': row[0],
+            'subject': row[1] or '',
+            'from': row[2] or '',
+            'body': row[3] or '',
             'date': row[4] or ''
         })
 
     conn.close()
     return emails
 
+def load_html_body(conn: sqlite3.Connection, evidence_id: int) -> str:
+    """Načte plné tělo emailu (komprimované v email_bodies, nebo inline u starých DB)"""
+    try:
+        row = conn.execute(
+            "SELECT email_body_hash, email_body_full FROM email_evidence WHERE id = ?", (evidence_id,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # DB bez email_body_hash (před migrací body_store.py)
+        row = conn.execute(
+            "SELECT NULL, email_body_full FROM email_evidence WHERE id = ?", (evidence_id,)
+        ).fetchone()
+    if not row:
+        return ''
+    digest, inline = row
+    if not digest:
+        return inline or ''
+    try:
+        return BodyStore(conn).get(digest) or ''
+    except RuntimeError:
+        # zstd blob bez nainstalovaného zstandard
+        return ''
+
 def analyze_groups(groups: List[Dict]) -> List[Dict]:
     """Analyzuje skupiny emailů"""
     detector = MarketingEmailDetector()
+    conn = sqlite3.connect(DB_PATH)
 
-    for group in groups:
-        # Analyzuj první email ze skupiny jako reprezentanta
-        email = group['emails'][0]
-        is_marketing, confidence, details = detector.analyze(email)
-
-        group['is_marketing'] = is_marketing
-        group['confidence'] = confidence
-        group['reasons'] = details['reasons'][:2]  # Max 2 důvody
+    # Analyzuj první email ze skupiny jako reprezentanta; plné tělo se načte
+    # až když si ho classify_batch vezme (v paměti jen rozpracované chunky)
+    # a do procesů jde jen jeho text + počty z html_text (ne HTML)
+    representatives = (
+        dict(group['emails'][0], id=i, html=html_to_text(load_html_body(conn, group['emails'][0]['id'])))
+        for i, group in enumerate(groups)
+    )
+    for result in detector.classify_batch(representatives, with_details=True):
+        group = groups[result['id']]
+        group['is_marketing'] = result['is_marketing']
+        group['confidence'] = result['confidence']
+        group['reasons'] = result['details']['reasons'][:2]  # Max 2 důvody
 
+    conn.close()
     return groups
 
 def generate_html(groups: List[Dict], stats: Dict, db_classifications: Dict[int, bool]) -> str:
@@ -715,9 +763,10 @@ def main():
     print("✓ Databáze připravena")
     print()
 
-    # Načíst emaily
-    print("📧 Načítám emaily...")
-    emails = load_emails(20000)
+    # Načíst emaily (volitelně jen fulltext: --search "netflix faktura")
+    query = sys.argv[sys.argv.index('--search') + 1] if '--search' in sys.argv[:-1] else None
+    print(f"📧 Načítám emaily{f' (hledání: {query})' if query else ''}...")
+    emails = load_emails(20000, query)
     print(f"✓ Načteno {len(emails)} emailů")
     print()
 
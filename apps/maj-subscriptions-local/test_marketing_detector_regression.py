@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Regresní test MarketingEmailDetector.analyze proti referenční implementaci
+(benchmark_marketing_detector.reference_analyze) na pevném korpusu
+
+Spouští se i přes pytest; benchmark zůstává jen pro měření rychlosti.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from benchmark_marketing_detector import reference_analyze, synthetic_corpus
+from marketing_email_detector import MarketingEmailDetector, extract_features
+
+CORPUS_SIZE = 1500
+# Počet marketingových verdiktů a součet confidence na synthetic_corpus(CORPUS_SIZE, seed=42):
+# zachytí i změnu vzorů, která by se projevila v obou implementacích stejně
+GOLDEN_TOTALS = (476, 38353)
+
+INVOICE = {
+    'subject': 'Your invoice for October',
+    'from': 'Billing <billing@netflix.com>',
+    'body': 'Payment received, thank you. Subscription renewal on 1.11.',
+    'html_body': '',
+}
+FLASH_SALE = {
+    'subject': '🔥 FLASH SALE - 50% OFF',
+    'from': 'Shop <newsletter@shop.example.com>',
+    'body': 'Click here to shop now! Limited time. Unsubscribe',
+    'html_body': '<a href="#">Shop</a>' * 6 + '<img src="p.gif">' * 4,
+}
+PERSONAL = {
+    'subject': 'Lunch tomorrow?',
+    'from': 'Jan Novák <jan.novak@seznam.cz>',
+    'body': 'Ahoj, dáme oběd?',
+    'html_body': '',
+}
+
+
+def test_analyze_matches_reference():
+    """Verdikt, confidence, důvody i breakdown shodné s referencí na celém korpusu"""
+    detector = MarketingEmailDetector()
+    emails = synthetic_corpus(CORPUS_SIZE)
+    for i, email in enumerate(emails):
+        expected = reference_analyze(detector, email)
+        actual = detector.analyze(email)
+        assert actual == expected, f"email #{i}: {actual} != reference {expected}"
+
+
+def test_golden_totals():
+    """Souhrn verdiktů na pevném korpusu se nezměnil"""
+    detector = MarketingEmailDetector()
+    results = [detector.analyze(email) for email in synthetic_corpus(CORPUS_SIZE)]
+    totals = (sum(1 for result in results if result[0]), sum(result[1] for result in results))
+    assert totals == GOLDEN_TOTALS, f"{totals} != {GOLDEN_TOTALS}"
+
+
+def test_fixed_emails_features_and_verdicts():
+    """Ručně zvolené emaily: očekávané příznaky a verdikty"""
+    detector = MarketingEmailDetector()
+
+    features = extract_features(INVOICE)
+    assert features['not_marketing_matches'] == 3 and not features['unsubscribe']
+    assert detector.analyze(INVOICE)[:2] == (False, 0)
+
+    features = extract_features(FLASH_SALE)
+    assert features['subject_matches'] == 3 and features['excessive_caps']
+    assert features['unsubscribe'] and features['body_matches'] == 3
+    assert (features['link_count'], features['img_count']) == (6, 4)
+    assert features['from_matches']
+    assert detector.analyze(FLASH_SALE)[:2] == (True, 100)
+
+    features = extract_features(PERSONAL)
+    assert features['domain'] == 'seznam.cz' and not features['from_matches']
+    assert detector.analyze(PERSONAL)[:2] == (False, 0)
+
+    for email in (INVOICE, FLASH_SALE, PERSONAL):
+        assert detector.analyze(email) == reference_analyze(detector, email)
+
+
+if __name__ == "__main__":
+    tests = [test_analyze_matches_reference, test_golden_totals, test_fixed_emails_features_and_verdicts]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test SenderVerdictCache: short-circuit of trusted senders, decay/re-verification, flips, LRU
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from marketing_email_detector import MarketingEmailDetector, SenderVerdictCache
+
+NEWSLETTER = {
+    'subject': '🔥 Flash sale - 50% off everything',
+    'from': 'Shop <offers@shop.example.org>',
+    'body': 'Click here to shop now! Limited time. Unsubscribe',
+    'html_body': '<a href="#">Shop</a>' * 6 + '<img src="p.gif" alt="tracking pixel">' * 4,
+}
+INVOICE = {
+    'subject': 'Your invoice for October',
+    'from': 'Shop <offers@shop.example.org>',
+    'body': 'Payment received, thank you.',
+    'html_body': '',
+}
+
+
+def test_trusted_sender_short_circuits():
+    """After min_observations full analyses the sender is served from the cache"""
+    cache = SenderVerdictCache(min_observations=3)
+    detector = MarketingEmailDetector(sender_cache=cache)
+    full = MarketingEmailDetector().analyze(NEWSLETTER)
+    assert full[0] and full[1] >= 80
+
+    for _ in range(3):
+        assert detector.analyze(NEWSLETTER)[:2] == full[:2]
+    is_marketing, confidence, details = detector.analyze(NEWSLETTER)
+    assert is_marketing and confidence < full[1]  # decayed
+    assert details['sender_cache']['hit'] and details['sender_cache']['hits'] == 1
+    assert 'sender_cache' in details['score_breakdown']
+
+
+def test_decay_forces_reverification():
+    """Decayed confidence below the threshold sends the next email through full analysis"""
+    cache = SenderVerdictCache(min_observations=1, min_confidence=80, decay=0.9)
+    detector = MarketingEmailDetector(sender_cache=cache)
+    detector.analyze(NEWSLETTER)
+    hits = 0
+    while detector.analyze(NEWSLETTER)[2]['sender_cache']['hit']:
+        hits += 1
+    assert hits == 2, hits  # 99 → 89.1 → 80.2 → (72.2 < 80: re-verify)
+    assert cache.reverifications == 1
+    assert detector.analyze(NEWSLETTER)[2]['sender_cache']['hit']  # Confidence restored
+
+
+def test_switch_to_invoices_is_reevaluated():
+    """An invoice subject bypasses the cache and a changed verdict drops the sender's trust"""
+    cache = SenderVerdictCache(min_observations=2)
+    detector = MarketingEmailDetector(sender_cache=cache)
+    for _ in range(3):
+        detector.analyze(NEWSLETTER)
+    is_marketing, _, details = detector.analyze(INVOICE)
+    assert not is_marketing and not details['sender_cache']['hit']
+    assert cache.flips == 1
+    stats = detector.analyze(NEWSLETTER)[2]['sender_cache']
+    assert not stats['hit']  # Trust has to be earned again
+
+
+def test_lru_eviction_and_default_off():
+    """Cache is bounded; without a cache analyze() details are unchanged"""
+    cache = SenderVerdictCache(max_entries=2)
+    detector = MarketingEmailDetector(sender_cache=cache)
+    for i in range(5):
+        detector.analyze({**NEWSLETTER, 'from': f'offers{i}@shop.example.org'})
+    assert len(cache.entries) == 2 and cache.evictions == 3
+    assert 'sender_cache' not in MarketingEmailDetector().analyze(NEWSLETTER)[2]
+
+
+if __name__ == "__main__":
+    tests = [test_trusted_sender_short_circuits, test_decay_forces_reverification,
+             test_switch_to_invoices_is_reevaluated, test_lru_eviction_and_default_off]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            print(f"❌ {test.__name__}: {e}")
+            failed += 1
+    sys.exit(1 if failed else 0)